@@ -0,0 +1,160 @@
+import atexit
+import os
+import threading
+import time
+
+from artifacts import ArtifactStore
+from config import (
+    ANSWER_CACHE_DIR,
+    ANSWER_CACHE_MAX_MB,
+    ANSWER_CACHE_SAVE_SECONDS,
+    ANSWER_CACHE_THRESHOLD,
+    OUTPUT_AUDIO_PATH,
+    OUTPUT_VIDEO_PATH,
+    PORTRAIT_PATH,
+)
+from figures import default_figures
+from metrics import CACHE_LOOKUPS
+
+# Words that don't change what a question asks ("Why did Napoleon..." = "Napoleon, why...")
+FILLER_WORDS = {"a", "an", "the", "did", "do", "does", "please", "tell", "me", "so", "well", "oh", "hey", "hi", "hello"}
+
+
+def question_words(text):
+    from similarity import normalize
+
+    return set(normalize(text).split()) - FILLER_WORDS
+
+
+# --- Answer Cache ---
+class AnswerCache:
+    """
+    Answers to earlier stand-alone questions, reused for near-identical ones.
+
+    Questions go into a SimilarityIndex; the answer's portrait, speech and video
+    are linked into a run of the cache's own artifact store, which drops the
+    oldest answers beyond max_mb (their questions then simply miss). A similar
+    question only hits if it names the answer's figure, the same figures in the
+    same order, and the same words apart from filler: "Did you not want to..."
+    is close to "Did you want to..." but asks the opposite.
+    """
+
+    def __init__(self, directory=ANSWER_CACHE_DIR, threshold=ANSWER_CACHE_THRESHOLD, max_mb=ANSWER_CACHE_MAX_MB,
+                 figures=None):
+        self.directory = directory
+        self.threshold = threshold
+        self.max_mb = max_mb
+        self.figures = figures
+        self.lock = threading.Lock()
+        self._index = None
+        self._store = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    @property
+    def index(self):
+        # numpy and the snapshot are loaded with the first question, not at startup
+        with self.lock:
+            if self._index is None:
+                from similarity import SimilarityIndex
+
+                self._index = SimilarityIndex(os.path.join(self.directory, "index"))
+                self._store = ArtifactStore(
+                    os.path.join(self.directory, "answers"), max_bytes=self.max_mb * 1024 * 1024, max_runs=10 ** 9
+                )
+            return self._index
+
+    def lookup(self, question, mode_name, figures=None):
+        """(similarity, answer payload, cached run directory) of the best usable match, or None."""
+        if not self.enabled or not question:
+            return None
+        figures = figures or self.figures or default_figures()
+        # Without a figure named, the answer depends on who the model picks
+        named = figures.mentioned(question)
+        words = question_words(question)
+        for similarity, _, payload in self.index.search(question, self.threshold) if named else []:
+            if payload["mode"] != mode_name or payload.get("figure_id") not in named:
+                continue
+            # Entries cached before questions were kept can't be checked, so they never hit
+            cached = payload.get("question")
+            if cached is None or question_words(cached) != words or figures.mentioned(cached) != named:
+                continue
+            run_dir = os.path.join(self._store.root, payload["run"])
+            if os.path.isdir(run_dir):
+                self.hits += 1
+                CACHE_LOOKUPS.labels("answer", "hit").inc()
+                return similarity, payload, run_dir
+        self.misses += 1
+        CACHE_LOOKUPS.labels("answer", "miss").inc()
+        return None
+
+    def add(self, result, mode_name):
+        """Keep a finished answer; with a draft portrait, once the final one is in."""
+        if not self.enabled or not result.user_text or not result.audio_path:
+            return
+        if result.final_images is not None and not result.final_images.done():
+            result.final_images.add_done_callback(lambda future: self._add(result, mode_name))
+            return
+        self._add(result, mode_name)
+
+    def _add(self, result, mode_name):
+        index = self.index
+        run = self._store.new_run(pinned=False)
+        try:
+            run.link(OUTPUT_AUDIO_PATH, result.audio_path)
+            if result.video_path:
+                run.link(OUTPUT_VIDEO_PATH, result.video_path)
+            if result.images:
+                run.write_image(PORTRAIT_PATH, result.images[0])
+        except OSError as e:
+            print(f"Answer not cached: {e}")
+            run.discard()
+            return
+        index.add(result.user_text, {
+            "mode": mode_name,
+            "run": run.id,
+            "question": result.user_text,
+            "figure_id": result.figure_id,
+            "figure_name": result.figure_name,
+            "gender": result.gender,
+            "monologue": result.monologue,
+        })
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._index) if self._index else None}
+
+    def save(self):
+        """Fold new questions into the index snapshot, so the next start doesn't hash them again."""
+        if self._index is not None and self._index.tail:
+            self._index.save()
+
+    def start_autosave(self, interval=ANSWER_CACHE_SAVE_SECONDS):
+        """Save every interval seconds (0: only at exit) and when the process exits."""
+        atexit.register(self.save)
+        if interval > 0:
+            threading.Thread(target=self._autosave, args=(interval,), name="answer-cache-save", daemon=True).start()
+        return self
+
+    def _autosave(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Could not save the answer cache index: {e}")
+
+
+CACHE = None
+_cache_lock = threading.Lock()
+
+
+def default_cache():
+    global CACHE
+    with _cache_lock:
+        if CACHE is None:
+            CACHE = AnswerCache()
+        return CACHE
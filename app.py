@@ -0,0 +1,537 @@
+import importlib
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+from config import CANVAS_SIZE, PLAYLIST_DIR, PLAYLIST_GAP_SECONDS, PLAYLIST_IDLE_SECONDS
+from loop_monitor import LoopMonitor
+from pipeline import Pipeline
+from question_queue import QuestionQueue
+from recorder import AudioRecorder
+
+
+def preload_modules(names):
+    """Import a mode's heavy dependencies off the UI thread so first use doesn't stall."""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Preload skipped {name}: {e}")
+
+
+# --- Main Application ---
+class HistoryChatApp:
+    def __init__(self, root, mode, preload=True, server_url=None, keyboard=False):
+        self.root = root
+        self.mode = mode
+        self.keyboard = keyboard
+        self.root.title(mode.title)
+        self.root.geometry(mode.geometry)
+        self.root.configure(bg="#2c3e50")
+        # Times every root.after callback from here on, including those posted by worker threads
+        self.loop_monitor = LoopMonitor(root).install()
+
+        self.is_recording = False
+        self.is_paused = False  # Flag to track pause state
+        self.is_finished = False
+        self.is_playing = False
+        self.recorder = AudioRecorder()
+        self.canvas_size = CANVAS_SIZE
+        if server_url:
+            # Thin display client: a pipeline server answers, this app only records and plays
+            from client import RemotePipeline
+
+            self.pipeline = RemotePipeline(server_url, mode, on_status=self.update_status, canvas_size=self.canvas_size)
+        else:
+            self.pipeline = Pipeline(mode, on_status=self.update_status, canvas_size=self.canvas_size)
+        self.queue = QuestionQueue(
+            self.pipeline,
+            on_ready=lambda job: self.root.after(0, self.on_answer_ready),
+            on_error=lambda job: self.root.after(0, self.on_answer_error, job),
+        )
+        self.result = None
+        # The last question that failed, kept (with its files) until it is retried or another fails
+        self.failed_job = None
+        self.presenter = None
+        self.canvas_image_ref = None
+        self.animate_job = None
+        self.audio_duration = 0
+        self.volume = 0.8
+        self._mixer = None
+        # Session bundles replayed while nobody is asking (bundles.py)
+        self.playlist = None
+        if PLAYLIST_IDLE_SECONDS:
+            from bundles import Playlist
+
+            self.playlist = Playlist()
+        self.playlist_job = None
+        self.from_playlist = False
+        self.keep_warm = None
+
+        self.setup_ui()
+        self.root.bind("<space>", self.toggle_recording)
+
+        if preload:
+            self.root.after_idle(self.start_preload)
+        self.schedule_playlist(PLAYLIST_IDLE_SECONDS)
+
+    def start_preload(self):
+        threading.Thread(
+            target=preload_modules, args=(self.mode.preload_modules,), daemon=True
+        ).start()
+        from metrics import start_exporters
+
+        start_exporters()
+        # Worker processes for decoding and fades are started before the first answer needs them
+        from media_pool import default_media_pool
+
+        default_media_pool().warm()
+        if isinstance(self.pipeline, Pipeline):
+            # Voice clips are read (and the defaults downloaded once) before the first answer needs them
+            from voices import default_voices
+
+            threading.Thread(target=default_voices().preload, daemon=True).start()
+            from answer_cache import default_cache
+
+            default_cache().start_autosave()
+            # Pings share the pipeline's rate governor, so they only use slots visitors don't
+            from keepwarm import start_keep_warm
+
+            self.keep_warm = start_keep_warm(self.mode, self.pipeline.client)
+
+    @property
+    def mixer(self):
+        # pygame takes a noticeable part of cold start, so it is initialised on first playback
+        if self._mixer is None:
+            import pygame
+
+            pygame.mixer.init()
+            self._mixer = pygame.mixer
+        return self._mixer
+
+    def setup_ui(self):
+        # Header
+        lbl_title = tk.Label(self.root, text="Ask a Historical Figure", font=("Helvetica", 24, "bold"), bg="#2c3e50", fg="white")
+        lbl_title.pack(pady=20)
+
+        # Image Canvas
+        self.canvas = tk.Canvas(self.root, width=self.canvas_size, height=self.canvas_size, bg="black", highlightthickness=0)
+        self.canvas.pack(pady=10)
+        self.canvas_text = self.canvas.create_text(256, 256, text="Press SPACE to Record", fill="white", font=("Arial", 16))
+
+        # Status Label
+        self.lbl_status = tk.Label(self.root, text="Ready", font=("Arial", 12), bg="#2c3e50", fg="#bdc3c7")
+        self.lbl_status.pack(pady=10)
+
+        # Queue Label (questions waiting, and progress on the next one during playback)
+        self.lbl_queue = tk.Label(self.root, text="", font=("Arial", 11), bg="#2c3e50", fg="#81ecec")
+        self.lbl_queue.pack()
+
+        # Record Button
+        self.btn_record = tk.Button(
+            self.root,
+            text="Start Recording (Space)",
+            command=self.handle_record_click,
+            font=("Arial", 12, "bold"),
+            width=20,
+            height=2,
+            fg="#2d3436",
+            bg="#81ecec",
+            highlightbackground="#81ecec"
+        )
+        self.btn_record.pack(pady=10)
+
+        # Typed Question (kiosks with a keyboard): Enter sends it, no recording or transcription
+        self.question_frame = tk.Frame(self.root, bg="#2c3e50")
+        self.entry_question = tk.Entry(self.question_frame, font=("Arial", 12), width=40)
+        self.entry_question.pack(side=tk.LEFT, padx=5)
+        self.entry_question.bind("<Return>", self.submit_typed)
+        self.btn_ask = tk.Button(self.question_frame, text="Ask", command=self.submit_typed, highlightbackground="#2c3e50", width=6)
+        self.btn_ask.pack(side=tk.LEFT)
+        if self.keyboard:
+            self.question_frame.pack(pady=(0, 10))
+
+        # Retry Button (shown after a question failed; resumes from the failed stage)
+        self.btn_retry = tk.Button(
+            self.root,
+            text="Retry Last Question",
+            command=self.retry_failed,
+            font=("Arial", 11),
+            width=20,
+            fg="#2d3436",
+            bg="#ffeaa7",
+            highlightbackground="#ffeaa7"
+        )
+
+        # --- AUDIO CONTROLS FRAME ---
+        self.audio_controls_frame = tk.Frame(self.root, bg="#2c3e50")
+
+        # Replay Button
+        self.btn_replay = tk.Button(self.audio_controls_frame, text="Replay", command=self.replay_playback, highlightbackground="#2c3e50", width=8)
+        self.btn_replay.pack(side=tk.LEFT, padx=5)
+
+        # Pause/Resume Button
+        self.btn_play_pause = tk.Button(self.audio_controls_frame, text="Pause", command=self.toggle_playback, highlightbackground="#2c3e50", width=8)
+        self.btn_play_pause.pack(side=tk.LEFT, padx=5)
+
+        # Stop Button
+        self.btn_stop = tk.Button(self.audio_controls_frame, text="Stop", command=self.stop_playback, highlightbackground="#2c3e50", width=8, fg="red")
+        self.btn_stop.pack(side=tk.LEFT, padx=5)
+
+        # Follow-up Button (shown once the monologue has finished)
+        self.btn_follow_up = tk.Button(self.audio_controls_frame, text="Follow Up", command=self.follow_up, highlightbackground="#2c3e50", width=10)
+
+        # Keep Button (shown once the monologue has finished): saves the answer as a bundle for the playlist
+        self.btn_keep = tk.Button(self.audio_controls_frame, text="Add to Playlist", command=self.keep_answer, highlightbackground="#2c3e50", width=12)
+
+        # Volume Slider
+        self.vol_slider = ttk.Scale(self.audio_controls_frame, from_=0, to=1, orient=tk.HORIZONTAL, command=self.set_volume)
+        self.vol_slider.set(self.volume)
+        self.vol_slider.pack(side=tk.LEFT, padx=10)
+
+        # Label for Volume
+        tk.Label(self.audio_controls_frame, text="Vol", bg="#2c3e50", fg="white").pack(side=tk.LEFT)
+
+    # --- Interaction Logic ---
+    def toggle_recording(self, event=None):
+        if event is not None and event.widget is self.entry_question:
+            return  # A space in a typed question
+        # Space works during playback too: new questions join the queue
+        self.handle_record_click()
+
+    def submit_typed(self, event=None):
+        text = self.entry_question.get().strip()
+        if not text or self.is_recording:
+            return
+        if self.queue.is_full():
+            self.lbl_queue.config(text="The queue is full, please wait for the next answer.")
+            return
+        self.stop_playlist()
+        self.entry_question.delete(0, tk.END)
+        position = self.queue.submit(self.queue.new_job(text))
+        if self.is_playing or position > 1:
+            self.lbl_queue.config(text=f"Your question is #{position} in line.")
+        else:
+            self.lbl_status.config(text="Processing...")
+        self.play_next()
+        self.refresh_queue()
+
+    def handle_record_click(self):
+        if not self.is_recording:
+            if self.queue.is_full():
+                self.lbl_queue.config(text="The queue is full, please wait for the next answer.")
+                return
+            # The playlist would talk into the microphone
+            self.stop_playlist()
+            self.is_recording = True
+            self.lbl_status.config(text="Recording... Speak now.")
+            self.recorder.start()
+        else:
+            self.is_recording = False
+            job = self.queue.new_job()
+            if self.recorder.stop(job.input_path):
+                position = self.queue.submit(job)
+                if self.is_playing or position > 1:
+                    self.lbl_queue.config(text=f"Your question is #{position} in line.")
+            else:
+                job.run.discard()
+                if not self.is_playing:
+                    self.lbl_status.config(text="Nothing was recorded.")
+            self.play_next()
+        self.refresh_queue()
+
+    def refresh_queue(self):
+        waiting = len(self.queue)
+        if self.is_recording:
+            self.btn_record.config(state=tk.NORMAL, text="Stop Recording (Space)", bg="#fab1a0", highlightbackground="#fab1a0", fg="#2d3436")
+        elif self.queue.is_full():
+            text = "Queue Full" if self.is_playing else "Processing..."
+            self.btn_record.config(state=tk.DISABLED, text=text, bg="#dfe6e9", highlightbackground="#dfe6e9", fg="#636e72")
+        else:
+            text = "Queue Question (Space)" if (self.is_playing or waiting) else "Start Recording (Space)"
+            self.btn_record.config(state=tk.NORMAL, text=text, bg="#81ecec", highlightbackground="#81ecec", fg="#2d3436")
+        if self.failed_job:
+            self.btn_retry.pack(pady=(0, 10), after=self.btn_record)
+        else:
+            self.btn_retry.pack_forget()
+        if not waiting:
+            self.lbl_queue.config(text="")
+        elif not self.queue.is_busy():
+            self.lbl_queue.config(text=f"Questions in line: {waiting} (next answer ready)")
+
+    # --- AI Pipeline ---
+    def on_answer_ready(self):
+        self.refresh_queue()
+        self.play_next()
+
+    def on_answer_error(self, job):
+        if self.failed_job is not None:
+            self.failed_job.run.release()
+        self.failed_job = job
+        self.lbl_queue.config(text=f"A question failed: {str(job.error)[:60]}")
+        if not self.is_playing:
+            self.reset_ui()
+            self.lbl_status.config(text=f"Error: {str(job.error)[:60]}")
+        self.refresh_queue()
+
+    def retry_failed(self):
+        # Only the stage that failed (and those after it) run again
+        job = self.failed_job
+        if job is None:
+            return
+        if self.queue.is_full():
+            self.lbl_queue.config(text="The queue is full, please wait for the next answer.")
+            return
+        self.failed_job = None
+        self.stop_playlist()
+        position = self.queue.retry(job)
+        if self.is_playing or position > 1:
+            self.lbl_queue.config(text=f"Retrying, #{position} in line.")
+        else:
+            self.lbl_status.config(text="Retrying from where it failed...")
+        self.refresh_queue()
+
+    def play_next(self):
+        # A visitor's answer takes over from the playlist
+        if self.from_playlist and self.queue.ready:
+            self.stop_playlist()
+        # Never start an answer over a running one, or into the microphone
+        if self.is_playing or self.is_recording:
+            return
+        job = self.queue.pop_ready()
+        if job:
+            if job.conversation is not None:
+                # Answered on a snapshot: it joins the conversation now that it is shown
+                self.pipeline.conversation.expire_if_idle()
+                self.pipeline.conversation.record(job.result)
+            self.start_playback(job.result)
+            self.refresh_queue()
+
+    def update_status(self, text):
+        self.root.after(0, self.show_status, text)
+
+    def show_status(self, text):
+        # While an answer plays, progress on the next question goes to the queue line
+        if self.is_playing:
+            self.lbl_queue.config(text=f"Next question: {text}")
+        else:
+            self.lbl_status.config(text=text)
+
+    # --- Playback Logic ---
+    def start_playback(self, result=None):
+        import soundfile as sf
+
+        if result is not None:
+            # The previous answer can't be replayed any more, so its files may go
+            if self.result is not None and self.result is not result and self.result.run is not None:
+                self.result.run.release()
+            self.result = result
+
+        if self.from_playlist:
+            self.lbl_status.config(text=f"From the archive: {self.result.figure_name}. Press SPACE to ask your own question.")
+        else:
+            self.lbl_status.config(text="Listening to response...")
+        self.audio_controls_frame.pack(pady=10)
+
+        # Reset states (this may follow straight on from a finished answer)
+        self.is_paused = False
+        self.is_playing = True
+        self.is_finished = False
+        self.btn_follow_up.pack_forget()
+        self.btn_keep.pack_forget()
+        self.btn_stop.config(text="Stop", bg="#f0f0f0", width=8, fg="red")
+        self.btn_play_pause.config(state=tk.NORMAL, text="Pause")
+
+        # Get audio duration
+        try:
+            self.audio_duration = sf.info(self.result.audio_source()).duration
+        except Exception:
+            self.audio_duration = 10  # Fallback
+
+        self.mixer.music.load(self.result.audio_source())
+        self.mixer.music.set_volume(self.volume)
+        self.mixer.music.play()
+
+        if self.presenter:
+            self.presenter.stop()
+        self.presenter = self.mode.create_presenter(self)
+        self.presenter.start(self.result)
+
+        self.animate_loop()
+
+    def playback_position(self):
+        return self.mixer.music.get_pos() / 1000
+
+    def display_image(self, img):
+        """Display an image on the canvas."""
+        from PIL import ImageTk
+
+        self.tk_image = ImageTk.PhotoImage(img)
+        self.canvas.delete("all")
+        self.canvas.create_image(0, 0, image=self.tk_image, anchor=tk.NW)
+        self.canvas_image_ref = self.tk_image  # Keep ref
+
+    def animate_loop(self):
+        if self.animate_job:
+            self.root.after_cancel(self.animate_job)
+            self.animate_job = None
+
+        # 1. Check if user paused manually. If so, just wait.
+        if self.is_paused:
+            self.animate_job = self.root.after(100, self.animate_loop)
+            return
+
+        # 2. Check if audio finished naturally
+        if not self.mixer.music.get_busy():
+            self.presenter.stop()
+            self.is_playing = False
+
+            # The next queued answer plays straight away
+            if self.queue.ready:
+                self.from_playlist = False
+                self.play_next()
+                return
+
+            if self.from_playlist:
+                self.reset_ui()
+                self.schedule_playlist(PLAYLIST_GAP_SECONDS)
+                return
+
+            self.refresh_queue()
+            self.lbl_status.config(text="Monologue Finished.")
+            self.btn_play_pause.config(text="Finished", state=tk.DISABLED)
+            # Keep the last frame up and offer a follow-up or a "New Chat" instead of resetting straight away
+            self.btn_stop.config(text="New Chat", bg="#fab1a0", width=12)
+            self.btn_follow_up.pack(side=tk.LEFT, padx=5, before=self.btn_stop)
+            if self.result.run is not None:
+                self.btn_keep.config(state=tk.NORMAL, text="Add to Playlist")
+                self.btn_keep.pack(side=tk.LEFT, padx=5, before=self.btn_stop)
+            self.is_finished = True
+            self.schedule_playlist(PLAYLIST_IDLE_SECONDS)
+            return
+
+        # 3. Let the presenter react to the playback position (e.g. fade out near the end)
+        self.presenter.update(self.playback_position(), self.audio_duration)
+
+        self.animate_job = self.root.after(100, self.animate_loop)
+
+    # --- Controls ---
+    def toggle_playback(self):
+        if not self.mixer.music.get_busy() and not self.is_paused:
+            return  # Nothing playing
+
+        if self.is_paused:
+            self.mixer.music.unpause()
+            self.is_paused = False
+            self.btn_play_pause.config(text="Pause")
+        else:
+            self.mixer.music.pause()
+            self.is_paused = True
+            self.btn_play_pause.config(text="Resume")
+
+    def stop_playback(self):
+        self.mixer.music.stop()
+        if self.is_finished:
+            # "New Chat": the next question starts a fresh conversation
+            self.pipeline.conversation.reset()
+        self.reset_ui()
+        self.play_next()
+
+    def follow_up(self):
+        # Back to the record screen, keeping the conversation (and portrait) for the next question
+        self.reset_ui()
+
+    def replay_playback(self):
+        self.start_playback()
+
+    def keep_answer(self):
+        # Written off the UI thread: a video answer's frames are decoded into the bundle
+        import os
+
+        result = self.result
+        self.btn_keep.config(state=tk.DISABLED, text="Saving...")
+        path = os.path.join(PLAYLIST_DIR, f"{result.run.id}.hsb")
+
+        def export():
+            from bundles import export_result
+
+            try:
+                os.makedirs(PLAYLIST_DIR, exist_ok=True)
+                export_result(path, result, self.mode.name, self.canvas_size)
+                self.root.after(0, self.btn_keep.config, {"text": "In Playlist"})
+            except Exception as e:
+                print(f"Could not save the answer to the playlist: {e}")
+                self.root.after(0, self.btn_keep.config, {"state": tk.NORMAL, "text": "Add to Playlist"})
+
+        threading.Thread(target=export, daemon=True).start()
+
+    # --- Playlist ---
+    def schedule_playlist(self, delay):
+        if self.playlist is None:
+            return
+        if self.playlist_job:
+            self.root.after_cancel(self.playlist_job)
+        self.playlist_job = self.root.after(int(delay * 1000), self.play_playlist)
+
+    def play_playlist(self):
+        self.playlist_job = None
+        busy = self.is_playing or self.is_recording or len(self.queue) or self.entry_question.get().strip()
+        bundle = None if busy else self.playlist.next()
+        if bundle is None:
+            # Someone is using the kiosk (or the playlist is empty): look again after another idle spell
+            self.schedule_playlist(PLAYLIST_IDLE_SECONDS)
+            return
+        try:
+            result = bundle.result()
+        except Exception as e:
+            print(f"Playlist: {bundle.path} unplayable: {e}")
+            self.schedule_playlist(PLAYLIST_GAP_SECONDS)
+            return
+        self.from_playlist = True
+        self.start_playback(result)
+
+    def stop_playlist(self):
+        if self.playlist_job:
+            self.root.after_cancel(self.playlist_job)
+            self.playlist_job = None
+        if self.from_playlist and self.is_playing:
+            self.mixer.music.stop()
+            self.reset_ui()
+
+    def set_volume(self, val):
+        self.volume = float(val)
+        if self._mixer is not None:
+            self._mixer.music.set_volume(self.volume)
+
+    def reset_ui(self):
+        if self.animate_job:
+            self.root.after_cancel(self.animate_job)
+            self.animate_job = None
+        if self.presenter:
+            self.presenter.stop()
+            self.presenter = None
+
+        self.audio_controls_frame.pack_forget()
+        self.btn_follow_up.pack_forget()
+        self.btn_keep.pack_forget()
+        self.is_finished = False
+        self.is_playing = False
+        self.from_playlist = False
+
+        # Restore Record Button
+        self.refresh_queue()
+
+        # Restore Stop Button style (in case it was changed to New Chat)
+        self.btn_stop.config(text="Stop", bg="#f0f0f0", width=8, fg="red")
+        self.btn_play_pause.config(state=tk.NORMAL, text="Pause")
+        self.is_paused = False
+
+        # Clear Canvas
+        self.canvas.delete("all")
+        self.canvas.create_text(256, 256, text="Press SPACE to Record", fill="white", font=("Arial", 16))
+        figure_name = self.pipeline.conversation.figure_name
+        if figure_name:
+            self.lbl_status.config(text=f"Ask {figure_name} a follow-up, or name someone new.")
+        else:
+            self.lbl_status.config(text="Ready for next question.")
+        self.schedule_playlist(PLAYLIST_IDLE_SECONDS)
@@ -0,0 +1,188 @@
+import io
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+
+from config import ARTIFACT_DIR, ARTIFACT_MAX_MB, ARTIFACT_MAX_RUNS
+from metrics import METRICS
+
+MANIFEST_NAME = "manifest.json"
+
+
+def write_atomic(path, data):
+    """Write bytes so readers see the old file or the whole new one, never a partial file."""
+    tmp_path = f"{path}.tmp{threading.get_ident()}"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+# --- Run ---
+class Run:
+    """The artifact directory of one question: its recording, portrait, speech and video."""
+
+    def __init__(self, store, run_id):
+        self.store = store
+        self.id = run_id
+        self.dir = os.path.join(store.root, run_id)
+        self.files = {}
+        self.created = time.time()
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def write(self, name, data):
+        write_atomic(self.path(name), data)
+        self.add(name)
+        return self.path(name)
+
+    def write_image(self, name, img):
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=95)
+        return self.write(name, buffer.getvalue())
+
+    def link(self, name, source_path):
+        """Bring in a file from an earlier run (e.g. a follow-up's video) without copying it if possible."""
+        tmp_path = f"{self.path(name)}.tmp{threading.get_ident()}"
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, self.path(name))
+        self.add(name)
+        return self.path(name)
+
+    def add(self, name):
+        """Record a file written into the run (directly, or via write/link) in the manifest."""
+        self.files[name] = os.path.getsize(self.path(name))
+        manifest = {"id": self.id, "created": self.created, "files": self.files}
+        write_atomic(self.path(MANIFEST_NAME), json.dumps(manifest, indent=2).encode())
+
+    def has(self, name):
+        return name in self.files
+
+    def release(self):
+        self.store.release(self)
+
+    def discard(self):
+        self.store.remove(self)
+
+
+# --- Artifact Store ---
+class ArtifactStore:
+    """
+    Per-question run directories under one root, with a size and count limit.
+
+    Runs are pinned while something may still read them (queued, playing, being
+    replayed); garbage collection removes the oldest unpinned runs first.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR, max_bytes=ARTIFACT_MAX_MB * 1024 * 1024, max_runs=ARTIFACT_MAX_RUNS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_runs = max_runs
+        self.lock = threading.Lock()
+        self.pins = {}
+        self.ids = itertools.count(1)
+        os.makedirs(root, exist_ok=True)
+
+    def new_run(self, label=None, pinned=True):
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self.ids)}"
+        if label:
+            run_id += f"-{label}"
+        run = Run(self, run_id)
+        os.makedirs(run.dir)
+        if pinned:
+            self.pin(run)
+        self.gc()
+        return run
+
+    def pin(self, run):
+        with self.lock:
+            self.pins[run.id] = self.pins.get(run.id, 0) + 1
+
+    def release(self, run):
+        with self.lock:
+            count = self.pins.get(run.id, 0) - 1
+            if count > 0:
+                self.pins[run.id] = count
+            else:
+                self.pins.pop(run.id, None)
+
+    def remove(self, run):
+        self.release(run)
+        shutil.rmtree(run.dir, ignore_errors=True)
+
+    def runs(self):
+        """(run id, created, bytes) of every run on disk, oldest first."""
+        found = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            size = 0
+            for file in os.scandir(entry.path):
+                try:
+                    size += file.stat().st_size
+                except OSError:
+                    pass  # Removed or replaced meanwhile
+            try:
+                with open(os.path.join(entry.path, MANIFEST_NAME)) as manifest:
+                    created = json.load(manifest)["created"]
+            except (OSError, ValueError, KeyError):
+                created = entry.stat().st_mtime
+            found.append((entry.name, created, size))
+        return sorted(found, key=lambda run: run[1])
+
+    def gc(self):
+        """Remove the oldest unpinned runs until the store is within its limits."""
+        runs = self.runs()
+        total = sum(size for _, _, size in runs)
+        count = len(runs)
+        removed = 0
+        with self.lock:
+            pinned = set(self.pins)
+        for run_id, _, size in runs:
+            if total <= self.max_bytes and count <= self.max_runs:
+                break
+            if run_id in pinned:
+                continue
+            shutil.rmtree(os.path.join(self.root, run_id), ignore_errors=True)
+            total -= size
+            count -= 1
+            removed += 1
+        if removed:
+            print(f"Artifacts: removed {removed} old runs ({total / 1024 / 1024:.1f} MB in {count} runs kept)")
+
+    def usage(self):
+        runs = self.runs()
+        with self.lock:
+            pinned = len(self.pins)
+        return {"runs": len(runs), "pinned": pinned, "bytes": sum(size for _, _, size in runs)}
+
+
+STORE = None
+_store_lock = threading.Lock()
+
+
+def default_store():
+    # Created on first use, so importing this module doesn't touch the disk
+    global STORE
+    with _store_lock:
+        if STORE is None:
+            STORE = ArtifactStore()
+        return STORE
+
+
+def store_metrics():
+    if STORE is None:
+        return
+    for key, value in STORE.usage().items():
+        yield f"history_artifact_{key}", "gauge", "Artifact store usage (runs, pinned runs, bytes)", {}, value
+
+
+METRICS.add_collector(store_metrics)
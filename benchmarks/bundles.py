@@ -0,0 +1,158 @@
+"""
+Replaying a session bundle: time until the answer can start, and memory while it plays.
+
+    python benchmarks/bundles.py --frames 400
+
+Builds a bundle like one exported from a video mode (a speech, the portrait and
+--frames canvas-size video frames; the frames are synthetic, so OpenCV is not
+needed) and times opening it up to the first frame and the speech being ready,
+against reading the same answer from a run directory (portrait decoded from
+JPEG). Memory is the growth in peak resident set size of a fresh child process
+that steps through every frame (Unix only).
+"""
+import argparse
+import io
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CANVAS_SIZE  # noqa: E402
+
+SPEECH_SECONDS = 45
+
+
+def sample_answer(size):
+    import numpy as np
+    import soundfile as sf
+    from PIL import Image, ImageFilter
+
+    noise = Image.effect_noise((size, size), 64).filter(ImageFilter.GaussianBlur(1))
+    portrait = Image.merge("RGB", (noise, noise.rotate(90), noise.rotate(180)))
+    jpeg = io.BytesIO()
+    portrait.save(jpeg, "JPEG", quality=95)
+    wav = io.BytesIO()
+    sf.write(wav, np.random.default_rng(0).uniform(-0.3, 0.3, SPEECH_SECONDS * 24000), 24000, format="WAV")
+    return portrait, jpeg.getvalue(), wav.getvalue()
+
+
+def build(directory, frames, size):
+    import json
+
+    import numpy as np
+
+    from bundles import BundleWriter
+
+    portrait, jpeg, wav = sample_answer(size)
+    base = np.asarray(portrait)
+
+    def video():
+        for start in range(0, frames, 25):
+            chunk = np.repeat(base[None], min(25, frames - start), axis=0)
+            chunk[:, :, :, 0] = (np.arange(start, start + len(chunk)) % 256)[:, None, None]
+            yield chunk, 25
+
+    path = os.path.join(directory, "sample.hsb")
+    writer = BundleWriter(path)
+    writer.add("transcript.txt", b"Why did you cross the Rubicon?")
+    writer.add("brain.json", json.dumps({"character_name": "Julius Caesar", "gender": "male", "monologue": "Alea iacta est."}).encode())
+    writer.add("portrait.jpg", jpeg)
+    writer.add("speech.wav", wav)
+    writer.add_frames("portrait.rgb", [(base[None], None)])
+    writer.add_frames("video.rgb", video())
+    writer.close({"mode": "wan", "figure_id": "julius_caesar", "figure_name": "Julius Caesar", "gender": "male",
+                  "user_text": "Why did you cross the Rubicon?", "speech_seconds": SPEECH_SECONDS})
+    with open(os.path.join(directory, "static_portrait.jpg"), "wb") as file:
+        file.write(jpeg)
+    with open(os.path.join(directory, "output_speech.wav"), "wb") as file:
+        file.write(wav)
+    return path
+
+
+def from_bundle(path, size):
+    import soundfile as sf
+
+    from bundles import Bundle
+
+    bundle = Bundle(path)
+    result = bundle.result()
+    sf.info(result.audio_source())
+    result.bundle.video_frames().next()
+    return bundle
+
+
+def from_run(directory, size):
+    import soundfile as sf
+
+    from media_pool import decode_image
+
+    with open(os.path.join(directory, "static_portrait.jpg"), "rb") as file:
+        decode_image(file.read(), size)
+    sf.info(os.path.join(directory, "output_speech.wav"))
+
+
+def peak_rss_mb():
+    with open("/proc/self/status") as file:
+        for line in file:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(path, size):
+    # Imports first, so the growth is the replay itself
+    import numpy as np  # noqa: F401
+    import soundfile  # noqa: F401
+    from PIL import Image
+
+    import pipeline  # noqa: F401
+
+    baseline = peak_rss_mb()
+    bundle = from_bundle(path, size)
+    frames = bundle.video_frames()
+    for _ in range(len(frames.frames)):
+        Image.fromarray(frames.next())
+    print(f"{peak_rss_mb() - baseline:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=400, help="Video frames in the bundle (25 per second)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--size", type=int, default=CANVAS_SIZE)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], int(args.child[1]))
+        return
+
+    import pipeline  # noqa: F401
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = build(directory, args.frames, args.size)
+        timings = {"bundle": [], "run directory": []}
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            from_bundle(path, args.size).close()
+            timings["bundle"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            from_run(directory, args.size)
+            timings["run directory"].append((time.perf_counter() - start) * 1000)
+        growth = subprocess.run(
+            [sys.executable, __file__, "--child", path, str(args.size)], capture_output=True, text=True, check=True
+        ).stdout.split()[-1]
+
+        print(f"bundle: {os.path.getsize(path) / 1e6:.0f} MB, {args.frames} frames of {args.size}px")
+        for name, values in timings.items():
+            print(f"{name:<14} ready in {statistics.median(values):6.1f} ms (median), {max(values):6.1f} ms (max)")
+        print(f"peak RSS growth playing every frame from the bundle: {growth} MB")
+
+
+if __name__ == "__main__":
+    main()
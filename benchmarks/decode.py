@@ -0,0 +1,123 @@
+"""
+Portrait decode + resize: full decode and LANCZOS (old path) vs decode_image.
+
+    python benchmarks/decode.py --runs 20
+
+Encodes a detailed synthetic portrait the size the image models return
+(1328x1328 qwen-image, 1024x1024 flux-schnell at 1 MP) as JPEG and WebP, then
+times turning the bytes into a canvas-sized image. Peak memory is the extra
+resident set size of a fresh child process per case (Unix only).
+"""
+import argparse
+import io
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CANVAS_SIZE  # noqa: E402
+
+SOURCES = {"qwen 1328px": 1328, "flux 1024px": 1024}
+FORMATS = ("JPEG", "WEBP")
+
+
+def sample_bytes(side, fmt):
+    from PIL import Image, ImageFilter
+
+    # Noise plus gradients: compresses like a photo rather than a flat colour
+    noise = Image.effect_noise((side, side), 64).filter(ImageFilter.GaussianBlur(1))
+    gradient = Image.linear_gradient("L").resize((side, side))
+    img = Image.merge("RGB", (noise, gradient, gradient.transpose(Image.Transpose.ROTATE_90)))
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+def old_path(data, size):
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    return img.resize((size, size), Image.Resampling.LANCZOS)
+
+
+def new_path(data, size):
+    from media_pool import decode_image
+
+    return decode_image(data, size)
+
+
+def peak_rss_mb():
+    # Linux keeps the parent's ru_maxrss across fork/exec; VmHWM starts fresh with the process
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def child(path_name, sample_path, size):
+    # Everything but the decode happens first, so the growth in peak RSS is the decode
+    import PIL.Image  # noqa: F401
+    import pipeline  # noqa: F401
+
+    with open(sample_path, "rb") as file:
+        data = file.read()
+    baseline = peak_rss_mb()
+    {"old": old_path, "new": new_path}[path_name](data, size)
+    print(f"{peak_rss_mb() - baseline:.1f}")
+
+
+def peak_memory(path_name, data, size):
+    with tempfile.NamedTemporaryFile(delete=False) as file:
+        file.write(data)
+    try:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", path_name, file.name, str(size)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+    finally:
+        os.remove(file.name)
+    return float(output.split()[-1])
+
+
+def time_ms(func, data, size, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(data, size)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--size", type=int, default=CANVAS_SIZE)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        path_name, sample_path, size = args.child
+        child(path_name, sample_path, int(size))
+        return
+
+    print(f"{'source':<13}{'format':<7}{'old ms':>8}{'new ms':>8}{'old MB':>8}{'new MB':>8}")
+    for name, side in SOURCES.items():
+        for fmt in FORMATS:
+            data = sample_bytes(side, fmt)
+            print(
+                f"{name:<13}{fmt:<7}"
+                f"{time_ms(old_path, data, args.size, args.runs):8.1f}{time_ms(new_path, data, args.size, args.runs):8.1f}"
+                f"{peak_memory('old', data, args.size):8.1f}{peak_memory('new', data, args.size):8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
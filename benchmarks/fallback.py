@@ -0,0 +1,78 @@
+"""
+Model fallback under a degraded primary, against the stand-in backend.
+
+    python benchmarks/fallback.py --calls 30
+
+Runs the image stage with qwen-image made slow (well past the stage SLO) for the
+first half of the run and healthy again for the second half, once with the
+fallback chain (qwen -> flux-schnell) and once with qwen alone. Times are
+simulated seconds (real time is compressed by --scale).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MODEL_IMAGE, MODEL_IMAGE_FAST  # noqa: E402
+from model_registry import STAGE_SLO_SECONDS, ModelRegistry  # noqa: E402
+from models import ModelClient, RateGovernor  # noqa: E402
+from standin import ModelProfile, StandInBackend  # noqa: E402
+
+SLOW = ModelProfile(120)
+HEALTHY = ModelProfile(25)
+
+
+def run(chain, calls, scale):
+    backend = StandInBackend(time_scale=scale, seed=1)
+    registry = ModelRegistry(
+        chains={"image": chain},
+        slo={stage: seconds * scale for stage, seconds in STAGE_SLO_SECONDS.items()},
+        open_seconds=60 * scale,
+    )
+    client = ModelClient(
+        on_status=lambda text: None,
+        base_wait=0,
+        retry_wait=0,
+        governor=RateGovernor(max_concurrent=1, max_per_minute=10 ** 6),
+        registry=registry,
+        backend=backend,
+    )
+
+    latencies, served = [], []
+    for index in range(calls):
+        backend.profiles["qwen"] = SLOW if index < calls // 2 else HEALTHY
+        before = dict(backend.calls)
+        start = time.monotonic()
+        client.run_stage("image", {"prompt": "portrait", "aspect_ratio": "1:1"}, step_name="Image Generation")
+        latencies.append((time.monotonic() - start) / scale)
+        # The model whose call count went up last is the one that answered
+        used = [model for model in backend.calls if backend.calls[model] != before.get(model, 0)]
+        served.append(used[-1].split("/")[-1])
+    return latencies, served, registry.snapshot(), backend
+
+
+def report(name, latencies, served, snapshot, backend):
+    ordered = sorted(latencies)
+    print(f"\n{name}")
+    print(f"  p50 {statistics.median(latencies):6.1f}s   p95 {ordered[int(0.95 * (len(ordered) - 1))]:6.1f}s   "
+          f"total {sum(latencies):7.1f}s   cancelled {backend.cancelled}")
+    print("  served by: " + " ".join(model[:4] for model in served))
+    for model, health in snapshot.items():
+        print(f"  {model.split(':')[0]:<32} circuit {health['state']:<9} error rate {health['error_rate']:.0%} (last {health['calls']} calls)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=30)
+    parser.add_argument("--scale", type=float, default=0.002, help="Real seconds per simulated second")
+    args = parser.parse_args()
+
+    report("qwen -> flux-schnell (fallback + circuit breaker)", *run([MODEL_IMAGE, MODEL_IMAGE_FAST], args.calls, args.scale))
+    report("qwen only (retry the same model)", *run([MODEL_IMAGE], args.calls, args.scale))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Hedged requests on a long-tailed stage, against the stand-in backend.
+
+    python benchmarks/hedging.py --calls 400
+
+Runs the transcribe stage with a whisper profile that is usually quick but
+occasionally ten times slower, once with hedging (duplicate after the model's
+p95, at most 10% extra predictions) and once without. Times are simulated
+seconds (real time is compressed by --scale).
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MODEL_WHISPER  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from models import ModelClient, RateGovernor  # noqa: E402
+from standin import ModelProfile, StandInBackend  # noqa: E402
+
+WHISPER = ModelProfile(3, spread=0.2, tail_rate=0.05, tail_factor=10)
+
+
+def run(hedge, calls, scale, budget):
+    backend = StandInBackend(profiles={"whisper": WHISPER}, time_scale=scale, seed=7)
+    registry = ModelRegistry(hedge_budget=budget)
+    client = ModelClient(
+        on_status=lambda text: None,
+        base_wait=0,
+        retry_wait=0,
+        governor=RateGovernor(max_concurrent=64, max_per_minute=10 ** 6),
+        registry=registry,
+        backend=backend,
+        hedge_stages=("transcribe",) if hedge else (),
+    )
+
+    def ask(index):
+        client.run_stage("transcribe", {"audio": "question.wav"}, step_name="Transcription")
+
+    # A few callers at a time, like several kiosks sharing one host
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(ask, range(calls)))
+    return registry.snapshot()[MODEL_WHISPER], backend
+
+
+def report(name, health, backend, calls, scale):
+    def simulated(value):
+        return value / scale if value is not None else float("nan")
+
+    predictions = sum(backend.calls.values())
+    print(f"\n{name}")
+    print(f"  p50 {simulated(health['p50']):5.1f}s   caller p99 {simulated(health['p99']):5.1f}s   "
+          f"single-prediction p99 {simulated(health['single_p99']):5.1f}s")
+    print(f"  hedge rate {health['hedge_rate']:.1%}   hedges won {health['hedge_wins']}   "
+          f"predictions {predictions} for {calls} calls (+{predictions / calls - 1:.1%})   cancelled {backend.cancelled}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--scale", type=float, default=0.01, help="Real seconds per simulated second")
+    parser.add_argument("--budget", type=float, default=0.1, help="Max extra predictions per call")
+    args = parser.parse_args()
+
+    report("no hedging", *run(False, args.calls, args.scale, args.budget), args.calls, args.scale)
+    report(f"hedged after p95 (budget {args.budget:.0%})", *run(True, args.calls, args.scale, args.budget),
+           args.calls, args.scale)
+
+
+if __name__ == "__main__":
+    main()
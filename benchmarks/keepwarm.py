@@ -0,0 +1,94 @@
+"""
+Keep-warm pings against models that go cold, with the stand-in backend.
+
+    python benchmarks/keepwarm.py --visitors 40
+
+A visitor every ten minutes or so (exponential gaps) is transcribed and then
+spoken, with a whisper model that boots for 45 s after 5 idle minutes and an
+XTTS model that boots for 60 s after 10. The same visitors are run without
+pings and with KeepWarm learning each model's idle timeout. Times are
+simulated seconds (real time is compressed by --scale). The stand-in takes as
+long for a ping as for a real input, so ping seconds here are an upper bound.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MODEL_TTS, MODEL_WHISPER  # noqa: E402
+from keepwarm import ColdStartTracker, KeepWarm  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from models import ModelClient, RateGovernor  # noqa: E402
+from standin import ModelProfile, StandInBackend  # noqa: E402
+
+PROFILES = {
+    "whisper": ModelProfile(3, spread=0.2, cold_after=300, cold_start=45),
+    "xtts": ModelProfile(8, spread=0.2, cold_after=600, cold_start=60),
+}
+TARGETS = {MODEL_WHISPER: "transcribe", MODEL_TTS: "tts"}
+
+
+def run(warm, gaps, scale):
+    backend = StandInBackend(profiles=PROFILES, time_scale=scale, seed=3)
+    tracker = ColdStartTracker(default_interval=240 * scale, min_interval=60 * scale, max_interval=3600 * scale)
+    client = ModelClient(
+        on_status=lambda text: None,
+        base_wait=0,
+        retry_wait=0,
+        governor=RateGovernor(max_concurrent=8, max_per_minute=10 ** 6),
+        registry=ModelRegistry(),
+        backend=backend,
+        warmth=tracker,
+    )
+    keep_warm = None
+    if warm:
+        keep_warm = KeepWarm(TARGETS, client=client, tracker=tracker, hours="", tick=5 * scale, report_seconds=0)
+        keep_warm.start()
+    answers = []
+    for gap in gaps:
+        time.sleep(gap * scale)
+        start = time.monotonic()
+        client.run_stage("transcribe", {"audio": "question.wav"}, step_name="Transcription")
+        client.run_stage("tts", {"text": "Alea iacta est."}, step_name="Voice Synthesis")
+        answers.append((time.monotonic() - start) / scale)
+    if keep_warm:
+        keep_warm.stop()
+    return answers, tracker, keep_warm
+
+
+def report(name, answers, tracker, keep_warm, scale):
+    cuts = statistics.quantiles(answers, n=20)
+    print(f"\n{name}")
+    print(f"  answer p50 {statistics.median(answers):5.1f}s   p95 {cuts[18]:5.1f}s   max {max(answers):5.1f}s")
+    for model, stage in TARGETS.items():
+        # Unrounded, as report() would show real (compressed) seconds
+        warmth = tracker.models[model]
+        line = f"  {stage:<10} cold starts hit by visitors {warmth.cold['call']:3d}"
+        if keep_warm:
+            line += (
+                f"   pings {keep_warm.pings[model]:3d} ({keep_warm.ping_seconds[model] / scale:5.0f}s)"
+                f"   avoided {warmth.avoided:3d} (~{warmth.avoided_seconds / scale:5.0f}s)"
+                f"   interval {tracker.interval(model) / scale:4.0f}s"
+            )
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--visitors", type=int, default=40)
+    parser.add_argument("--gap", type=float, default=600, help="Mean simulated seconds between visitors")
+    parser.add_argument("--scale", type=float, default=0.001, help="Real seconds per simulated second")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    gaps = [rng.expovariate(1 / args.gap) for _ in range(args.visitors)]
+    report("no keep-warm", *run(False, gaps, args.scale), args.scale)
+    report("keep-warm", *run(True, gaps, args.scale), args.scale)
+
+
+if __name__ == "__main__":
+    main()
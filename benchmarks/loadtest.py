@@ -0,0 +1,216 @@
+"""
+Load test of the pipeline server engine: how many kiosks one host can serve.
+
+    python benchmarks/loadtest.py --sessions 1,2,4,8,16,32 --minutes 10
+    python benchmarks/loadtest.py --mix portrait=0.5,talking=0.3,sadtalker=0.2 --follow-up 0.5
+
+Each session is a kiosk: visitors arrive at --rate per minute, ask a question,
+watch the answer and ask follow-ups with probability --follow-up. Questions go
+through PipelineServer.submit (admission, worker pool, sessions) to the stand-in
+backend, whose account quota (--quota) throttles like Replicate's, so
+run_with_retry and the rate governor are exercised under contention. Times are
+simulated (real time is compressed by --scale).
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import AnswerCache  # noqa: E402
+from artifacts import ArtifactStore  # noqa: E402
+from budget import SpeechBudget  # noqa: E402
+from metrics import MODEL_ATTEMPTS, RATE_LIMIT_WAIT  # noqa: E402
+from model_registry import STAGE_SLO_SECONDS, ModelRegistry, percentile  # noqa: E402
+from models import ModelClient, RateGovernor  # noqa: E402
+from server import PipelineServer  # noqa: E402
+from standin import ModelProfile, StandInBackend, silent_wav  # noqa: E402
+from voices import VoiceProfiles  # noqa: E402
+
+QUESTION = "Napoleon, why did you invade Russia?"
+FOLLOW_UP = "And what happened after that?"
+WATCH_SECONDS = 40  # a visitor watching an answer before asking again
+PATIENCE_SECONDS = 300  # a visitor refused this long walks away
+# A few failures on top of the stand-in's latencies, so retries happen without throttling too
+FLAKY = {"gpt": ModelProfile(6, tail_rate=0.02, tail_factor=5, error_rate=0.02), "xtts": ModelProfile(12, error_rate=0.02)}
+
+
+class Level:
+    """Everything measured at one number of sessions."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.errors = 0
+        self.queue_waits = []
+        self.latencies = []
+
+    def add(self, **values):
+        with self.lock:
+            for key, value in values.items():
+                if isinstance(value, list):
+                    getattr(self, key).extend(value)
+                else:
+                    setattr(self, key, getattr(self, key) + value)
+
+
+def ask(server, session_id, mode, text, level, scale):
+    """Submit one question and wait for its answer, as a kiosk client would."""
+    refused_for = 0.0
+    while True:
+        job, retry_after = server.submit(session_id, mode, text=text)
+        if job:
+            break
+        level.add(rejected=1)
+        if refused_for >= PATIENCE_SECONDS:
+            level.add(abandoned=1)
+            return False
+        wait = min(retry_after, 15)
+        refused_for += wait
+        time.sleep(wait * scale)
+    level.add(submitted=1)
+    while not job.finished_at:
+        job.events_since(len(job.events), timeout=1)
+    done = time.monotonic()
+    if job.state != "done":
+        level.add(errors=1)
+        return False
+    level.add(
+        queue_waits=[(job.started_at - job.submitted_at) / scale],
+        latencies=[(done - job.submitted_at + refused_for * scale) / scale],
+    )
+    return True
+
+
+def kiosk(server, index, args, mix, level, stop_at, rng):
+    session = 0
+    scale = args.scale
+    while True:
+        time.sleep(rng.expovariate(args.rate / 60) * scale)
+        if time.monotonic() >= stop_at:
+            return
+        session += 1
+        session_id = f"k{index}-{session}"
+        mode = rng.choices(list(mix), weights=list(mix.values()))[0]
+        text = QUESTION
+        while ask(server, session_id, mode, text, level, scale) and rng.random() < args.follow_up:
+            time.sleep(WATCH_SECONDS * scale)
+            text = FOLLOW_UP
+
+
+def attempts():
+    """run_with_retry attempts so far, by result."""
+    counts = {}
+    for labels, series in MODEL_ATTEMPTS.samples():
+        counts[labels["result"]] = counts.get(labels["result"], 0) + series.value
+    return counts
+
+
+def run_level(sessions, args, mix, workdir):
+    scale = args.scale
+    backend = StandInBackend(profiles=FLAKY, time_scale=scale, per_minute=args.quota, seed=sessions)
+    governor = RateGovernor(max_concurrent=args.max_concurrent, max_per_minute=args.governor_per_minute, window=60 * scale)
+    registry = ModelRegistry(
+        slo={stage: seconds * scale for stage, seconds in STAGE_SLO_SECONDS.items()}, open_seconds=60 * scale
+    )
+    server = PipelineServer(
+        workers=args.workers,
+        max_queue=args.max_queue,
+        max_wait=60 * scale,
+        store=ArtifactStore(os.path.join(workdir, f"runs-{sessions}"), max_runs=10 ** 6),
+        cache=AnswerCache(threshold=0),
+        governor=governor,
+        client_factory=lambda on_status: ModelClient(
+            on_status=on_status, base_wait=0, governor=governor, registry=registry, backend=backend, wait_scale=scale
+        ),
+        voices=VoiceProfiles(os.path.join(workdir, "voices")),
+        budget=SpeechBudget(path=None),
+    )
+
+    level = Level()
+    before, waited_before = attempts(), RATE_LIMIT_WAIT.default.value
+    start = time.monotonic()
+    stop_at = start + args.minutes * 60 * scale
+    threads = [
+        threading.Thread(target=kiosk, args=(server, index, args, mix, level, stop_at, random.Random(index)), daemon=True)
+        for index in range(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed_minutes = (time.monotonic() - start) / scale / 60
+    after = attempts()
+    level.retried = {key: after.get(key, 0) - before.get(key, 0) for key in ("rate_limited", "error", "timeout")}
+    level.governor_wait = (RATE_LIMIT_WAIT.default.value - waited_before) / scale
+    level.throttled = backend.throttled
+    level.throughput = len(level.latencies) / elapsed_minutes
+    server.executor.shutdown(wait=True)
+    return level
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="1,2,4,8,16,32", help="Concurrent sessions (kiosks) per level")
+    parser.add_argument("--rate", type=float, default=1.0, help="Visitors per minute at each kiosk")
+    parser.add_argument("--mix", default="portrait=0.7,talking=0.2,sadtalker=0.1", help="Modes and their weights")
+    parser.add_argument("--follow-up", type=float, default=0.4, help="Chance a visitor asks another question")
+    parser.add_argument("--minutes", type=float, default=10, help="Simulated minutes of arrivals per level")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=8)
+    parser.add_argument("--max-concurrent", type=int, default=8, help="Governor: predictions at once")
+    parser.add_argument("--governor-per-minute", type=int, default=60, help="Governor: prediction starts per minute")
+    parser.add_argument("--quota", type=int, default=30, help="Stand-in account: prediction starts per minute")
+    parser.add_argument("--scale", type=float, default=0.005, help="Real seconds per simulated second")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp()
+    voices = os.path.join(workdir, "voices")
+    os.makedirs(voices)
+    for gender in ("male", "female"):
+        with open(os.path.join(voices, f"{gender}.wav"), "wb") as file:
+            file.write(silent_wav(6))
+
+    print(f"{'sessions':>8} {'answers/min':>11} {'refused':>8} {'failed':>6} {'queue p50/p95':>14} "
+          f"{'e2e p50':>8} {'p95':>6} {'p99':>6} {'throttled':>9} {'retries':>8} {'paused':>7}")
+    baseline = None
+    saturation = None
+    for sessions in [int(value) for value in args.sessions.split(",")]:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            level = run_level(sessions, args, mix, workdir)
+        p50, p95, p99 = (percentile(level.latencies, q) or 0 for q in (0.5, 0.95, 0.99))
+        q50, q95 = (percentile(level.queue_waits, q) or 0 for q in (0.5, 0.95))
+        refused = level.rejected / max(level.submitted + level.rejected, 1)
+        retries = sum(level.retried.values())
+        print(f"{sessions:>8} {level.throughput:>11.1f} {refused:>7.0%} {level.errors:>6} {q50:>6.0f}s/{q95:>5.0f}s "
+              f"{p50:>7.0f}s {p95:>5.0f}s {p99:>5.0f}s {level.throttled:>9} {retries:>8.0f} {level.governor_wait:>6.0f}s")
+        baseline = baseline or p50
+        # Saturated: questions queue for a good part of an answer's time, or visitors are turned away
+        if saturation is None and (q95 > baseline / 2 or refused > 0.05 or level.abandoned):
+            saturation = sessions
+    if saturation:
+        print(f"Saturated at {saturation} sessions (queue p95 over half the single-kiosk answer time, or over 5% refused)")
+    else:
+        print("Not saturated at the levels tried")
+
+
+if __name__ == "__main__":
+    main()
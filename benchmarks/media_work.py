@@ -0,0 +1,114 @@
+"""
+Local media work on threads vs the media worker pool, with several questions in flight.
+
+    python benchmarks/media_work.py --questions 1,2,4 --workers 4
+
+Every question does what the app does with its files: decode and resize a
+portrait, precompute a 40-step fade, and clip a long speech. A thread standing
+in for the Tk loop ticks every 10 ms meanwhile; its lateness is how much the
+work held the GIL. Throughput only scales with the pool if the machine has the
+cores for it (this machine: os.cpu_count()).
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CANVAS_SIZE  # noqa: E402
+from media_pool import MediaPool  # noqa: E402
+
+TICK = 0.01
+SPEECH_SECONDS = 60
+
+
+def sample_portrait(side=1328):
+    from PIL import Image, ImageFilter
+
+    noise = Image.effect_noise((side, side), 64).filter(ImageFilter.GaussianBlur(1))
+    gradient = Image.linear_gradient("L").resize((side, side))
+    img = Image.merge("RGB", (noise, gradient, gradient.transpose(Image.Transpose.ROTATE_90)))
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def sample_speech(seconds=SPEECH_SECONDS, sample_rate=24000):
+    import numpy as np
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, np.random.default_rng(0).uniform(-0.5, 0.5, seconds * sample_rate), sample_rate, format="WAV")
+    return buffer.getvalue()
+
+
+def question(pool, portrait, speech, size):
+    from PIL import Image
+
+    img = pool.decode_image(portrait, size).result()
+    fade = pool.fade_frames(Image.new("RGB", img.size, "black"), img, 40).result()
+    fade.close()
+    pool.clip_audio(speech, SPEECH_SECONDS / 2).result()
+
+
+def ui_ticks(stop, lags):
+    due = time.perf_counter() + TICK
+    while not stop.is_set():
+        time.sleep(max(due - time.perf_counter(), 0))
+        now = time.perf_counter()
+        lags.append(max(now - due, 0.0))
+        due = now + TICK
+
+
+def run(pool, questions, rounds, portrait, speech, size):
+    stop = threading.Event()
+    lags = []
+    ticker = threading.Thread(target=ui_ticks, args=(stop, lags), daemon=True)
+    ticker.start()
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=lambda: [question(pool, portrait, speech, size) for _ in range(rounds)])
+        for _ in range(questions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    ticker.join()
+    lags.sort()
+    return questions * rounds / elapsed, lags[int(len(lags) * 0.95)] * 1000, lags[-1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", default="1,2,4", help="Questions in flight at once")
+    parser.add_argument("--rounds", type=int, default=3, help="Questions each one runs in turn")
+    parser.add_argument("--workers", type=int, default=max(min((os.cpu_count() or 2) - 1, 4), 1))
+    parser.add_argument("--size", type=int, default=CANVAS_SIZE)
+    args = parser.parse_args()
+
+    portrait, speech = sample_portrait(), sample_speech()
+    pools = {"threads": MediaPool(0), f"{args.workers} processes": MediaPool(args.workers)}
+    for pool in pools.values():
+        for future in pool.warm():
+            future.result()
+        question(pool, portrait, speech, args.size)
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'pool':<14}{'questions':>10}{'per sec':>9}{'tick p95 ms':>13}{'max ms':>8}")
+    for questions in (int(n) for n in args.questions.split(",")):
+        for name, pool in pools.items():
+            rate, p95, worst = run(pool, questions, args.rounds, portrait, speech, args.size)
+            print(f"{name:<14}{questions:>10}{rate:>9.2f}{p95:>13.1f}{worst:>8.1f}")
+    for pool in pools.values():
+        pool.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Time to first frame in portrait mode, progressive vs final-only painting, against
+the stand-in backend.
+
+    python benchmarks/progressive.py --runs 5
+
+Runs the typed-question pipeline (brain, image, voice) and reports when playback
+could start (the pipeline has returned) and when the high-quality portrait is
+on hand. Times are simulated seconds (real time is compressed by --scale).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import AnswerCache  # noqa: E402
+from artifacts import ArtifactStore  # noqa: E402
+from budget import SpeechBudget  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from models import ModelClient, RateGovernor  # noqa: E402
+from modes import PortraitMode  # noqa: E402
+from pipeline import Pipeline  # noqa: E402
+from standin import StandInBackend  # noqa: E402
+
+
+class FinalOnlyMode(PortraitMode):
+    model_image_draft = None
+
+
+def run(mode, runs, scale, store):
+    first_frame, final = [], []
+    for index in range(runs):
+        client = ModelClient(
+            on_status=lambda text: None,
+            base_wait=0,
+            retry_wait=0,
+            governor=RateGovernor(max_concurrent=8, max_per_minute=10 ** 6),
+            registry=ModelRegistry(),
+            backend=StandInBackend(time_scale=scale, seed=index),
+        )
+        # The same question every time: with the answer cache on, only the first would be painted
+        # Stand-in stage timings must not end up in the kiosk's speech_budget.json
+        pipeline = Pipeline(
+            mode, client=client, on_status=lambda text: None, store=store, cache=AnswerCache(threshold=0),
+            budget=SpeechBudget(path=None),
+        )
+        start = time.monotonic()
+        result = pipeline.run(None, text="Napoleon, why did you invade Russia?")
+        first_frame.append((time.monotonic() - start) / scale)
+        if result.final_images:
+            result.final_images.result()
+        final.append((time.monotonic() - start) / scale)
+    return first_frame, final
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=0.02, help="Real seconds per simulated second")
+    args = parser.parse_args()
+
+    store = ArtifactStore(tempfile.mkdtemp())
+    for name, mode in (("final only (qwen)", FinalOnlyMode()), ("progressive (flux draft + qwen)", PortraitMode())):
+        first_frame, final = run(mode, args.runs, args.scale, store)
+        print(f"{name:<32} first frame {statistics.median(first_frame):5.1f}s   "
+              f"final portrait {statistics.median(final):5.1f}s")
+
+
+if __name__ == "__main__":
+    main()
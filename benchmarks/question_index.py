@@ -0,0 +1,94 @@
+"""
+Near-duplicate question index: lookup latency and load time at 100k questions.
+
+    python benchmarks/question_index.py --entries 100000
+
+Fills a SimilarityIndex with generated visitor questions, saves it, loads it back
+as the app would at startup, and times lookups of reworded questions. Exits
+with an error if the lookup p99 misses --target-ms. The target is checked on
+the lookup thread's CPU time: on a busy or shared host the wall-clock p99 also
+holds the time the thread was not scheduled at all, so both are printed.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ANSWER_CACHE_THRESHOLD  # noqa: E402
+from similarity import SimilarityIndex  # noqa: E402
+
+FIGURES = [
+    "Napoleon", "Cleopatra", "Julius Caesar", "Joan of Arc", "Abraham Lincoln", "Queen Victoria",
+    "Genghis Khan", "Marie Curie", "Leonardo da Vinci", "Alexander the Great", "Ada Lovelace", "Confucius",
+]
+TOPICS = [
+    "invade Russia", "fall in love", "become a leader", "fight the war", "build the empire", "study science",
+    "paint the picture", "lose the battle", "write the laws", "travel so far", "choose your friends", "never give up",
+]
+TEMPLATES = [
+    "Why did {figure} {topic}?",
+    "{figure}, why did you {topic}?",
+    "I want to ask {figure} why they {topic}",
+    "How did {figure} {topic} and what happened {n} years later?",
+    "Tell me, {figure}, what made you {topic} in year {n}?",
+]
+REWORDED = [
+    ("Why did {figure} {topic}?", "{figure}, why {topic}?"),
+    ("{figure}, why did you {topic}?", "Why did you {topic}, {figure}?"),
+]
+
+
+def question(rng, template):
+    return template.format(figure=rng.choice(FIGURES), topic=rng.choice(TOPICS), n=rng.randrange(1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=ANSWER_CACHE_THRESHOLD)
+    parser.add_argument("--target-ms", type=float, default=5.0, help="Lookup p99 to meet")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    directory = tempfile.mkdtemp()
+    index = SimilarityIndex(directory)
+
+    start = time.perf_counter()
+    for number in range(args.entries):
+        index.add(question(rng, rng.choice(TEMPLATES)), {"run": f"answer-{number}"})
+    index.save()
+    print(f"built {len(index)} entries in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    index = SimilarityIndex(directory)
+    print(f"loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    timings, cpu_timings, hits = [], [], 0
+    for _ in range(args.lookups):
+        asked, stored = rng.choice(REWORDED)
+        figure, topic = rng.choice(FIGURES), rng.choice(TOPICS)
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        matches = index.search(asked.format(figure=figure, topic=topic), args.threshold)
+        timings.append((time.perf_counter() - start) * 1000)
+        cpu_timings.append((time.thread_time() - cpu_start) * 1000)
+        hits += bool(matches)
+    timings.sort()
+    cpu_timings.sort()
+    p99 = cpu_timings[int(0.99 * (len(cpu_timings) - 1))]
+    print(f"lookup p50 {statistics.median(timings):.2f} ms   p99 {timings[int(0.99 * (len(timings) - 1))]:.2f} ms   "
+          f"(CPU p99 {p99:.2f} ms)   hit rate {hits / args.lookups:.0%} at threshold {args.threshold}")
+
+    unrelated = index.search("What is the airspeed velocity of an unladen swallow?", args.threshold)
+    print(f"unrelated question matches: {len(unrelated)}")
+    if p99 > args.target_ms:
+        sys.exit(f"lookup CPU p99 {p99:.2f} ms is over the {args.target_ms:g} ms target")
+
+
+if __name__ == "__main__":
+    main()
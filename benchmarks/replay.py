@@ -0,0 +1,105 @@
+"""
+Local overhead per pipeline stage, replaying recorded model calls with no latency.
+
+    python benchmarks/replay.py --runs 5
+    python benchmarks/replay.py --cassette cassettes/napoleon --mode talking
+
+With no --cassette, a few questions are first recorded against the stand-in
+backend. Replaying at speed 0 leaves only what runs here (prompt building,
+parsing, decoding, resizing, file I/O), so two checkouts can be compared on the
+same cassette and a slower stage shows up as a regression.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import AnswerCache  # noqa: E402
+from artifacts import ArtifactStore  # noqa: E402
+from budget import SpeechBudget  # noqa: E402
+from cassettes import RecordingBackend, ReplayBackend  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from models import ModelClient, RateGovernor  # noqa: E402
+from modes import get_mode  # noqa: E402
+from pipeline import Pipeline  # noqa: E402
+from standin import StandInBackend  # noqa: E402
+from voices import VoiceProfiles  # noqa: E402
+
+QUESTIONS = (
+    "Napoleon, why did you invade Russia?",
+    "Cleopatra, what was Alexandria like?",
+    "Abraham Lincoln, how did you write the Gettysburg Address?",
+)
+
+
+def answer_all(backend, mode, workdir, store):
+    """Seconds spent in each stage over all QUESTIONS, keyed by stage."""
+    client = ModelClient(
+        on_status=lambda text: None,
+        base_wait=0,
+        retry_wait=0,
+        governor=RateGovernor(max_concurrent=8, max_per_minute=10 ** 6),
+        registry=ModelRegistry(),
+        backend=backend,
+    )
+    marks = []
+    pipeline = Pipeline(
+        mode,
+        client=client,
+        on_status=lambda text: None,
+        on_stage=lambda stage, index, total: marks.append((stage, time.perf_counter())),
+        store=store,
+        cache=AnswerCache(threshold=0),
+        voices=VoiceProfiles(os.path.join(workdir, "voices")),
+        # Replayed stage timings must not end up in the kiosk's speech_budget.json
+        budget=SpeechBudget(path=None),
+    )
+    stages = {}
+    for question in QUESTIONS:
+        pipeline.conversation.reset()
+        marks.clear()
+        result = pipeline.run(None, text=question)
+        if result.final_images:
+            result.final_images.result()
+        marks.append(("end", time.perf_counter()))
+        for (stage, start), (_, end) in zip(marks, marks[1:]):
+            stages[stage] = stages.get(stage, 0.0) + end - start
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cassette", help="Replay this cassette instead of recording one from the stand-in")
+    parser.add_argument("--mode", default="portrait")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=0.01, help="Stand-in seconds per simulated second when recording")
+    args = parser.parse_args()
+
+    mode = get_mode(args.mode)
+    workdir = tempfile.mkdtemp()
+    store = ArtifactStore(os.path.join(workdir, "runs"))
+    cassette = args.cassette
+    if not cassette:
+        cassette = os.path.join(workdir, "cassette")
+        recording = RecordingBackend(StandInBackend(time_scale=args.scale, seed=1), cassette)
+        answer_all(recording, mode, workdir, store)
+
+    recorded = ReplayBackend(cassette)
+    model_seconds = sum(entry["latency"] for entries in recorded.by_model.values() for entry in entries)
+    runs = [answer_all(ReplayBackend(cassette, speed=0), mode, workdir, store) for _ in range(args.runs)]
+
+    print(f"{len(QUESTIONS)} questions, {args.mode} mode; recorded model time {model_seconds:.2f}s")
+    total = 0.0
+    for stage in runs[0]:
+        median = statistics.median(run[stage] for run in runs) / len(QUESTIONS)
+        total += median
+        print(f"  {stage:<12} {median * 1000:8.1f} ms per question")
+    print(f"  {'local total':<12} {total * 1000:8.1f} ms per question (median of {args.runs} replays)")
+
+
+if __name__ == "__main__":
+    main()
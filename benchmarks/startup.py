@@ -0,0 +1,64 @@
+"""
+Cold start benchmark: process launch to window interactive, per presentation mode.
+
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --mode sadtalker
+
+Each run starts a fresh interpreter with `main.py --startup-probe`, which exits as
+soon as the window is mapped and idle. Wall time is measured from here (including
+interpreter start), the in-process time and any heavy modules already imported are
+reported by the child.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modes import MODES  # noqa: E402
+
+
+def measure(mode, runs):
+    wall, in_process, heavy = [], [], set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "main.py"), "--mode", mode, "--startup-probe"],
+            cwd=ROOT,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for line in proc.stdout:
+            if line.startswith("STARTUP_READY"):
+                wall.append((time.perf_counter() - start) * 1000)
+                _, ms, loaded = line.split()
+                in_process.append(float(ms))
+                heavy.update(name for name in loaded[len("heavy="):].split(",") if name != "-")
+                break
+        proc.wait()
+        if proc.returncode:
+            raise SystemExit(f"main.py --mode {mode} exited with {proc.returncode}")
+    return wall, in_process, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=sorted(MODES), help="Only benchmark this mode")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'wall p50':>9} {'wall max':>9} {'in-proc p50':>12}  heavy imports at startup")
+    for mode in [args.mode] if args.mode else sorted(MODES):
+        wall, in_process, heavy = measure(mode, args.runs)
+        print(
+            f"{mode:<10} {statistics.median(wall):>7.0f}ms {max(wall):>7.0f}ms "
+            f"{statistics.median(in_process):>10.0f}ms  {', '.join(sorted(heavy)) or 'none'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
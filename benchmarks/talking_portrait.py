@@ -0,0 +1,136 @@
+"""
+Local talking portrait vs the remote video modes: time to first frame, and the
+local renderer's frame rate at canvas size.
+
+    python benchmarks/talking_portrait.py --runs 3
+
+First frame: the typed-question pipeline of each mode against the stand-in
+backend (simulated seconds, compressed by --scale), plus for the talking mode
+the real time to read the speech and lay out the face. Frame rate: frames of a
+30 s answer rendered back to back on this CPU, as PIL images ready for display.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_cache import AnswerCache  # noqa: E402
+from artifacts import ArtifactStore  # noqa: E402
+from budget import SpeechBudget  # noqa: E402
+from config import CANVAS_SIZE  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from models import ModelClient, RateGovernor  # noqa: E402
+from modes import SadTalkerMode, TalkingMode, WanMode  # noqa: E402
+from pipeline import Pipeline  # noqa: E402
+from standin import StandInBackend, silent_wav  # noqa: E402
+from voices import VoiceProfiles  # noqa: E402
+
+SPEECH_SECONDS = 30
+
+
+def sample_portrait():
+    from PIL import Image, ImageDraw, ImageFilter
+
+    img = Image.effect_noise((CANVAS_SIZE, CANVAS_SIZE), 40).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    s = CANVAS_SIZE
+    draw.ellipse((s * 0.3, s * 0.18, s * 0.7, s * 0.68), fill=(200, 160, 130))
+    for x in (0.4, 0.6):
+        draw.ellipse((s * (x - 0.04), s * 0.36, s * (x + 0.04), s * 0.4), fill=(40, 30, 30))
+    draw.rectangle((s * 0.43, s * 0.55, s * 0.57, s * 0.57), fill=(150, 60, 60))
+    return img.filter(ImageFilter.GaussianBlur(1))
+
+
+def sample_speech(path, sample_rate=24000):
+    """Noise shaped like syllables (about 4 per second) with pauses between phrases."""
+    import numpy as np
+    import soundfile as sf
+
+    rng = np.random.default_rng(0)
+    t = np.arange(SPEECH_SECONDS * sample_rate) / sample_rate
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.2 * t) > -0.6)
+    sf.write(path, (rng.standard_normal(len(t)) * 0.2 * syllables).astype("float32"), sample_rate)
+
+
+def local_first_frame(audio_path):
+    from talking import TalkingPortrait
+
+    img = sample_portrait()
+    start = time.perf_counter()
+    talking = TalkingPortrait.from_audio(img, audio_path)
+    talking.frame(0.0)
+    return time.perf_counter() - start, talking
+
+
+def render_rate(talking, frames):
+    from talking import FPS
+
+    start = time.perf_counter()
+    for index in range(frames):
+        talking.frame(index / FPS)
+    return frames / (time.perf_counter() - start)
+
+
+def pipeline_seconds(mode, runs, scale, store, voices):
+    times = []
+    for index in range(runs):
+        client = ModelClient(
+            on_status=lambda text: None,
+            base_wait=0,
+            retry_wait=0,
+            governor=RateGovernor(max_concurrent=8, max_per_minute=10 ** 6),
+            registry=ModelRegistry(),
+            backend=StandInBackend(time_scale=scale, seed=index),
+        )
+        pipeline = Pipeline(
+            mode, client=client, on_status=lambda text: None, store=store, cache=AnswerCache(threshold=0), voices=voices,
+            # Stand-in stage timings must not end up in the kiosk's speech_budget.json
+            budget=SpeechBudget(path=None),
+        )
+        start = time.monotonic()
+        pipeline.run(None, text="Napoleon, why did you invade Russia?")
+        times.append((time.monotonic() - start) / scale)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=0.01, help="Real seconds per simulated second")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    store = ArtifactStore(os.path.join(workdir, "runs"))
+    # Local default clips, so no voice is downloaded
+    voices = VoiceProfiles(os.path.join(workdir, "voices"))
+    os.makedirs(voices.directory)
+    for gender in voices.remote:
+        with open(os.path.join(voices.directory, f"{gender}.wav"), "wb") as file:
+            file.write(silent_wav(6))
+    audio_path = os.path.join(workdir, "speech.wav")
+    sample_speech(audio_path)
+
+    setup = []
+    for _ in range(args.runs):
+        seconds, talking = local_first_frame(audio_path)
+        setup.append(seconds)
+    setup = statistics.median(setup)
+    fps = render_rate(talking, SPEECH_SECONDS * 25)
+    print(f"local renderer: {setup * 1000:.0f} ms to the first frame of a {SPEECH_SECONDS}s answer, "
+          f"{fps:.0f} fps at {CANVAS_SIZE}x{CANVAS_SIZE}")
+
+    for name, mode, local in (
+        ("sadtalker (remote lip-sync)", SadTalkerMode(), 0.0),
+        ("wan (remote image-to-video)", WanMode(), 0.0),
+        ("talking (local)", TalkingMode(), setup),
+    ):
+        seconds = pipeline_seconds(mode, args.runs, args.scale, store, voices) + local
+        print(f"{name:<30} first frame {seconds:6.1f}s")
+
+
+if __name__ == "__main__":
+    main()
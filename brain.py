@@ -0,0 +1,198 @@
+import ast
+import json
+import re
+import threading
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+from metrics import METRICS
+
+
+class BrainParseError(Exception):
+    pass
+
+
+# --- Response Schema ---
+class BrainResponse(BaseModel):
+    character_name: str
+    gender: str = "male"
+    monologue: str
+
+    @field_validator("character_name", "monologue")
+    @classmethod
+    def not_blank(cls, value):
+        value = value.strip()
+        if not value:
+            raise ValueError("must not be empty")
+        return value
+
+    @field_validator("gender", mode="before")
+    @classmethod
+    def normalize_gender(cls, value):
+        # Voices only exist for "male" and "female"; anything unclear gets the default voice
+        value = str(value or "").strip().lower()
+        if value.startswith(("f", "w")) or value in ("she", "her"):
+            return "female"
+        return "male"
+
+
+# --- Parse Statistics ---
+class ParseStats:
+    """How often brain output parsed cleanly, needed repair, needed a re-ask or was lost."""
+
+    OUTCOMES = ("clean", "repaired", "reasked", "failed")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(self.OUTCOMES, 0)
+
+    def record(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def summary(self):
+        with self.lock:
+            total = sum(self.counts.values())
+            if not total:
+                return "no responses yet"
+            usable = total - self.counts["failed"]
+            return (
+                f"{usable}/{total} usable ({usable / total:.0%}), "
+                f"repaired {self.counts['repaired'] / total:.0%}, "
+                f"re-asked {self.counts['reasked'] / total:.0%}"
+            )
+
+
+BRAIN_STATS = ParseStats()
+
+
+def brain_metrics():
+    with BRAIN_STATS.lock:
+        counts = dict(BRAIN_STATS.counts)
+    for outcome, count in counts.items():
+        yield "history_brain_responses_total", "counter", "Brain replies by parse outcome", {"outcome": outcome}, count
+
+
+METRICS.add_collector(brain_metrics)
+
+
+# --- Tolerant Extraction ---
+def strip_fences(text):
+    return text.replace("```json", "").replace("```", "").strip()
+
+
+def remove_trailing_commas(text):
+    return re.sub(r",\s*([}\]])", r"\1", text)
+
+
+def close_truncated(text):
+    """Close an unterminated string and any open brackets (output cut off by max_tokens)."""
+    stack = []
+    in_string = False
+    escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if escape:
+        text = text[:-1]
+    if in_string:
+        text += '"'
+    # A key with no value yet, or a dangling comma, can't be completed sensibly
+    text = re.sub(r',?\s*"[^"]*"\s*:\s*$', "", text)
+    text = re.sub(r",\s*$", "", text)
+    return text + "".join(reversed(stack))
+
+
+def regex_fields(text):
+    """Last resort: pull the three fields out one by one, accepting a cut-off monologue."""
+    data = {}
+    for key in ("character_name", "gender"):
+        match = re.search(rf'"{key}"\s*:\s*"((?:[^"\\]|\\.)*)"', text)
+        if match:
+            data[key] = match.group(1)
+    match = re.search(r'"monologue"\s*:\s*"((?:[^"\\]|\\.)*)', text, re.S)
+    if match:
+        data["monologue"] = match.group(1).replace('\\"', '"').replace("\\n", "\n")
+    return data
+
+
+def trim_to_sentence(text):
+    # Don't let a truncated monologue stop mid-sentence
+    text = text.rstrip()
+    end = max(text.rfind("."), text.rfind("!"), text.rfind("?"))
+    if end == len(text) - 1:
+        return text
+    if end > len(text) // 2:
+        return text[: end + 1]
+    return text.rstrip(",;: ") + "..."
+
+
+def candidates(text):
+    """Yield (data, repaired, truncated) interpretations of the raw output, best first."""
+    cleaned = strip_fences(text)
+    yield cleaned, False, False
+
+    start = cleaned.find("{")
+    if start == -1:
+        return
+    end = cleaned.rfind("}")
+    body = cleaned[start:end + 1] if end > start else cleaned[start:]
+
+    yield body, True, False
+    yield remove_trailing_commas(body), True, False
+
+    closed = close_truncated(remove_trailing_commas(cleaned[start:]))
+    yield closed, True, end <= start
+
+    try:
+        evaluated = ast.literal_eval(body)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        # Unhashable keys ("{[1]: 2}") or nesting too deep for the parser: not a dict literal
+        evaluated = None
+    if evaluated is not None:
+        yield evaluated, True, False
+
+    yield regex_fields(cleaned[start:]), True, end <= start
+
+
+def parse_brain_response(text, fallback_name=None):
+    """
+    Parse brain output into a BrainResponse, repairing common malformations.
+
+    Returns (response, outcome) where outcome is "clean" or "repaired".
+    fallback_name fills in a missing character_name during a conversation.
+    """
+    for data, repaired, truncated in candidates(text):
+        if isinstance(data, str):
+            try:
+                data = json.loads(data, strict=not repaired)
+            except (json.JSONDecodeError, RecursionError):
+                continue
+        if not isinstance(data, dict):
+            continue
+
+        if fallback_name and not data.get("character_name"):
+            data["character_name"] = fallback_name
+            repaired = True
+        try:
+            response = BrainResponse.model_validate(data)
+        except ValidationError:
+            continue
+
+        if truncated:
+            response.monologue = trim_to_sentence(response.monologue)
+        return response, "repaired" if repaired else "clean"
+
+    raise BrainParseError(f"Could not read brain output: {text[:80]!r}")
@@ -0,0 +1,188 @@
+"""
+Speech budget: how long a monologue may be for the answer to be ready in time.
+
+Every answered question teaches the planner how long each stage of its mode
+took for a monologue of that many words, and how many words the voice speaks
+per second. Before the brain is asked, those fits give the longest monologue
+that keeps within the target answer time (HISTORY_TARGET_ANSWER_SECONDS) and the
+mode's maximum speech duration. The brain is told that word budget and gets a
+max_tokens to match, so no speech is synthesized only to be cut off.
+"""
+import collections
+import json
+import os
+import re
+import threading
+
+from config import MAX_SPEECH_SECONDS, SPEECH_BUDGET_PATH, TARGET_ANSWER_SECONDS
+
+DEFAULT_WORDS = 150  # the length the brain was always asked for
+MIN_WORDS = 25  # shorter than this isn't an answer
+SAMPLES = 50  # recent runs kept per fit
+# English runs about 1.3 tokens per word; the JSON around the monologue needs about 40 more
+TOKENS_PER_WORD = 1.4
+JSON_TOKENS = 40
+TOKEN_MARGIN = 1.25  # room for a budget the brain overshoots a little
+SPEECH_MARGIN = 0.9  # plan for 90% of the maximum speech duration
+
+# Before any runs: (seconds, seconds per monologue word) per stage, and spoken words per second
+PRIOR_COSTS = {
+    "transcribe": (4.0, 0.0),
+    "think": (3.0, 0.03),
+    "paint": (8.0, 0.0),
+    "animate": (60.0, 0.0),
+    "speak": (4.0, 0.08),
+    "lipsync": (20.0, 0.6),
+}
+PRIOR_WORDS_PER_SECOND = 2.5
+
+
+def word_count(text):
+    return len(text.split()) if text else 0
+
+
+def trim_to_words(text, words):
+    """text cut at the last sentence end within words (at least one sentence is kept)."""
+    if word_count(text) <= words:
+        return text
+    sentences = re.findall(r".+?(?:[.!?]+[\"')]*(?=\s)|$)", text.strip(), re.S)
+    kept = []
+    for sentence in sentences:
+        if kept and word_count(" ".join(kept + [sentence])) > words:
+            break
+        kept.append(sentence.strip())
+    return " ".join(kept)
+
+
+def linear_fit(samples, prior):
+    """(intercept, slope) of seconds over words; the prior until the words vary enough to fit."""
+    if not samples:
+        return prior
+    xs = [words for words, _ in samples]
+    ys = [seconds for _, seconds in samples]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    if len(samples) < 3 or spread < 100:
+        # Too little length variation to see a slope: keep the prior's, move the intercept
+        slope = prior[1]
+    else:
+        slope = max(sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread, 0.0)
+    return max(mean_y - slope * mean_x, 0.0), slope
+
+
+class SpeechPlan:
+    """The monologue length asked of the brain, and what it should cost."""
+
+    def __init__(self, words, max_tokens, predicted_seconds, limit):
+        self.words = words
+        self.max_tokens = max_tokens
+        self.predicted_seconds = predicted_seconds
+        # What set the budget: "default", "speech" (max duration) or "target" (answer time)
+        self.limit = limit
+
+    def __repr__(self):
+        return f"SpeechPlan({self.words} words, max_tokens={self.max_tokens}, ~{self.predicted_seconds:.0f}s, {self.limit})"
+
+
+# --- Speech Budget Planner ---
+class SpeechBudget:
+    def __init__(self, path=SPEECH_BUDGET_PATH, target_seconds=TARGET_ANSWER_SECONDS,
+                 max_speech_seconds=MAX_SPEECH_SECONDS):
+        self.path = path
+        self.target_seconds = target_seconds
+        self.max_speech_seconds = max_speech_seconds
+        self.lock = threading.Lock()
+        # "mode/stage" -> (words, seconds); mode -> (words, seconds of speech)
+        self.stages = collections.defaultdict(lambda: collections.deque(maxlen=SAMPLES))
+        self.speech = collections.defaultdict(lambda: collections.deque(maxlen=SAMPLES))
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    saved = json.load(file)
+                for key, samples in saved.get("stages", {}).items():
+                    self.stages[key].extend(tuple(sample) for sample in samples)
+                for key, samples in saved.get("speech", {}).items():
+                    self.speech[key].extend(tuple(sample) for sample in samples)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring saved speech budget: {e}")
+
+    def words_per_second(self, mode):
+        with self.lock:
+            samples = list(self.speech[mode.name])
+        words = sum(count for count, _ in samples)
+        seconds = sum(duration for _, duration in samples)
+        if words and seconds:
+            return words / seconds
+        return PRIOR_WORDS_PER_SECOND * (mode.tts_speed or 1.0)
+
+    def cost(self, mode, stage):
+        with self.lock:
+            samples = list(self.stages[f"{mode.name}/{stage}"])
+        return linear_fit(samples, PRIOR_COSTS.get(stage, (0.0, 0.0)))
+
+    def max_speech(self, mode):
+        return self.max_speech_seconds or mode.max_speech_duration
+
+    def plan(self, mode, typed=False):
+        """The SpeechPlan for the next question in mode (typed questions skip transcription)."""
+        words, limit = DEFAULT_WORDS, "default"
+
+        max_speech = self.max_speech(mode)
+        if max_speech:
+            fits = int(max_speech * SPEECH_MARGIN * self.words_per_second(mode))
+            if fits < words:
+                words, limit = fits, "speech"
+
+        stages = [stage for stage in mode.stages if not (typed and stage == "transcribe")]
+        costs = [self.cost(mode, stage) for stage in stages]
+        fixed = sum(intercept for intercept, _ in costs)
+        per_word = sum(slope for _, slope in costs)
+        if self.target_seconds and per_word > 0:
+            fits = int((self.target_seconds - fixed) / per_word)
+            if fits < words:
+                words, limit = fits, "target"
+        if words < MIN_WORDS:
+            print(f"Answer time target of {self.target_seconds:g}s can't be met in {mode.name} mode; "
+                  f"asking for {MIN_WORDS} words")
+            words = MIN_WORDS
+
+        max_tokens = int((words * TOKENS_PER_WORD + JSON_TOKENS) * TOKEN_MARGIN)
+        return SpeechPlan(words, max_tokens, fixed + per_word * words, limit)
+
+    def observe(self, mode, timings, words, speech_seconds=None):
+        """Learn from one answered question: {stage: seconds}, its monologue words and speech length."""
+        if not words:
+            return
+        with self.lock:
+            for stage, seconds in timings.items():
+                self.stages[f"{mode.name}/{stage}"].append((words, round(seconds, 3)))
+            if speech_seconds:
+                self.speech[mode.name].append((words, round(speech_seconds, 3)))
+            saved = {
+                "stages": {key: list(samples) for key, samples in self.stages.items()},
+                "speech": {key: list(samples) for key, samples in self.speech.items()},
+            }
+        self._save(saved)
+
+    def _save(self, saved):
+        if not self.path:
+            return
+        from artifacts import write_atomic
+
+        try:
+            write_atomic(self.path, json.dumps(saved).encode("utf-8"))
+        except OSError as e:
+            print(f"Could not save the speech budget: {e}")
+
+
+BUDGET = None
+_budget_lock = threading.Lock()
+
+
+def default_budget():
+    global BUDGET
+    with _budget_lock:
+        if BUDGET is None:
+            BUDGET = SpeechBudget()
+        return BUDGET
@@ -0,0 +1,394 @@
+"""
+Session bundles: one finished answer in a single file, replayed without any model call.
+
+A bundle (.hsb) holds the transcript, the brain's JSON, the portrait, the speech
+and the answer's frames already decoded to canvas-size RGB: the video's frames
+for the video modes, else the portrait. Entries are page-aligned and listed in
+a JSON index at the end of the file:
+
+    entry ... entry | index JSON | index length (8 bytes, little-endian) | MAGIC
+
+Opening a bundle maps the file and reads only the index. Frames are NumPy views
+of the mapping, so the kernel pages them in as they are shown and can drop them
+again; replaying a bundle holds about one frame and the speech in memory.
+
+    python bundles.py export runs/<run id> napoleon.hsb
+    python bundles.py import napoleon.hsb      # into the playlist (HISTORY_PLAYLIST_DIR)
+    python bundles.py list
+"""
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from config import (
+    CANVAS_SIZE,
+    CHECKPOINT_PATH,
+    OUTPUT_AUDIO_PATH,
+    OUTPUT_VIDEO_PATH,
+    PLAYLIST_DIR,
+    PORTRAIT_PATH,
+)
+
+MAGIC = b"HSBUNDL1"
+VERSION = 1
+ALIGN = 4096  # entries start on a page boundary, so frames map without copying
+TRAILER = struct.Struct("<Q8s")
+EXTENSION = ".hsb"
+FRAME_CHUNK = 25  # video frames decoded per media pool call while exporting
+
+
+class BundleError(Exception):
+    """A file that is not a bundle, or one that is truncated."""
+
+
+# --- Export ---
+class BundleWriter:
+    """Appends page-aligned entries to a temporary file; close() adds the index and moves it into place."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp{threading.get_ident()}"
+        self.file = open(self.tmp_path, "wb")
+        self.entries = {}
+
+    def _align(self):
+        padding = -self.file.tell() % ALIGN
+        if padding:
+            self.file.write(b"\0" * padding)
+
+    def add(self, name, data, **info):
+        self._align()
+        self.entries[name] = dict(info, offset=self.file.tell(), length=len(data))
+        self.file.write(data)
+
+    def add_frames(self, name, chunks):
+        """Frames from (array, fps) chunks of (count, height, width, 3) uint8 arrays, written as they come."""
+        self._align()
+        offset = self.file.tell()
+        count, shape, fps = 0, None, None
+        for chunk, fps in chunks:
+            if len(chunk):
+                shape = chunk.shape[1:]
+                count += len(chunk)
+                self.file.write(chunk.tobytes())
+        if not count:
+            raise BundleError(f"No frames for {name}")
+        self.entries[name] = {"offset": offset, "length": self.file.tell() - offset,
+                              "shape": [count, *shape], "fps": fps}
+
+    def close(self, meta):
+        index = json.dumps({"version": VERSION, "meta": meta, "entries": self.entries}).encode("utf-8")
+        self.file.write(index)
+        self.file.write(TRAILER.pack(len(index), MAGIC))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp_path)
+
+
+def video_chunks(pool, video_path, size):
+    """The whole clip as (frames, fps) chunks, decoded in the media pool."""
+    start = 0
+    while True:
+        block = pool.video_frames(video_path, start, FRAME_CHUNK, size).result()
+        try:
+            yield block.frames[:len(block)].copy(), block.fps
+        finally:
+            block.close()
+        if len(block) < FRAME_CHUNK:
+            return
+        start += FRAME_CHUNK
+
+
+def export_bundle(path, answer, portrait_bytes, audio_bytes, video_path=None, canvas_size=CANVAS_SIZE, media=None):
+    """
+    Write a bundle. answer has the transcript and the brain's answer
+    (user_text, figure_id, figure_name, gender, monologue) and the mode it was made in.
+    """
+    import numpy as np
+    import soundfile as sf
+
+    from media_pool import default_media_pool
+
+    media = media or default_media_pool()
+    portrait = media.decode_image(portrait_bytes, canvas_size).result()
+    brain = {"character_name": answer["figure_name"], "gender": answer["gender"], "monologue": answer["monologue"]}
+    meta = {
+        "mode": answer.get("mode"),
+        "figure_id": answer.get("figure_id"),
+        "figure_name": answer["figure_name"],
+        "gender": answer["gender"],
+        "user_text": answer.get("user_text"),
+        "speech_seconds": sf.info(io.BytesIO(audio_bytes)).duration,
+        "created": time.time(),
+    }
+
+    writer = BundleWriter(path)
+    try:
+        writer.add("transcript.txt", (answer.get("user_text") or "").encode("utf-8"))
+        writer.add("brain.json", json.dumps(brain, indent=2).encode("utf-8"))
+        writer.add("portrait.jpg", portrait_bytes)
+        writer.add("speech.wav", audio_bytes)
+        writer.add_frames("portrait.rgb", [(np.asarray(portrait)[None], None)])
+        if video_path:
+            writer.add_frames("video.rgb", video_chunks(media, video_path, canvas_size))
+        writer.close(meta)
+    except BaseException:
+        writer.abort()
+        raise
+    return path
+
+
+def export_result(path, result, mode_name, canvas_size=CANVAS_SIZE):
+    """Bundle an answer that has just played (a PipelineResult)."""
+    # The portrait on screen: not every mode writes it to the run, and a draft may have been replaced
+    buffer = io.BytesIO()
+    result.images[0].save(buffer, "JPEG", quality=95)
+    portrait_bytes = buffer.getvalue()
+    with open(result.audio_path, "rb") as file:
+        audio_bytes = file.read()
+    answer = {"mode": mode_name, "figure_id": result.figure_id, "figure_name": result.figure_name,
+              "gender": result.gender, "user_text": result.user_text, "monologue": result.monologue}
+    return export_bundle(path, answer, portrait_bytes, audio_bytes, result.video_path, canvas_size)
+
+
+def export_run(run_dir, path, canvas_size=CANVAS_SIZE):
+    """Bundle a finished run directory, from its checkpoint and files."""
+    with open(os.path.join(run_dir, CHECKPOINT_PATH), encoding="utf-8") as file:
+        answer = json.load(file)
+    if answer.get("failed") or not answer.get("monologue"):
+        raise BundleError(f"{run_dir} has no finished answer")
+    with open(os.path.join(run_dir, PORTRAIT_PATH), "rb") as file:
+        portrait_bytes = file.read()
+    with open(os.path.join(run_dir, OUTPUT_AUDIO_PATH), "rb") as file:
+        audio_bytes = file.read()
+    video_path = os.path.join(run_dir, OUTPUT_VIDEO_PATH)
+    video_path = video_path if os.path.exists(video_path) else None
+    return export_bundle(path, answer, portrait_bytes, audio_bytes, video_path, canvas_size)
+
+
+# --- Replay ---
+class Bundle:
+    """A bundle mapped into memory; nothing but the index is read until it is used."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            try:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise BundleError(f"{path} is empty")
+        try:
+            self.index = self._read_index()
+        except BaseException:
+            self.map.close()
+            raise
+        self.meta = self.index["meta"]
+
+    def _read_index(self):
+        size = len(self.map)
+        if size < TRAILER.size:
+            raise BundleError(f"{self.path} is not a bundle")
+        length, magic = TRAILER.unpack_from(self.map, size - TRAILER.size)
+        if magic != MAGIC or length > size - TRAILER.size:
+            raise BundleError(f"{self.path} is not a bundle")
+        start = size - TRAILER.size - length
+        try:
+            index = json.loads(self.map[start:start + length])
+        except ValueError:
+            raise BundleError(f"{self.path} has a damaged index")
+        if index.get("version") != VERSION:
+            raise BundleError(f"{self.path} is bundle version {index.get('version')}, expected {VERSION}")
+        for name, entry in index["entries"].items():
+            if entry["offset"] + entry["length"] > start:
+                raise BundleError(f"{self.path} is truncated ({name})")
+        return index
+
+    def entry(self, name):
+        """The bytes of an entry, as a view of the mapping."""
+        entry = self.index["entries"][name]
+        return memoryview(self.map)[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def frames(self, name):
+        """(frames, fps): a (count, height, width, 3) array over the mapping."""
+        import numpy as np
+
+        entry = self.index["entries"][name]
+        frames = np.frombuffer(self.map, np.uint8, entry["length"], entry["offset"]).reshape(entry["shape"])
+        return frames, entry.get("fps")
+
+    def has(self, name):
+        return name in self.index["entries"]
+
+    def drop(self, name, start, end):
+        """Let the kernel reclaim the pages of frames start to end of an entry (they page in again if shown)."""
+        entry = self.index["entries"][name]
+        frame_bytes = entry["length"] // entry["shape"][0]
+        first = -(-(entry["offset"] + start * frame_bytes) // mmap.PAGESIZE) * mmap.PAGESIZE
+        last = (entry["offset"] + end * frame_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+        if last > first and hasattr(self.map, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+            self.map.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+    def audio(self):
+        """The speech as a file object, for soundfile and pygame."""
+        return io.BytesIO(self.entry("speech.wav"))
+
+    def portrait(self):
+        from PIL import Image
+
+        frames, _ = self.frames("portrait.rgb")
+        return Image.fromarray(frames[0])
+
+    def video_frames(self):
+        return BundleFrames(self, "video.rgb") if self.has("video.rgb") else None
+
+    def result(self):
+        """A PipelineResult that plays this answer."""
+        from pipeline import PipelineResult
+
+        result = PipelineResult()
+        result.bundle = self
+        result.user_text = self.meta.get("user_text")
+        result.figure_id = self.meta.get("figure_id")
+        result.figure_name = self.meta["figure_name"]
+        result.gender = self.meta["gender"]
+        result.monologue = json.loads(self.entry("brain.json").tobytes())["monologue"]
+        result.speech_seconds = self.meta.get("speech_seconds")
+        result.images = [self.portrait()]
+        return result
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # Frames still on screen keep the mapping; it goes with the last of them
+
+
+class BundleFrames:
+    """
+    A bundle's video frames with the same interface as media_pool.VideoFrames.
+    Frames played more than DROP_FRAMES ago are handed back to the kernel, so a
+    long clip never sits in memory whole.
+    """
+
+    DROP_FRAMES = 25
+
+    def __init__(self, bundle, name):
+        self.bundle = bundle
+        self.name = name
+        self.frames, fps = bundle.frames(name)
+        self.fps = fps or 25
+        self.index = 0
+        self.kept = 0  # first frame whose pages have not been dropped
+
+    def next(self):
+        position = self.index % len(self.frames)
+        if position < self.kept:
+            self.kept = 0  # looped
+        elif position - self.kept >= 2 * self.DROP_FRAMES:
+            self.bundle.drop(self.name, self.kept, position - self.DROP_FRAMES)
+            self.kept = position - self.DROP_FRAMES
+        self.index += 1
+        return self.frames[position]
+
+    def skip(self, count):
+        self.index += count
+
+    def close(self):
+        self.frames = None
+
+
+def import_bundle(path, directory=PLAYLIST_DIR):
+    """Check a bundle and copy it into the playlist; returns its new path."""
+    import shutil
+
+    Bundle(path).close()
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(path))
+    if not target.endswith(EXTENSION):
+        target += EXTENSION
+    tmp_path = f"{target}.tmp{threading.get_ident()}"
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+# --- Playlist ---
+class Playlist:
+    """The bundles in a directory, played in turn; only the one playing is open."""
+
+    def __init__(self, directory=PLAYLIST_DIR):
+        self.directory = directory
+        self.position = 0
+        self.current = None
+
+    def paths(self):
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(EXTENSION))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names]
+
+    def __len__(self):
+        return len(self.paths())
+
+    def next(self):
+        """The next bundle that opens, or None if there is none (bundles added meanwhile are picked up)."""
+        paths = self.paths()
+        for _ in range(len(paths)):
+            path = paths[self.position % len(paths)]
+            self.position += 1
+            try:
+                bundle = Bundle(path)
+            except (OSError, BundleError) as e:
+                print(f"Playlist: skipping {path}: {e}")
+                continue
+            self.close()
+            self.current = bundle
+            return bundle
+        return None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export, import and list session bundles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Bundle a finished run directory")
+    export.add_argument("run_dir")
+    export.add_argument("bundle")
+    export.add_argument("--size", type=int, default=CANVAS_SIZE, help="Frame size (the app's canvas)")
+    commands.add_parser("import", help="Add a bundle to the playlist").add_argument("bundle")
+    commands.add_parser("list", help="Show the playlist")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        path = export_run(args.run_dir, args.bundle, args.size)
+        print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    elif args.command == "import":
+        print(f"Added {import_bundle(args.bundle)}")
+    else:
+        for path in Playlist().paths():
+            bundle = Bundle(path)
+            frames = bundle.index["entries"].get("video.rgb", {}).get("shape", [0])[0]
+            print(f"{os.path.basename(path)}: {bundle.meta['figure_name']} ({bundle.meta.get('mode')}), "
+                  f"{bundle.meta.get('speech_seconds') or 0:.0f}s, {frames} video frames "
+                  f"- {bundle.meta.get('user_text') or ''}")
+            bundle.close()
+
+
+if __name__ == "__main__":
+    main()
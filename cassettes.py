@@ -0,0 +1,281 @@
+"""
+Record and replay model calls, so two versions of the app can be compared on
+exactly the same model answers and latencies.
+
+A cassette is a directory: interactions.jsonl (one line per finished call:
+model, input fingerprint, the inputs, output or error, latency) and blobs/
+with every file sent to or returned by the models, named by content hash.
+
+    HISTORY_CASSETTE=cassettes/napoleon HISTORY_CASSETTE_MODE=record python main.py
+    HISTORY_CASSETTE=cassettes/napoleon HISTORY_CASSETTE_MODE=replay python main.py
+    HISTORY_REPLAY_SPEED=0 ...   # replay without the recorded latency
+
+Replay matches calls by model and input, falling back to the model's next
+recording in order when an input was never seen (e.g. a different question);
+the inputs that differ from that recording are printed.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from models import PredictionTimeout
+
+INTERACTIONS_NAME = "interactions.jsonl"
+BLOBS_NAME = "blobs"
+
+
+def file_bytes(value):
+    # Read an input file without moving it: the backend still has to upload it
+    if hasattr(value, "seek"):
+        value.seek(0)
+    data = value.read()
+    if hasattr(value, "seek"):
+        value.seek(0)
+    return data
+
+
+def fingerprint(input_data):
+    """Stable hash of a model input; open files count by their bytes."""
+    canonical = {}
+    for key, value in sorted(input_data.items()):
+        if hasattr(value, "read"):
+            canonical[key] = {"file": hashlib.sha256(file_bytes(value)).hexdigest()}
+        else:
+            canonical[key] = value
+    text = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def differing_inputs(packed, input_data):
+    """Input names whose value differs from a recorded (packed) input."""
+    names = []
+    for key in sorted(set(packed) | set(input_data)):
+        recorded, value = packed.get(key), input_data.get(key)
+        if hasattr(value, "read"):
+            value = {"__file__": hashlib.sha256(file_bytes(value)).hexdigest()}
+            recorded = {"__file__": recorded.get("__file__")} if isinstance(recorded, dict) else recorded
+        elif value is not None:
+            value = json.loads(json.dumps(value, default=str))
+        if recorded != value:
+            names.append(key)
+    return names
+
+
+class CassetteFile:
+    """A recorded file output: readable bytes with the original URL as str(), like replicate's FileOutput."""
+
+    def __init__(self, data, url):
+        self.data = data
+        self.url = url
+
+    def read(self):
+        return self.data
+
+    def __str__(self):
+        return self.url
+
+
+class Cassette:
+    def __init__(self, path):
+        self.path = path
+        self.blob_dir = os.path.join(path, BLOBS_NAME)
+        self.lock = threading.Lock()
+
+    # --- Outputs ---
+    def pack(self, output):
+        """JSON-able copy of a model output; file contents go to blobs/. Returns (packed, live output)."""
+        if isinstance(output, (list, tuple)):
+            pairs = [self.pack(item) for item in output]
+            return [packed for packed, _ in pairs], [live for _, live in pairs]
+        if isinstance(output, dict):
+            pairs = {key: self.pack(value) for key, value in output.items()}
+            return {key: pair[0] for key, pair in pairs.items()}, {key: pair[1] for key, pair in pairs.items()}
+        if hasattr(output, "read"):
+            # A FileOutput can only be streamed once: the caller gets the recorded copy
+            data = output.read()
+            url = str(getattr(output, "url", output))
+            return {"__file__": self.put_blob(data), "url": url}, CassetteFile(data, url)
+        return output, output
+
+    def pack_input(self, input_data):
+        """JSON-able copy of a model input, files stored in blobs/; unpack() gives it back."""
+        packed = {}
+        for key, value in input_data.items():
+            if hasattr(value, "read"):
+                name = os.path.basename(str(getattr(value, "name", key)))
+                packed[key] = {"__file__": self.put_blob(file_bytes(value)), "url": name}
+            else:
+                packed[key] = json.loads(json.dumps(value, default=str))
+        return packed
+
+    def unpack(self, packed):
+        if isinstance(packed, list):
+            return [self.unpack(item) for item in packed]
+        if isinstance(packed, dict):
+            if "__file__" in packed:
+                with open(os.path.join(self.blob_dir, packed["__file__"]), "rb") as file:
+                    return CassetteFile(file.read(), packed["url"])
+            return {key: self.unpack(value) for key, value in packed.items()}
+        return packed
+
+    def put_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.blob_dir, digest)
+        if not os.path.exists(path):
+            from artifacts import write_atomic
+
+            os.makedirs(self.blob_dir, exist_ok=True)
+            write_atomic(path, data)
+        return digest
+
+    # --- Interactions ---
+    def append(self, entry):
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, INTERACTIONS_NAME), "a", encoding="utf-8") as file:
+                file.write(line)
+
+    def load(self):
+        path = os.path.join(self.path, INTERACTIONS_NAME)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No cassette at {self.path}")
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+
+# --- Recording ---
+class RecordingCall:
+    def __init__(self, backend, model, input_data):
+        self.backend = backend
+        self.model = model
+        self.key = fingerprint(input_data)
+        # Kept with the fingerprint, so a replay mismatch can be explained and the call re-run
+        self.inputs = backend.cassette.pack_input(input_data)
+        self.started = time.monotonic()
+        self.call = backend.inner.start(model, input_data)
+        self.recorded = False
+
+    def result(self, timeout=None):
+        try:
+            output = self.call.result(timeout)
+        except PredictionTimeout:
+            raise  # still running; it may finish on a later wait
+        except Exception as e:
+            self.record({"error": str(e)})
+            raise
+        packed, output = self.backend.cassette.pack(output)
+        self.record({"output": packed})
+        return output
+
+    def record(self, outcome):
+        if self.recorded:
+            return
+        self.recorded = True
+        entry = {
+            "model": self.model,
+            "input": self.key,
+            "inputs": self.inputs,
+            "latency": round(time.monotonic() - self.started, 3),
+        }
+        entry.update(outcome)
+        self.backend.cassette.append(entry)
+
+    def cancel(self):
+        # Abandoned calls (a lost hedge, a timeout) are not recorded
+        self.recorded = True
+        self.call.cancel()
+
+
+class RecordingBackend:
+    """Wraps a live backend and appends every finished call to the cassette."""
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.cassette = Cassette(path)
+
+    def start(self, model, input_data):
+        return RecordingCall(self, model, input_data)
+
+
+# --- Replay ---
+class ReplayCall:
+    def __init__(self, entry, cassette, speed):
+        self.entry = entry
+        self.cassette = cassette
+        self.latency = entry["latency"] * speed
+        self.started = time.monotonic()
+        self.cancel_event = threading.Event()
+
+    def result(self, timeout=None):
+        remaining = self.latency - (time.monotonic() - self.started)
+        if timeout is not None and remaining > timeout:
+            self.cancel_event.wait(timeout)
+            raise PredictionTimeout(f"no result after {timeout:.1f}s")
+        if remaining > 0 and self.cancel_event.wait(remaining):
+            raise Exception("Prediction was canceled")
+        if "error" in self.entry:
+            raise Exception(self.entry["error"])
+        return self.cassette.unpack(self.entry["output"])
+
+    def cancel(self):
+        self.cancel_event.set()
+
+
+class ReplayBackend:
+    """
+    Answers calls from a cassette. speed scales the recorded latencies
+    (1 = as recorded, 0 = immediately). No network is used.
+    """
+
+    # Tells ModelClient to skip its free-tier pacing sleeps
+    offline = True
+
+    def __init__(self, path, speed=1.0):
+        self.cassette = Cassette(path)
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.by_input = {}  # (model, input fingerprint) -> entries, in recorded order
+        self.by_model = {}  # model -> entries, in recorded order
+        for entry in self.cassette.load():
+            self.by_input.setdefault((entry["model"], entry["input"]), []).append(entry)
+            self.by_model.setdefault(entry["model"], []).append(entry)
+        self.used = {}  # list id -> entries handed out
+        self.misses = 0
+
+    def next_entry(self, model, key, input_data=None):
+        with self.lock:
+            entries = self.by_input.get((model, key))
+            matched = entries is not None
+            if entries is None:
+                entries = self.by_model.get(model)
+                if entries is None:
+                    raise Exception(f"Cassette {self.cassette.path} has no calls to {model}")
+                self.misses += 1
+            # Repeats of the same call get the next recording; past the last one, the last again
+            used = self.used.get(id(entries), 0)
+            self.used[id(entries)] = used + 1
+            entry = entries[min(used, len(entries) - 1)]
+        if not matched and input_data is not None and "inputs" in entry:
+            differing = ", ".join(differing_inputs(entry["inputs"], input_data)) or "none"
+            print(f"Replay: unrecorded input to {model.split(':')[0]} (differs in: {differing}); "
+                  f"using its next recorded call")
+        return entry
+
+    def start(self, model, input_data):
+        return ReplayCall(self.next_entry(model, fingerprint(input_data), input_data), self.cassette, self.speed)
+
+
+def backend_from_config(live_backend):
+    """The backend HISTORY_CASSETTE_MODE asks for, wrapping live_backend when recording."""
+    from config import CASSETTE_MODE, CASSETTE_PATH, REPLAY_SPEED
+
+    if CASSETTE_MODE == "record":
+        print(f"Recording model calls to {CASSETTE_PATH}")
+        return RecordingBackend(live_backend, CASSETTE_PATH)
+    if CASSETTE_MODE == "replay":
+        print(f"Replaying model calls from {CASSETTE_PATH} at speed {REPLAY_SPEED:g}")
+        return ReplayBackend(CASSETTE_PATH, REPLAY_SPEED)
+    return live_backend
@@ -0,0 +1,104 @@
+import uuid
+from urllib.parse import urljoin
+
+from artifacts import default_store
+from config import CANVAS_SIZE, OUTPUT_AUDIO_PATH, OUTPUT_VIDEO_PATH, PORTRAIT_PATH
+from media_pool import default_media_pool
+from metrics import DOWNLOAD_BYTES
+from pipeline import PipelineResult
+from ws import connect
+
+
+class RemoteConversation:
+    """Client-side stand-in for Conversation: the history itself lives on the server."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # A new session id is a new conversation on the server
+        self.session_id = uuid.uuid4().hex
+        self.figure_id = None
+        self.figure_name = None
+
+
+# --- Remote Pipeline ---
+class RemotePipeline:
+    """Drop-in for Pipeline that has a pipeline server (server.py) answer the question."""
+
+    def __init__(self, server_url, mode, on_status=None, canvas_size=CANVAS_SIZE, store=None, media=None):
+        self.server_url = server_url.rstrip("/") + "/"
+        self.mode = mode
+        self.on_status = on_status or print
+        self.canvas_size = canvas_size
+        self.store = store
+        self.media = media or default_media_pool()
+        self.conversation = RemoteConversation()
+        # Local run id -> server job that failed for it, resumed on the server by a retry
+        self.failed_jobs = {}
+
+    def run(self, audio_path, run=None, text=None, resume=False):
+        import requests
+
+        params = {"session": self.conversation.session_id, "mode": self.mode.name}
+        url = urljoin(self.server_url, "questions")
+        failed_job = self.failed_jobs.pop(run.id, None) if resume and run is not None else None
+        if failed_job:
+            response = requests.post(urljoin(self.server_url, f"jobs/{failed_job}/retry"))
+        elif text:
+            response = requests.post(url, params=params, json={"text": text})
+        else:
+            with open(audio_path, "rb") as file:
+                response = requests.post(url, params=params, data=file, headers={"Content-Type": "audio/wav"})
+        if response.status_code == 503:
+            raise Exception(f"Server busy, try again in {response.headers.get('Retry-After', '?')}s")
+        response.raise_for_status()
+        job = response.json()
+        self.on_status(f"Queued on server (#{job['position']})")
+
+        ws_url = "ws" + urljoin(self.server_url, job["events"])[len("http"):]
+        ws = connect(ws_url)
+        try:
+            while True:
+                event = ws.recv_json()
+                if event["type"] == "status":
+                    self.on_status(event["text"])
+                elif event["type"] == "error":
+                    if run is not None:
+                        self.failed_jobs[run.id] = job["job_id"]
+                    raise Exception(event["message"])
+                elif event["type"] == "done":
+                    break
+        finally:
+            ws.close()
+            ws.socket.close()
+
+        if run is None:
+            run = (self.store or default_store()).new_run()
+        result = PipelineResult(audio_path, run)
+        result.user_text = event["user_text"]
+        result.figure_id = event.get("figure_id")
+        result.figure_name = event["figure_name"]
+        result.gender = event["gender"]
+        result.monologue = event["monologue"]
+        result.is_follow_up = event["is_follow_up"]
+        self._download_artifacts(result, event["artifacts"])
+        self.conversation.figure_id = result.figure_id
+        self.conversation.figure_name = result.figure_name
+        return result
+
+    def _download_artifacts(self, result, artifacts):
+        import requests
+
+        local_names = {"audio": OUTPUT_AUDIO_PATH, "video": OUTPUT_VIDEO_PATH, "portrait": PORTRAIT_PATH}
+        for name, url in artifacts.items():
+            response = requests.get(urljoin(self.server_url, url))
+            response.raise_for_status()
+            DOWNLOAD_BYTES.labels("server").inc(len(response.content))
+            path = result.run.write(local_names[name], response.content)
+            if name == "audio":
+                result.audio_path = path
+            elif name == "video":
+                result.video_path = path
+            else:
+                result.images = [self.media.decode_image(response.content, self.canvas_size).result()]
@@ -0,0 +1,138 @@
+import os
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+REPLICATE_API_TOKEN = os.getenv("REPLICATE_API_TOKEN")
+
+if not REPLICATE_API_TOKEN:
+    print("Error: REPLICATE_API_TOKEN not found. Check your .env file.")
+
+# Presentation mode used when no --mode flag is given: "portrait", "wan" or "sadtalker"
+DEFAULT_MODE = os.getenv("HISTORY_MODE", "portrait")
+
+# Show a text box for typed questions (for kiosks with a keyboard); typed questions skip transcription
+KEYBOARD_INPUT = os.getenv("HISTORY_KEYBOARD", "0") == "1"
+
+# Seconds to wait before every model call (spreads requests out for the free tier)
+BASE_WAIT = float(os.getenv("HISTORY_BASE_WAIT", "12"))
+
+# Shared limits on model calls across every pipeline in this process
+MODEL_MAX_CONCURRENT = int(os.getenv("HISTORY_MODEL_MAX_CONCURRENT", "4"))
+MODEL_MAX_PER_MINUTE = int(os.getenv("HISTORY_MODEL_MAX_PER_MINUTE", "60"))
+
+# Request hedging for stages with long tails (e.g. "transcribe,brain"; empty = off):
+# a call still running past this percentile of its model's latency gets a duplicate,
+# first result wins, and duplicates are capped at HEDGE_BUDGET per call made
+HEDGE_STAGES = tuple(stage for stage in os.getenv("HISTORY_HEDGE_STAGES", "").split(",") if stage)
+HEDGE_PERCENTILE = float(os.getenv("HISTORY_HEDGE_PERCENTILE", "0.95"))
+HEDGE_BUDGET = float(os.getenv("HISTORY_HEDGE_BUDGET", "0.1"))
+
+# Keep-warm (keepwarm.py): tiny predictions that keep these stages' models from going cold
+# (e.g. "transcribe,tts,video"; empty = off), only within KEEP_WARM_HOURS ("8-18", "9-12,13-17:30";
+# empty = always). The idle time before a ping is learned from cold starts seen, starting at
+# KEEP_WARM_DEFAULT_INTERVAL seconds and kept between the min and max
+KEEP_WARM_STAGES = tuple(stage for stage in os.getenv("HISTORY_KEEP_WARM", "").split(",") if stage)
+KEEP_WARM_HOURS = os.getenv("HISTORY_KEEP_WARM_HOURS", "")
+KEEP_WARM_DEFAULT_INTERVAL = float(os.getenv("HISTORY_KEEP_WARM_INTERVAL", "240"))
+KEEP_WARM_MIN_INTERVAL = float(os.getenv("HISTORY_KEEP_WARM_MIN_INTERVAL", "60"))
+KEEP_WARM_MAX_INTERVAL = float(os.getenv("HISTORY_KEEP_WARM_MAX_INTERVAL", "3600"))
+
+# Cassettes (cassettes.py): "record" saves every model call to CASSETTE_PATH, "replay" answers
+# from it instead of Replicate, with the recorded latencies scaled by REPLAY_SPEED (0 = none)
+CASSETTE_MODE = os.getenv("HISTORY_CASSETTE_MODE", "")
+CASSETTE_PATH = os.getenv("HISTORY_CASSETTE", "cassettes/default")
+REPLAY_SPEED = float(os.getenv("HISTORY_REPLAY_SPEED", "1"))
+
+# Follow-up questions: prompt tokens kept for earlier turns, and how long a quiet
+# kiosk keeps the conversation before the next visitor starts fresh
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))
+SESSION_IDLE_SECONDS = float(os.getenv("HISTORY_SESSION_IDLE", "300"))
+
+# Questions that can wait in line (recorded but not yet played), including the one being prepared
+QUEUE_DEPTH = int(os.getenv("HISTORY_QUEUE_DEPTH", "3"))
+
+# Worker processes for image decoding, fades, audio clipping and video frames (media_pool.py);
+# 0 runs that work on threads in this process instead
+MEDIA_WORKERS = int(os.getenv("HISTORY_MEDIA_WORKERS", str(max(min((os.cpu_count() or 2) - 1, 4), 1))))
+
+# Speech budget (budget.py): the monologue is sized so the answer is ready within
+# TARGET_ANSWER_SECONDS (0 = no target) and speaks for at most MAX_SPEECH_SECONDS
+# (0 = the mode's own limit), from stage timings learned in SPEECH_BUDGET_PATH
+TARGET_ANSWER_SECONDS = float(os.getenv("HISTORY_TARGET_ANSWER_SECONDS", "0"))
+MAX_SPEECH_SECONDS = float(os.getenv("HISTORY_MAX_SPEECH_SECONDS", "0"))
+SPEECH_BUDGET_PATH = os.getenv("HISTORY_SPEECH_BUDGET", "speech_budget.json")
+
+# --- Model Definitions ---
+# 1. Transcribe: OpenAI Whisper
+MODEL_WHISPER = "openai/whisper:8099696689d249cf8b122d833c36ac3f75505c666a395ca40ef26f68e7d3d16e"
+
+# 2. Brain: GPT-5 mini
+MODEL_BRAIN = "openai/gpt-5-mini"
+
+# 3. Image: Qwen-image (slow, best quality) or Flux Schnell (fast)
+MODEL_IMAGE = "qwen/qwen-image"
+MODEL_IMAGE_FAST = "black-forest-labs/flux-schnell"
+
+# 4. Speech: Coqui XTTS v2
+MODEL_TTS = "lucataco/xtts-v2:684bc3855b37866c0c65add2ff39c78f3dea3f4ff103a436465326e0f438d55e"
+
+# 5. Video: Wan image-to-video and SadTalker lip-sync
+MODEL_VIDEO = "wan-video/wan-2.2-i2v-fast"
+MODEL_I2V = "cjwbw/sadtalker:a519cc0cfebaaeade068b23899165a11ec76aaa1d2b313d40d214f204ec957a3"
+
+# --- Voice Reference URLs ---
+VOICE_MAP = {
+    "male": "https://replicate.delivery/pbxt/Jt79w0xsT64R1JsiJ0LQRL8UcWspg5J4RFrU6YwEKpOT1ukS/male.wav",
+    "female": "https://audioaiforyou.s3.us-east-2.amazonaws.com/voicemodel/female.wav"
+}
+DEFAULT_VOICE = VOICE_MAP["male"]
+# Local reference clips per figure and voice bucket (see voices.py)
+VOICES_DIR = os.getenv("HISTORY_VOICES_DIR", "voices")
+
+# --- Files ---
+CANVAS_SIZE = 512
+
+# Every question gets its own directory under ARTIFACT_DIR; the oldest runs not in use
+# are removed once there are more than ARTIFACT_MAX_RUNS or they take over ARTIFACT_MAX_MB
+ARTIFACT_DIR = os.getenv("HISTORY_ARTIFACT_DIR", "runs")
+ARTIFACT_MAX_MB = float(os.getenv("HISTORY_ARTIFACT_MAX_MB", "500"))
+ARTIFACT_MAX_RUNS = int(os.getenv("HISTORY_ARTIFACT_MAX_RUNS", "50"))
+
+# Near-identical stand-alone questions reuse an earlier answer (character 3-gram
+# similarity from 0 to 1; 0 turns the cache off) if they name the same figure and use the
+# same words apart from filler like "did" or "please". Cached media is capped at ANSWER_CACHE_MAX_MB.
+ANSWER_CACHE_DIR = os.getenv("HISTORY_CACHE_DIR", "answer_cache")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("HISTORY_CACHE_THRESHOLD", "0.7"))
+ANSWER_CACHE_MAX_MB = float(os.getenv("HISTORY_CACHE_MAX_MB", "1000"))
+# New questions are folded into the index snapshot this often (seconds) and at exit
+ANSWER_CACHE_SAVE_SECONDS = float(os.getenv("HISTORY_CACHE_SAVE_SECONDS", "300"))
+
+# Session bundles (bundles.py) in PLAYLIST_DIR are replayed in turn once the kiosk has been
+# idle for PLAYLIST_IDLE_SECONDS (0 = never), with PLAYLIST_GAP_SECONDS between them
+PLAYLIST_DIR = os.getenv("HISTORY_PLAYLIST_DIR", "playlist")
+PLAYLIST_IDLE_SECONDS = float(os.getenv("HISTORY_PLAYLIST_IDLE", "0"))
+PLAYLIST_GAP_SECONDS = float(os.getenv("HISTORY_PLAYLIST_GAP", "5"))
+
+# Figure-name aliases learned at runtime (the shipped table is figures.json)
+FIGURE_ALIASES_PATH = os.getenv("HISTORY_FIGURE_ALIASES", "figure_aliases.json")
+
+# Metrics (metrics.py): Prometheus text on METRICS_HOST:METRICS_PORT/metrics (port 0 turns it off)
+# and a JSON snapshot rewritten every METRICS_SNAPSHOT_SECONDS (empty path turns it off)
+METRICS_HOST = os.getenv("HISTORY_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("HISTORY_METRICS_PORT", "9464"))
+METRICS_SNAPSHOT_PATH = os.getenv("HISTORY_METRICS_SNAPSHOT", "metrics.json")
+METRICS_SNAPSHOT_SECONDS = float(os.getenv("HISTORY_METRICS_SNAPSHOT_SECONDS", "60"))
+
+# UI thread (loop_monitor.py): callbacks or event-loop delays over this many ms are reported,
+# and the recent callbacks are written to UI_TRACE_PATH as a Chrome trace (empty: off)
+UI_FRAME_BUDGET_MS = float(os.getenv("HISTORY_UI_BUDGET_MS", "40"))
+UI_TRACE_PATH = os.getenv("HISTORY_UI_TRACE", "")
+
+# File names inside a run directory
+INPUT_AUDIO_PATH = "input_audio.wav"
+OUTPUT_AUDIO_PATH = "output_speech.wav"
+OUTPUT_VIDEO_PATH = "output_video.mp4"
+PORTRAIT_PATH = "static_portrait.jpg"
+# Stages done so far and what they produced, so a failed question can resume
+CHECKPOINT_PATH = "checkpoint.json"
@@ -0,0 +1,107 @@
+import re
+import time
+
+from config import HISTORY_TOKEN_BUDGET, SESSION_IDLE_SECONDS
+
+# Roughly four characters per token for English text; close enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def first_sentence(text, max_chars=160):
+    match = re.match(r"(.+?[.!?])(\s|$)", text.strip(), re.S)
+    sentence = match.group(1) if match else text.strip()
+    return sentence if len(sentence) <= max_chars else sentence[: max_chars - 3].rstrip() + "..."
+
+
+# --- Conversation Memory ---
+class Conversation:
+    """
+    Per-session state for the figure the visitor is currently talking to.
+
+    Turns are kept verbatim while they fit in the token budget. Older turns are
+    folded into a one-line-per-turn summary, and the summary itself is trimmed
+    from the front, so the brain prompt never grows past the budget.
+    """
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, idle_timeout=SESSION_IDLE_SECONDS):
+        self.token_budget = token_budget
+        self.idle_timeout = idle_timeout
+        self.reset()
+
+    def reset(self):
+        # Canonical id from figures.py; figure_name is how it is shown and prompted
+        self.figure_id = None
+        self.figure_name = None
+        self.gender = None
+        self.images = []
+        self.video_path = None
+        self.turns = []  # (question, answer) pairs, oldest first
+        self.summary = []  # one short line per folded turn
+        self.last_active = None
+
+    def snapshot(self):
+        """A copy to answer a queued question on, without touching this conversation."""
+        copy = Conversation(self.token_budget, self.idle_timeout)
+        copy.figure_id = self.figure_id
+        copy.figure_name = self.figure_name
+        copy.gender = self.gender
+        copy.images = self.images
+        copy.video_path = self.video_path
+        copy.turns = list(self.turns)
+        copy.summary = list(self.summary)
+        copy.last_active = self.last_active
+        return copy
+
+    def expire_if_idle(self):
+        if self.last_active and time.time() - self.last_active > self.idle_timeout:
+            print("Conversation idle, starting a new session.")
+            self.reset()
+
+    def is_same_figure(self, figure_id):
+        return bool(self.figure_id) and figure_id == self.figure_id
+
+    def build_prompt(self, question):
+        """The brain prompt: earlier context (if any) followed by the new question."""
+        if not self.figure_name:
+            return question
+
+        lines = [f"You are continuing a conversation as {self.figure_name}."]
+        if self.summary:
+            lines.append("Earlier in the conversation:")
+            lines.extend(f"- {line}" for line in self.summary)
+        for past_question, answer in self.turns:
+            lines.append(f"Visitor: {past_question}")
+            lines.append(f"{self.figure_name}: {answer}")
+        lines.append(f"Visitor: {question}")
+        return "\n".join(lines)
+
+    def history_tokens(self):
+        text = " ".join(self.summary) + " ".join(q + a for q, a in self.turns)
+        return estimate_tokens(text)
+
+    def record(self, result):
+        """Add a finished answer; switching figure starts a new conversation."""
+        if not self.is_same_figure(result.figure_id):
+            self.reset()
+            self.figure_id = result.figure_id
+            self.figure_name = result.figure_name
+            self.gender = result.gender
+        self.images = result.images
+        self.video_path = result.video_path
+        self.turns.append((result.user_text, result.monologue))
+        self.last_active = time.time()
+        self.compact()
+
+    def compact(self):
+        # Fold the oldest verbatim turns into the summary, always keeping the latest one
+        while len(self.turns) > 1 and self.history_tokens() > self.token_budget:
+            question, answer = self.turns.pop(0)
+            self.summary.append(f"Asked \"{first_sentence(question, 80)}\", you said: {first_sentence(answer)}")
+
+        # Then drop the oldest summary lines
+        while self.summary and self.history_tokens() > self.token_budget:
+            self.summary.pop(0)
@@ -0,0 +1,204 @@
+"""
+Canonical ids for historical figures, so "Napoleon", "Napoleon Bonaparte" and
+"Emperor Napoleon I" share one conversation, cache entry and voice.
+
+The alias table ships as figures.json; spellings matched without their regnal
+number (and figures the table doesn't know) are learned into FIGURE_ALIASES_PATH.
+Looser word and spelling matches are used but never learned, so one wrong guess
+doesn't stick.
+"""
+import difflib
+import json
+import os
+import re
+import threading
+import unicodedata
+
+from config import FIGURE_ALIASES_PATH
+
+FIGURES_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "figures.json")
+
+# Dropped from the front of a name: "Emperor Napoleon", "Saint Joan of Arc", "The Sun King"
+TITLES = {
+    "the", "emperor", "empress", "king", "queen", "pharaoh", "tsar", "czar", "saint", "st", "sir", "lady",
+    "lord", "president", "general", "admiral", "dr", "doctor", "madame", "prince", "princess", "pope",
+}
+ROMAN_NUMERAL = re.compile(r"^(?=[ivxlc]+$)c{0,3}(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$")
+FUZZY_CUTOFF = 0.88
+
+
+def name_key(name):
+    """Lowercase ASCII words without punctuation or leading titles."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    words = re.sub(r"[^a-z0-9]+", " ", text).split()
+    while len(words) > 1 and words[0] in TITLES:
+        words.pop(0)
+    return " ".join(words)
+
+
+def numerals(words):
+    return {word for word in words if ROMAN_NUMERAL.match(word)}
+
+
+def bare_key(key):
+    # Without regnal numbers: "napoleon i" -> "napoleon" (the first word always stays)
+    words = key.split()
+    return " ".join(words[:1] + [word for word in words[1:] if word not in numerals(words[1:])])
+
+
+def slug(key):
+    return key.replace(" ", "_") or "unknown"
+
+
+class Figure:
+    def __init__(self, figure_id, name, gender=None, age=None):
+        self.id = figure_id
+        self.name = name
+        self.gender = gender
+        # Voice bucket where the figure is best known "young" or "elder" (None: adult)
+        self.age = age
+
+
+# --- Figure Index ---
+class FigureIndex:
+    """
+    Resolves free-text figure names to canonical figures, most specific rule first:
+    exact alias, alias without regnal numbers, word subset of one figure's alias,
+    then fuzzy spelling. Lookup keys are precomputed when the table loads.
+    """
+
+    def __init__(self, table_path=FIGURES_TABLE, learned_path=FIGURE_ALIASES_PATH):
+        self.learned_path = learned_path
+        self.lock = threading.Lock()
+        self.figures = {}
+        self.by_key = {}
+        self.by_bare_key = {}
+        self.alias_words = []  # (frozenset of words, figure id)
+        self.learned = {"aliases": {}, "figures": []}
+
+        with open(table_path, encoding="utf-8") as file:
+            for entry in json.load(file):
+                figure = Figure(entry["id"], entry["name"], entry.get("gender"), entry.get("age"))
+                self._add_figure(figure, entry.get("aliases", []))
+        if learned_path and os.path.exists(learned_path):
+            try:
+                with open(learned_path, encoding="utf-8") as file:
+                    self.learned = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring learned figure aliases: {e}")
+            for entry in self.learned.get("figures", []):
+                self._add_figure(Figure(entry["id"], entry["name"], entry.get("gender")), [])
+            for key, figure_id in self.learned.get("aliases", {}).items():
+                if figure_id in self.figures:
+                    self._add_alias(key, figure_id)
+        self.keys = list(self.by_key)
+
+    def _add_figure(self, figure, aliases):
+        self.figures[figure.id] = figure
+        for alias in [figure.name] + list(aliases):
+            self._add_alias(name_key(alias), figure.id)
+
+    def _add_alias(self, key, figure_id):
+        if not key:
+            return
+        self.by_key.setdefault(key, figure_id)
+        self.by_bare_key.setdefault(bare_key(key), set()).add(figure_id)
+        self.alias_words.append((frozenset(key.split()), figure_id))
+
+    def _match(self, key):
+        """(figure id, rule) for a name key, or (None, None)."""
+        if key in self.by_key:
+            return self.by_key[key], "exact"
+        words = set(key.split())
+        # "Louis XVI" is not "Louis XIV", and "Napoleon III" is not "Napoleon"
+        wanted = numerals(key.split()[1:])
+
+        if not wanted:
+            ids = self.by_bare_key.get(key, set())
+            if len(ids) == 1:
+                return next(iter(ids)), "numeral"
+
+        # "louis xiv" inside "louis xiv of france"; never one word, and never a longer name
+        # around an alias ("Washington Irving" is not "George Washington")
+        words -= {"of", "and", "the"}
+        if len(words) >= 2:
+            ids = {
+                figure_id for alias, figure_id in self.alias_words
+                if words <= alias and (not wanted or numerals(alias) == wanted)
+            }
+            if len(ids) == 1:
+                return next(iter(ids)), "words"
+
+        for close in difflib.get_close_matches(key, self.keys, n=3, cutoff=FUZZY_CUTOFF):
+            if numerals(close.split()[1:]) == wanted:
+                return self.by_key[close], "fuzzy"
+        return None, None
+
+    def mentioned(self, text):
+        """Ids of the figures a question names by a known alias, in order of first mention."""
+        words = name_key(text).split()
+        longest = max((len(key.split()) for key in self.keys), default=0)
+        found = []
+        with self.lock:
+            position = 0
+            while position < len(words):
+                # Longest alias first: "martin luther king" is not "martin luther"
+                for size in range(min(longest, len(words) - position), 0, -1):
+                    figure_id = self.by_key.get(" ".join(words[position:position + size]))
+                    if figure_id:
+                        if figure_id not in found:
+                            found.append(figure_id)
+                        position += size
+                        break
+                else:
+                    position += 1
+        return found
+
+    def get(self, figure_id):
+        return self.figures.get(figure_id)
+
+    def resolve(self, name, gender=None):
+        """The canonical figure for a name; unknown names become new figures."""
+        key = name_key(name)
+        with self.lock:
+            figure_id, rule = self._match(key)
+            if figure_id is None:
+                figure = Figure(slug(key), (name or "Unknown").strip(), gender)
+                # A new id can't collide with a known figure: its key would have matched exactly
+                self._add_figure(figure, [])
+                self.keys = list(self.by_key)
+                self.learned.setdefault("figures", []).append({"id": figure.id, "name": figure.name, "gender": gender})
+                print(f"New figure: {figure.name} ({figure.id})")
+                self._save()
+                return figure
+            if rule == "numeral":
+                # Next time this spelling is an exact hit
+                self._add_alias(key, figure_id)
+                self.keys = list(self.by_key)
+                self.learned.setdefault("aliases", {})[key] = figure_id
+                print(f"Figure alias learned ({rule}): {name!r} -> {figure_id}")
+                self._save()
+            return self.figures[figure_id]
+
+    def _save(self):
+        if not self.learned_path:
+            return
+        from artifacts import write_atomic
+
+        try:
+            write_atomic(self.learned_path, json.dumps(self.learned, indent=2, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            print(f"Could not save learned figure aliases: {e}")
+
+
+FIGURES = None
+_figures_lock = threading.Lock()
+
+
+def default_figures():
+    global FIGURES
+    with _figures_lock:
+        if FIGURES is None:
+            FIGURES = FigureIndex()
+        return FIGURES
@@ -0,0 +1,383 @@
+"""
+Keep-warm: cheap predictions that stop the models going cold while the kiosk is open.
+
+Replicate stops a model's worker after some idle time, and the next prediction
+pays for a cold boot. Every model call is timed here (ColdStartTracker): a call
+much slower than the fastest recent one, after an idle gap, was a cold start.
+Gaps that came back warm and pings that came back cold bracket the model's idle
+timeout, and the ping interval is learned from them (only from pings for the
+cold side: a visitor's long monologue is slow without any boot). When no cold
+start has been seen yet, the interval is stretched until one is, so pings never
+cost more than they need to. Replayed cassettes never go cold, so they get no
+pings.
+
+KeepWarm sends a tiny input (a second of silence, one word to speak) to each
+model in HISTORY_KEEP_WARM, only within HISTORY_KEEP_WARM_HOURS. A ping only
+takes a free slot of the shared rate governor and never waits for one, so
+visitors always come first. report() (and the metrics, and /health on the
+pipeline server) shows what the pings cost in prediction seconds against the
+cold-start latency they saved.
+"""
+import collections
+import io
+import statistics
+import threading
+import time
+
+from config import (
+    DEFAULT_VOICE,
+    KEEP_WARM_DEFAULT_INTERVAL,
+    KEEP_WARM_HOURS,
+    KEEP_WARM_MAX_INTERVAL,
+    KEEP_WARM_MIN_INTERVAL,
+    KEEP_WARM_STAGES,
+)
+from metrics import (
+    COLD_START_SECONDS_AVOIDED,
+    COLD_STARTS,
+    COLD_STARTS_AVOIDED,
+    KEEP_WARM_PINGS,
+    KEEP_WARM_SECONDS,
+    METRICS,
+    model_label,
+)
+
+COLD_FACTOR = 3  # a call this many times its model's fastest recent latency is a cold start
+WINDOW = 50  # latencies and gaps kept per model
+SAFETY = 0.9  # ping this far inside the shortest gap known to stay warm
+GOVERNOR_HEADROOM = 0.8  # no pings once this share of the per-minute quota is used
+
+
+def parse_hours(text):
+    """"8-18" or "8:30-12,13-17:30" (local time, end excluded; "22-2" spans midnight) -> minute ranges."""
+    ranges = []
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        start, _, end = part.partition("-")
+        minutes = []
+        for value in (start, end):
+            hours, _, mins = value.strip().partition(":")
+            minutes.append(int(hours) * 60 + int(mins or 0))
+        ranges.append(tuple(minutes))
+    return ranges
+
+
+def in_hours(ranges, now=None):
+    if not ranges:
+        return True
+    local = time.localtime(now)
+    minute = local.tm_hour * 60 + local.tm_min
+    for start, end in ranges:
+        if start <= minute < end if start <= end else (minute >= start or minute < end):
+            return True
+    return False
+
+
+# --- Cold Start Tracker ---
+class ModelWarmth:
+    """Latencies and idle gaps of one model, and what they say about its idle timeout."""
+
+    def __init__(self):
+        self.active = 0
+        self.last_done = None  # any call or ping
+        self.last_call_done = None  # visitors' calls only
+        self.warm = {"call": collections.deque(maxlen=WINDOW), "ping": collections.deque(maxlen=WINDOW)}
+        self.warm_gaps = collections.deque(maxlen=WINDOW)
+        self.cold_gaps = collections.deque(maxlen=WINDOW)
+        self.penalties = collections.deque(maxlen=WINDOW)  # seconds a cold start added to a ping
+        self.probe = None  # interval being tried while no cold start has been seen
+        self.cold = {"call": 0, "ping": 0}
+        self.avoided = 0
+        self.avoided_seconds = 0.0
+
+    def bounds(self):
+        """(longest gap known to stay warm, shortest gap known to go cold); either may be None."""
+        cold = min(self.cold_gaps) if self.cold_gaps else None
+        warm = [gap for gap in self.warm_gaps if cold is None or gap < cold]
+        return (max(warm) if warm else None), cold
+
+    def penalty(self):
+        return statistics.median(self.penalties) if self.penalties else None
+
+
+class ColdStartTracker:
+    """Every model call and ping, timed; shared by every ModelClient and the keep-warm scheduler."""
+
+    def __init__(self, default_interval=KEEP_WARM_DEFAULT_INTERVAL, min_interval=KEEP_WARM_MIN_INTERVAL,
+                 max_interval=KEEP_WARM_MAX_INTERVAL):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lock = threading.Lock()
+        self.models = {}
+
+    def _warmth(self, model):
+        if model not in self.models:
+            self.models[model] = ModelWarmth()
+        return self.models[model]
+
+    def started(self, model):
+        with self.lock:
+            self._warmth(model).active += 1
+
+    def observe(self, model, started, latency, ok, kind="call"):
+        """A call (or a ping) that began at started (monotonic) and took latency seconds."""
+        with self.lock:
+            warmth = self._warmth(model)
+            warmth.active -= 1
+            gap = None if warmth.last_done is None else started - warmth.last_done
+            call_gap = None if warmth.last_call_done is None else started - warmth.last_call_done
+            warmth.last_done = max(warmth.last_done or 0.0, started + latency)
+            if kind == "call":
+                warmth.last_call_done = max(warmth.last_call_done or 0.0, started + latency)
+            if not ok:
+                return
+            usual = warmth.warm[kind]
+            if not usual or latency <= COLD_FACTOR * min(usual):
+                if usual and min(usual) > COLD_FACTOR * latency:
+                    # The first calls were cold boots themselves; don't take them as the usual latency
+                    usual.clear()
+                usual.append(latency)
+                # Overlapping calls (negative gaps) say nothing about the idle timeout
+                if gap is not None and gap > 0:
+                    warmth.warm_gaps.append(gap)
+                lower, upper = warmth.bounds()
+                if kind == "call" and upper is not None and call_gap is not None and call_gap >= upper and gap < upper:
+                    # Nobody had used the model for longer than it stays warm: the pings kept it up
+                    penalty = warmth.penalty() or 0.0
+                    warmth.avoided += 1
+                    warmth.avoided_seconds += penalty
+                    COLD_STARTS_AVOIDED.labels(model_label(model)).inc()
+                    COLD_START_SECONDS_AVOIDED.labels(model_label(model)).inc(penalty)
+                return
+            warmth.cold[kind] += 1
+            COLD_STARTS.labels(model_label(model), kind).inc()
+            if kind == "ping":
+                warmth.penalties.append(latency - statistics.median(usual))
+                if gap is not None and gap > 0:
+                    warmth.cold_gaps.append(gap)
+                warmth.probe = None
+
+    def idle(self, model):
+        """Seconds since the model last finished anything (0 while it is busy, None if never used)."""
+        with self.lock:
+            warmth = self._warmth(model)
+            if warmth.active:
+                return 0.0
+            return None if warmth.last_done is None else time.monotonic() - warmth.last_done
+
+    def interval(self, model):
+        """How long the model may sit idle before a ping."""
+        with self.lock:
+            warmth = self._warmth(model)
+            lower, upper = warmth.bounds()
+            if upper is None:
+                # No cold start seen yet: try longer gaps until one is, starting from the default
+                if warmth.probe is None or (lower is not None and lower >= warmth.probe):
+                    warmth.probe = max(self.default_interval, (lower or 0) * 1.5)
+                interval = warmth.probe
+            elif lower is None or upper - lower > 0.2 * upper:
+                # Halve the range between the longest warm and the shortest cold gap
+                interval = ((lower or 0) + upper) / 2
+            else:
+                interval = lower * SAFETY
+            return min(max(interval, self.min_interval), self.max_interval)
+
+    def describe(self, model):
+        with self.lock:
+            warmth = self._warmth(model)
+            lower, upper = warmth.bounds()
+            penalty = warmth.penalty()
+            return {
+                "warm_gap": round(lower, 1) if lower is not None else None,
+                "cold_gap": round(upper, 1) if upper is not None else None,
+                "cold_start_penalty": round(penalty, 1) if penalty is not None else None,
+                "cold_starts": dict(warmth.cold),
+                "cold_starts_avoided": warmth.avoided,
+                "seconds_avoided": round(warmth.avoided_seconds, 1),
+            }
+
+
+WARMTH = ColdStartTracker()
+
+
+# --- Warm-up Inputs ---
+def silent_wav(seconds=1.0, rate=16000):
+    import wave
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\0\0" * int(seconds * rate))
+    buffer.seek(0)
+    buffer.name = "warm.wav"
+    return buffer
+
+
+def tiny_jpeg():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (128, 128, 128)).save(buffer, "JPEG")
+    buffer.seek(0)
+    buffer.name = "warm.jpg"
+    return buffer
+
+
+def warm_input(stage):
+    """The cheapest input each stage's model accepts (file inputs are uploaded once, see uploads.py)."""
+    if stage == "transcribe":
+        return {"audio": silent_wav()}
+    if stage == "brain":
+        return {"prompt": "Reply with OK.", "max_tokens": 5, "max_new_tokens": 5}
+    if stage == "image":
+        return {"prompt": "a grey square", "aspect_ratio": "1:1", "output_format": "jpg", "megapixels": "0.25"}
+    if stage == "tts":
+        return {"text": "Hello.", "language": "en", "speaker": DEFAULT_VOICE}
+    if stage == "video":
+        return {"image": tiny_jpeg(), "prompt": "a still grey square", "aspect_ratio": "1:1"}
+    if stage == "lipsync":
+        return {"driven_audio": silent_wav(), "source_image": tiny_jpeg()}
+    raise ValueError(f"No warm-up input for stage {stage}")
+
+
+def warm_targets(mode, stages=KEEP_WARM_STAGES, registry=None):
+    """{model: stage} to keep warm: the models the mode would call first for those stages."""
+    from model_registry import REGISTRY
+
+    registry = registry or REGISTRY
+    primaries = {"transcribe": mode.model_whisper, "image": mode.model_image}
+    return {registry.chain(stage, primaries.get(stage))[0]: stage for stage in stages}
+
+
+# --- Keep-Warm Scheduler ---
+class KeepWarm:
+    def __init__(self, targets, client=None, tracker=None, hours=KEEP_WARM_HOURS, timeout=600, tick=5,
+                 report_seconds=3600):
+        from models import ModelClient
+
+        self.targets = targets
+        self.client = client or ModelClient(on_status=lambda text: None)
+        # Pings go past a cassette recorder (cassettes.py): replays would hand their outputs to real calls
+        self.backend = getattr(self.client.backend, "inner", self.client.backend)
+        self.tracker = tracker or WARMTH
+        self.hours = parse_hours(hours) if isinstance(hours, str) else hours
+        self.timeout = timeout
+        self.tick = tick
+        self.report_seconds = report_seconds
+        self.lock = threading.Lock()
+        self.pinging = set()
+        self.pings = collections.Counter()
+        self.ping_seconds = collections.Counter()
+        self.skipped = 0
+        self.stop_event = threading.Event()
+
+    def start(self):
+        print(f"Keeping warm: {', '.join(f'{stage} ({model_label(model)})' for model, stage in self.targets.items())}")
+        METRICS.add_collector(self.metrics)
+        threading.Thread(target=self.loop, name="keep-warm", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def loop(self):
+        last_report = time.monotonic()
+        while not self.stop_event.wait(self.tick):
+            if in_hours(self.hours):
+                for model, stage in self.targets.items():
+                    idle = self.tracker.idle(model)
+                    # Never used yet: warm it for the first visitor
+                    if (idle is None or idle >= self.tracker.interval(model)) and model not in self.pinging:
+                        self.send(model, stage)
+            if self.report_seconds and time.monotonic() - last_report >= self.report_seconds:
+                last_report = time.monotonic()
+                print(self.summary())
+
+    def send(self, model, stage):
+        governor = self.client.governor
+        input_data = warm_input(stage)
+        load = governor.load()
+        if load["started_last_minute"] >= governor.max_per_minute * GOVERNOR_HEADROOM or not governor.try_acquire():
+            self.skipped += 1
+            return
+        with self.lock:
+            self.pinging.add(model)
+        self.tracker.started(model)
+        try:
+            start = time.monotonic()
+            call = self.backend.start(model, input_data)
+        except Exception as e:
+            governor.release()
+            with self.lock:
+                self.pinging.discard(model)
+            self.tracker.observe(model, time.monotonic(), 0.0, False, kind="ping")
+            KEEP_WARM_PINGS.labels(model_label(model), "error").inc()
+            print(f"Keep-warm ping to {model_label(model)} not sent: {e}")
+            return
+        # A cold boot can take minutes, so the result is waited for off the scheduler thread
+        threading.Thread(target=self.finish, args=(model, call, start), daemon=True).start()
+
+    def finish(self, model, call, start):
+        ok = False
+        try:
+            call.result(self.timeout)
+            ok = True
+        except Exception as e:
+            print(f"Keep-warm ping to {model_label(model)} failed: {e}")
+            call.cancel()
+        finally:
+            self.client.governor.release()
+            elapsed = time.monotonic() - start
+            self.tracker.observe(model, start, elapsed, ok, kind="ping")
+            with self.lock:
+                self.pinging.discard(model)
+                self.pings[model] += 1
+                self.ping_seconds[model] += elapsed
+            KEEP_WARM_PINGS.labels(model_label(model), "ok" if ok else "error").inc()
+            KEEP_WARM_SECONDS.labels(model_label(model)).inc(elapsed)
+
+    # --- Report ---
+    def report(self):
+        """Per model: pings and their prediction seconds, the learned interval, cold starts seen and avoided."""
+        report = {}
+        for model, stage in self.targets.items():
+            with self.lock:
+                pings, seconds = self.pings[model], self.ping_seconds[model]
+            report[model_label(model)] = dict(
+                stage=stage,
+                pings=pings,
+                ping_seconds=round(seconds, 1),
+                interval=round(self.tracker.interval(model), 1),
+                **self.tracker.describe(model),
+            )
+        return report
+
+    def summary(self):
+        lines = ["Keep-warm report:"]
+        for model, entry in self.report().items():
+            lines.append(
+                f"  {model}: {entry['pings']} pings ({entry['ping_seconds']:.0f}s of predictions), "
+                f"every {entry['interval']:.0f}s idle; {entry['cold_starts_avoided']} cold starts avoided "
+                f"(~{entry['seconds_avoided']:.0f}s), {entry['cold_starts']['call']} still hit by visitors"
+            )
+        return "\n".join(lines)
+
+    def metrics(self):
+        for model in self.targets:
+            yield "history_keep_warm_interval_seconds", "gauge", "Idle time before a keep-warm ping", {
+                "model": model_label(model)
+            }, self.tracker.interval(model)
+
+
+def start_keep_warm(mode, client=None):
+    """Start the scheduler if HISTORY_KEEP_WARM names any stages; returns it (or None)."""
+    if not KEEP_WARM_STAGES:
+        return None
+    from models import default_backend
+
+    if getattr(client.backend if client else default_backend(), "offline", False):
+        print("Keep-warm off: replayed calls never go cold")
+        return None
+    return KeepWarm(warm_targets(mode), client=client).start()
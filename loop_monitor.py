@@ -0,0 +1,130 @@
+"""
+Tk event-loop monitor: how late the UI thread runs what was scheduled on it,
+and which callbacks used its time.
+
+Installed on the root window, it wraps root.after (which after_idle also goes
+through), so every callback (animate_loop, fade steps, video frames, status
+updates posted from worker threads) is timed under its own name without
+changing the code that schedules it. A heartbeat every HEARTBEAT_MS measures how late the loop is overall.
+
+A callback or a loop delay over the frame budget (HISTORY_UI_BUDGET_MS) prints a
+warning naming the callback. Everything goes to the metrics; with
+HISTORY_UI_TRACE set, the recent callbacks are also written as a Chrome trace
+(open it in chrome://tracing or ui.perfetto.dev).
+"""
+import atexit
+import collections
+import json
+import threading
+import time
+
+from config import UI_FRAME_BUDGET_MS, UI_TRACE_PATH
+from metrics import UI_BUDGET_OVERRUNS, UI_CALLBACK_SECONDS, UI_LAG_SECONDS
+
+HEARTBEAT_MS = 50
+WARNING_INTERVAL = 10  # seconds; overruns in between are counted, not printed
+TRACE_EVENTS = 5000  # callbacks kept for the trace
+
+
+def callback_name(func):
+    # e.g. "HistoryChatApp.animate_loop" or "PortraitPresenter.fade_step"
+    return getattr(func, "__qualname__", None) or getattr(func, "__name__", None) or type(func).__name__
+
+
+# --- Loop Monitor ---
+class LoopMonitor:
+    def __init__(self, root, budget_ms=UI_FRAME_BUDGET_MS, trace_path=UI_TRACE_PATH):
+        self.root = root
+        self.budget = budget_ms / 1000
+        self.trace_path = trace_path
+        self.lock = threading.Lock()
+        # (name, start, end, late) in perf_counter seconds, for the trace
+        self.slices = collections.deque(maxlen=TRACE_EVENTS)
+        self.lags = collections.deque(maxlen=TRACE_EVENTS)
+        self.slowest = None  # (seconds, name) since the last heartbeat
+        self.last_warning = 0.0
+        self.suppressed = 0
+        self._after = root.after
+
+    def install(self):
+        # Instance attributes shadow the Tk methods, so existing root.after(...) calls go through here
+        self.root.after = self.after
+        self._after(HEARTBEAT_MS, self.heartbeat, time.perf_counter() + HEARTBEAT_MS / 1000)
+        if self.trace_path:
+            atexit.register(self.write_trace)
+        return self
+
+    # --- Scheduling ---
+    def after(self, ms, func=None, *args):
+        if func is None:
+            return self._after(ms)
+        # Tk's after_idle calls after("idle", ...): due straight away
+        due = time.perf_counter() + (ms / 1000 if ms != "idle" else 0)
+        return self._after(ms, self.wrap(func, due), *args)
+
+    def wrap(self, func, due):
+        name = callback_name(func)
+
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.record(name, due, start, time.perf_counter())
+
+        return timed
+
+    # --- Measurements ---
+    def record(self, name, due, start, end):
+        duration = end - start
+        UI_CALLBACK_SECONDS.labels(name).observe(duration)
+        self.slices.append((name, start, end, max(start - due, 0.0)))
+        if self.slowest is None or duration > self.slowest[0]:
+            self.slowest = (duration, name)
+        if duration > self.budget:
+            UI_BUDGET_OVERRUNS.labels(name).inc()
+            self.warn(f"UI thread: {name} ran {duration * 1000:.0f} ms (frame budget {self.budget * 1000:.0f} ms)")
+
+    def heartbeat(self, due):
+        now = time.perf_counter()
+        lag = max(now - due, 0.0)
+        UI_LAG_SECONDS.observe(lag)
+        self.lags.append((now, lag))
+        if lag > self.budget:
+            blamed = f", longest callback {self.slowest[1]} ({self.slowest[0] * 1000:.0f} ms)" if self.slowest else ""
+            self.warn(f"UI thread: event loop {lag * 1000:.0f} ms late{blamed}")
+        self.slowest = None
+        self._after(HEARTBEAT_MS, self.heartbeat, time.perf_counter() + HEARTBEAT_MS / 1000)
+
+    def warn(self, text):
+        now = time.monotonic()
+        if now - self.last_warning < WARNING_INTERVAL:
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            text += f" [{self.suppressed} more overruns since the last warning]"
+        self.last_warning = now
+        self.suppressed = 0
+        print(text)
+        if self.trace_path:
+            self.write_trace()
+
+    # --- Trace ---
+    def write_trace(self):
+        """Recent callbacks (complete events) and loop lag (a counter) as a Chrome trace."""
+        events = []
+        for name, start, end, late in list(self.slices):
+            events.append({
+                "name": name, "ph": "X", "pid": 1, "tid": 1,
+                "ts": round(start * 1e6), "dur": round((end - start) * 1e6),
+                "args": {"late_ms": round(late * 1000, 2)},
+            })
+        for at, lag in list(self.lags):
+            events.append({"name": "loop lag (ms)", "ph": "C", "pid": 1, "ts": round(at * 1e6), "args": {"lag": round(lag * 1000, 2)}})
+        from artifacts import write_atomic
+
+        try:
+            with self.lock:
+                write_atomic(self.trace_path, json.dumps({"traceEvents": events}).encode("utf-8"))
+        except OSError as e:
+            print(f"UI trace not written: {e}")
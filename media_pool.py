@@ -0,0 +1,305 @@
+"""
+Worker processes for CPU-heavy media work: decoding and resizing portraits,
+fade frames, clipping speech and converting video frames.
+
+Threads in the app share the GIL with the Tk loop and the pipeline, so this
+work runs in a process pool and every call returns a concurrent.futures.Future.
+Pixels travel in shared memory, not pickles: this process allocates a block,
+the worker writes the frames straight into it, and the result maps the same
+block (FrameBlock). With HISTORY_MEDIA_WORKERS=0 the same calls run on threads.
+
+Workers import this module, so it imports nothing heavy at the top.
+"""
+import io
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+VIDEO_CHUNK_FRAMES = 25  # frames decoded per pool call; two chunks are held at a time
+
+
+def decode_image(data, size):
+    """Decode image bytes to an RGB size x size image, doing as little full-scale work as possible."""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    # JPEG can decode straight at 1/2, 1/4 or 1/8 scale (never below size); a no-op for other formats
+    img.draft("RGB", (size, size))
+    img = img.convert("RGB")
+    # reducing_gap shrinks by a whole factor with a cheap box filter before the LANCZOS pass
+    return img.resize((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+def clip_audio(audio_bytes, max_duration):
+    """WAV bytes cut to max_duration seconds (unchanged if already shorter)."""
+    import soundfile as sf
+
+    audio_data, sample_rate = sf.read(io.BytesIO(audio_bytes))
+    max_samples = int(max_duration * sample_rate)
+    if len(audio_data) <= max_samples:
+        return audio_bytes
+    buffer = io.BytesIO()
+    sf.write(buffer, audio_data[:max_samples], sample_rate, format="WAV")
+    return buffer.getvalue()
+
+
+# --- Shared Memory ---
+def attach(name):
+    """Map a block made by the app process without claiming to own it."""
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block again, but pool workers share the
+        # app's resource tracker, which already holds it: the app's unlink still clears it
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameBlock:
+    """count RGB frames in one shared-memory block; frames[i] is a NumPy view, image(i) a PIL copy."""
+
+    def __init__(self, count, height, width):
+        import numpy as np
+        from multiprocessing import shared_memory
+
+        self.shape = (count, height, width, 3)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(count * height * width * 3, 1))
+        self.frames = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.count = count  # frames actually filled in (a clip can end early)
+        self.fps = None
+        self.start = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __len__(self):
+        return self.count
+
+    def image(self, index):
+        from PIL import Image
+
+        return Image.fromarray(self.frames[index])
+
+    def close(self):
+        if self.shm is None:
+            return
+        # Views into the buffer must go before it can be unmapped
+        self.frames = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+
+def write_frames(name, shape, frames):
+    """Copy frames (arrays or images) into the block name, in a worker."""
+    import numpy as np
+
+    shm = attach(name)
+    try:
+        view = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        for index, frame in enumerate(frames):
+            view[index] = frame
+        del view
+    finally:
+        shm.close()
+
+
+# --- Worker Functions ---
+def warm_job():
+    import numpy  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+
+def decode_job(data, size, name):
+    import numpy as np
+
+    write_frames(name, (1, size, size, 3), [np.asarray(decode_image(data, size))])
+
+
+def fade_job(source_name, shape, steps, name):
+    """steps + 1 frames blending frame 0 of the source block into frame 1."""
+    import numpy as np
+
+    source = attach(source_name)
+    try:
+        pair = np.ndarray((2,) + shape[1:], dtype=np.uint8, buffer=source.buf)
+        start = pair[0].astype(np.float32)
+        delta = pair[1].astype(np.float32) - start
+        write_frames(name, shape, ((start + delta * (step / steps)).astype(np.uint8) for step in range(steps + 1)))
+        del pair
+    finally:
+        source.close()
+
+
+def video_job(path, start, count, size, name):
+    """Decode up to count frames of path from frame start, resized and RGB. Returns (frames, fps)."""
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise OSError(f"Could not open video file {path}")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+        def frames():
+            for _ in range(count):
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                yield cv2.cvtColor(cv2.resize(frame, (size, size)), cv2.COLOR_BGR2RGB)
+
+        decoded = list(frames())
+        write_frames(name, (count, size, size, 3), decoded)
+        return len(decoded), fps
+    finally:
+        capture.release()
+
+
+# --- Media Pool ---
+class MediaPool:
+    def __init__(self, workers):
+        self.workers = workers
+        if workers > 0:
+            import multiprocessing
+
+            # Forking a process that runs Tk, pygame and the pipeline threads can deadlock the child
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="media")
+
+    def submit(self, func, *args):
+        return self.executor.submit(func, *args)
+
+    def warm(self):
+        """Start the workers and their imports now (a spawned worker takes a few hundred ms)."""
+        return [self.submit(warm_job) for _ in range(max(self.workers, 1))]
+
+    def _into_block(self, block, func, *args, finish=None):
+        """Run func filling block; the returned Future gets finish(block, value) (or the block)."""
+        result = Future()
+
+        def done(future):
+            try:
+                value = future.result()
+                result.set_result(finish(block, value) if finish else block)
+            except BaseException as e:
+                block.close()
+                result.set_exception(e)
+
+        self.executor.submit(func, *args, block.name).add_done_callback(done)
+        return result
+
+    def decode_image(self, data, size):
+        """Future of the decoded size x size PIL image."""
+        block = FrameBlock(1, size, size)
+
+        def finish(block, _):
+            img = block.image(0)
+            block.close()
+            return img
+
+        return self._into_block(block, decode_job, data, size, finish=finish)
+
+    def fade_frames(self, img1, img2, steps):
+        """Future of a FrameBlock with the steps + 1 frames of a cross-fade from img1 to img2."""
+        import numpy as np
+
+        width, height = img1.size
+        source = FrameBlock(2, height, width)
+        source.frames[0] = np.asarray(img1.convert("RGB"))
+        source.frames[1] = np.asarray(img2.convert("RGB"))
+        block = FrameBlock(steps + 1, height, width)
+        future = self._into_block(block, fade_job, source.name, block.shape, steps)
+        future.add_done_callback(lambda _: source.close())
+        return future
+
+    def video_frames(self, path, start, count, size):
+        """Future of a FrameBlock with up to count frames from frame start (fewer at the end)."""
+        block = FrameBlock(count, size, size)
+        block.start = start
+
+        def finish(block, value):
+            block.count, block.fps = value
+            return block
+
+        return self._into_block(block, video_job, path, start, count, size, finish=finish)
+
+    def clip_audio(self, audio_bytes, max_duration):
+        return self.submit(clip_audio, audio_bytes, max_duration)
+
+
+class VideoFrames:
+    """A clip's frames, decoded a chunk ahead in the pool and looping at the end."""
+
+    def __init__(self, pool, path, size, chunk=VIDEO_CHUNK_FRAMES):
+        self.pool = pool
+        self.path = path
+        self.size = size
+        self.chunk = chunk
+        self.current = None
+        self.index = 0
+        self.pending = pool.video_frames(path, 0, chunk, size)
+
+    @property
+    def fps(self):
+        if self.current is None:
+            self.advance()
+        return self.current.fps
+
+    def next(self):
+        """The next frame as an RGB array (waiting for its chunk if needed)."""
+        while self.current is None or self.index >= len(self.current):
+            self.advance()
+        # A copy, so the chunk can be unmapped while the frame is still on screen
+        frame = self.current.frames[self.index].copy()
+        self.index += 1
+        return frame
+
+    def skip(self, count):
+        self.index += count
+
+    def advance(self):
+        carry = 0
+        if self.current is not None:
+            carry = self.index - len(self.current)
+            self.current.close()
+        self.current = self.pending.result()
+        if not len(self.current) and not self.current.start:
+            raise OSError(f"No frames in {self.path}")
+        # A short chunk is the end of the clip: the next one starts over
+        ended = len(self.current) < self.chunk
+        next_start = 0 if ended else self.current.start + len(self.current)
+        self.pending = self.pool.video_frames(self.path, next_start, self.chunk, self.size)
+        self.index = max(carry, 0)
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        release(self.pending)
+
+
+def release(future):
+    """Free a FrameBlock future's memory once it is done, whether or not it was used."""
+    def close(done):
+        if not done.cancelled() and done.exception() is None:
+            done.result().close()
+
+    future.add_done_callback(close)
+
+
+POOL = None
+_pool_lock = threading.Lock()
+
+
+def default_media_pool():
+    global POOL
+    with _pool_lock:
+        if POOL is None:
+            from config import MEDIA_WORKERS
+
+            POOL = MediaPool(MEDIA_WORKERS)
+        return POOL
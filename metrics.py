@@ -0,0 +1,318 @@
+"""
+In-process metrics: counters, gauges and latency histograms, exported as
+Prometheus text on a local HTTP port and as a periodic JSON snapshot.
+
+Metric families are declared once at import time; recording goes through a
+series object cached per label combination, so the hot path is a dict lookup
+and a few additions under that series' own lock (never a registry-wide one):
+
+    STAGE_SECONDS.labels("portrait", "paint").observe(3.2)
+
+State that already lives elsewhere (governor load, model health, disk usage)
+is read by collectors only when the metrics are scraped or snapshotted.
+"""
+import bisect
+import json
+import threading
+import time
+
+from config import METRICS_HOST, METRICS_PORT, METRICS_SNAPSHOT_PATH, METRICS_SNAPSHOT_SECONDS
+
+# Seconds; covers a 50 ms frame up to a slow video model
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+# Seconds; UI-thread work, around a 40 ms frame
+UI_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.04, 0.08, 0.16, 0.32, 1)
+
+
+class CounterSeries:
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class GaugeSeries(CounterSeries):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class HistogramSeries:
+    __slots__ = ("lock", "bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return Timer(self)
+
+
+class Timer:
+    """with HISTOGRAM.labels(...).time(): ... observes the block's duration."""
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.series.observe(time.monotonic() - self.start)
+
+
+class Family:
+    """One metric name with its label names; .labels(...) returns the (cached) series."""
+
+    def __init__(self, kind, name, help_text, label_names, make_series):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.make_series = make_series
+        self.series = {}
+        self.lock = threading.Lock()
+        if not self.label_names:
+            self.default = self.labels()
+
+    def labels(self, *values):
+        series = self.series.get(values)
+        if series is None:
+            with self.lock:
+                series = self.series.setdefault(values, self.make_series())
+        return series
+
+    # Unlabelled families record directly
+    def inc(self, amount=1):
+        self.default.inc(amount)
+
+    def set(self, value):
+        self.default.set(value)
+
+    def observe(self, value):
+        self.default.observe(value)
+
+    def samples(self):
+        for values, series in list(self.series.items()):
+            yield dict(zip(self.label_names, values)), series
+
+
+# --- Metrics Registry ---
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.families = {}
+        self.collectors = []
+
+    def _family(self, kind, name, help_text, label_names, make_series):
+        with self.lock:
+            if name not in self.families:
+                self.families[name] = Family(kind, name, help_text, label_names, make_series)
+            return self.families[name]
+
+    def counter(self, name, help_text, label_names=()):
+        return self._family("counter", name, help_text, label_names, CounterSeries)
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._family("gauge", name, help_text, label_names, GaugeSeries)
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        bounds = tuple(sorted(buckets))
+        return self._family("histogram", name, help_text, label_names, lambda: HistogramSeries(bounds))
+
+    def add_collector(self, collect):
+        """collect() yields (name, kind, help, labels dict, value), read at scrape time."""
+        with self.lock:
+            self.collectors.append(collect)
+
+    def collect(self):
+        """{name: {"type", "help", "series": [{"labels", "value"} or histogram fields]}}."""
+        out = {}
+        with self.lock:
+            families = list(self.families.values())
+            collectors = list(self.collectors)
+        for family in families:
+            series_list = []
+            for labels, series in family.samples():
+                if family.kind == "histogram":
+                    with series.lock:
+                        counts, total, count = list(series.counts), series.sum, series.count
+                    cumulative, running = {}, 0
+                    for bound, bucket in zip(series.bounds + (float("inf"),), counts):
+                        running += bucket
+                        cumulative[format_value(bound)] = running
+                    series_list.append({"labels": labels, "buckets": cumulative, "sum": total, "count": count})
+                else:
+                    series_list.append({"labels": labels, "value": series.value})
+            out[family.name] = {"type": family.kind, "help": family.help, "series": series_list}
+        for collect in collectors:
+            try:
+                for name, kind, help_text, labels, value in collect():
+                    if value is None:
+                        continue
+                    entry = out.setdefault(name, {"type": kind, "help": help_text, "series": []})
+                    entry["series"].append({"labels": labels, "value": value})
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        return out
+
+    def prometheus(self):
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for series in metric["series"]:
+                labels = series["labels"]
+                if metric["type"] == "histogram":
+                    for bound, count in series["buckets"].items():
+                        lines.append(f"{name}_bucket{label_text(labels, le=bound)} {count}")
+                    lines.append(f"{name}_sum{label_text(labels)} {format_value(series['sum'])}")
+                    lines.append(f"{name}_count{label_text(labels)} {series['count']}")
+                else:
+                    lines.append(f"{name}{label_text(labels)} {format_value(series['value'])}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {"time": time.time(), "metrics": self.collect()}
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def label_text(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in items)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + "}"
+
+
+METRICS = MetricsRegistry()
+
+# --- Metric Families ---
+QUESTIONS = METRICS.counter("history_questions_total", "Questions answered, by outcome", ("mode", "outcome"))
+STAGE_SECONDS = METRICS.histogram("history_stage_seconds", "Pipeline stage duration", ("mode", "stage"))
+MODEL_ATTEMPTS = METRICS.counter(
+    "history_model_attempts_total", "run_with_retry attempts by result", ("stage", "model", "result")
+)
+MODEL_SECONDS = METRICS.histogram("history_model_call_seconds", "Duration of one model call attempt", ("stage", "model"))
+RATE_LIMIT_WAIT = METRICS.counter(
+    "history_rate_limit_wait_seconds_total", "Time calls spent waiting for the rate governor or a rate-limit pause"
+)
+RATE_LIMIT_PAUSES = METRICS.counter("history_rate_limit_pauses_total", "Rate-limit replies that paused every caller")
+CACHE_LOOKUPS = METRICS.counter("history_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+DOWNLOAD_BYTES = METRICS.counter("history_download_bytes_total", "Bytes downloaded from model outputs or a server", ("kind",))
+FRAMES = METRICS.counter("history_frames_total", "Animation frames shown", ("presenter",))
+FRAMES_DROPPED = METRICS.counter("history_frames_dropped_total", "Animation frames skipped to keep up", ("presenter",))
+UI_CALLBACK_SECONDS = METRICS.histogram(
+    "history_ui_callback_seconds", "UI-thread time of Tk after() callbacks", ("callback",), buckets=UI_BUCKETS
+)
+UI_LAG_SECONDS = METRICS.histogram("history_ui_lag_seconds", "How late the Tk event loop ran a heartbeat", buckets=UI_BUCKETS)
+UI_BUDGET_OVERRUNS = METRICS.counter(
+    "history_ui_budget_overruns_total", "UI-thread callbacks that ran longer than the frame budget", ("callback",)
+)
+
+COLD_STARTS = METRICS.counter(
+    "history_cold_starts_total", "Model calls or keep-warm pings that hit a cold model", ("model", "kind")
+)
+COLD_STARTS_AVOIDED = METRICS.counter(
+    "history_cold_starts_avoided_total", "Calls after a long idle gap that keep-warm pings kept warm", ("model",)
+)
+COLD_START_SECONDS_AVOIDED = METRICS.counter(
+    "history_cold_start_seconds_avoided_total", "Estimated cold-start latency saved by keep-warm pings", ("model",)
+)
+KEEP_WARM_PINGS = METRICS.counter("history_keep_warm_pings_total", "Keep-warm predictions by result", ("model", "result"))
+KEEP_WARM_SECONDS = METRICS.counter(
+    "history_keep_warm_seconds_total", "Prediction time spent on keep-warm pings", ("model",)
+)
+
+
+def model_label(model):
+    # "owner/name:version" -> "owner/name"; versions only add cardinality
+    return model.split(":")[0]
+
+
+# --- Exporters ---
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_exporters(host=METRICS_HOST, port=METRICS_PORT, snapshot_path=METRICS_SNAPSHOT_PATH,
+                    interval=METRICS_SNAPSHOT_SECONDS):
+    """Serve /metrics on host:port (port 0: off) and write snapshot_path every interval (empty: off)."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    if port:
+        threading.Thread(target=serve, args=(host, port), name="metrics-http", daemon=True).start()
+    if snapshot_path and interval > 0:
+        threading.Thread(
+            target=write_snapshots, args=(snapshot_path, interval), name="metrics-snapshot", daemon=True
+        ).start()
+
+
+def serve(host, port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] == "/metrics":
+                body, content_type = METRICS.prometheus().encode(), "text/plain; version=0.0.4"
+            elif self.path.split("?")[0] == "/metrics.json":
+                body, content_type = json.dumps(METRICS.snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return
+    httpd.daemon_threads = True
+    print(f"Metrics on http://{host}:{port}/metrics")
+    httpd.serve_forever()
+
+
+def write_snapshots(path, interval):
+    from artifacts import write_atomic
+
+    while True:
+        time.sleep(interval)
+        try:
+            write_atomic(path, json.dumps(METRICS.snapshot(), indent=1).encode("utf-8"))
+        except Exception as e:
+            print(f"Metrics snapshot not written: {e}")
@@ -0,0 +1,251 @@
+import collections
+import statistics
+import threading
+import time
+
+from config import (
+    HEDGE_BUDGET,
+    HEDGE_PERCENTILE,
+    MODEL_BRAIN,
+    MODEL_I2V,
+    MODEL_IMAGE,
+    MODEL_IMAGE_FAST,
+    MODEL_TTS,
+    MODEL_VIDEO,
+    MODEL_WHISPER,
+)
+from metrics import METRICS
+
+# Ordered models per stage; the first healthy one is used, the rest are fallbacks
+MODEL_CHAINS = {
+    "transcribe": [MODEL_WHISPER],
+    "brain": [MODEL_BRAIN],
+    "image": [MODEL_IMAGE, MODEL_IMAGE_FAST],
+    "tts": [MODEL_TTS],
+    "video": [MODEL_VIDEO],
+    "lipsync": [MODEL_I2V],
+}
+
+# Latency objective per stage (seconds). A call that runs past it is abandoned for
+# the next model in the chain, and a model whose median exceeds it is routed around.
+STAGE_SLO_SECONDS = {
+    "transcribe": 20,
+    "brain": 30,
+    "image": 45,
+    "tts": 60,
+    "video": 180,
+    "lipsync": 240,
+}
+
+WINDOW = 20  # calls kept per model for the circuit breaker
+LATENCY_WINDOW = 200  # latencies kept per model for percentiles
+MIN_CALLS = 5  # before error rate or latency can open the breaker
+MAX_CONSECUTIVE_FAILURES = 3
+MAX_ERROR_RATE = 0.5
+OPEN_SECONDS = 60  # how long a tripped model is skipped before one trial call
+
+
+class ModelHealth:
+    """Rolling latency/error window and circuit breaker for one model."""
+
+    def __init__(self, model, open_seconds=OPEN_SECONDS):
+        self.model = model
+        self.open_seconds = open_seconds
+        self.calls = collections.deque(maxlen=WINDOW)  # (latency, ok)
+        self.consecutive_failures = 0
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.trial_running = False
+
+        # Latency of single predictions (a hedged call adds its duplicate's, and the primary's
+        # time until it was cancelled as a lower bound), and what callers saw
+        self.single = collections.deque(maxlen=LATENCY_WINDOW)
+        self.effective = collections.deque(maxlen=LATENCY_WINDOW)
+        self.total_calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def latencies(self):
+        return [latency for latency, ok in self.calls if ok]
+
+    def median(self):
+        latencies = self.latencies()
+        return statistics.median(latencies) if latencies else None
+
+    def p95(self):
+        return percentile(self.latencies(), 0.95)
+
+    def error_rate(self):
+        return sum(1 for _, ok in self.calls if not ok) / len(self.calls) if self.calls else 0.0
+
+    def allows(self, now):
+        if self.state == "open" and now - self.opened_at >= self.open_seconds:
+            self._set_state("half-open", "cool-down over")
+        # Half-open: exactly one trial call decides whether the model is back
+        return self.state == "closed" or (self.state == "half-open" and not self.trial_running)
+
+    def begin(self, now):
+        if not self.allows(now):
+            return False
+        if self.state == "half-open":
+            self.trial_running = True
+        return True
+
+    def release(self):
+        # A trial call that ended without a verdict (e.g. throttled): the next call may try
+        self.trial_running = False
+
+    def record(self, latency, ok, slo, now, effective=None):
+        self.calls.append((latency, ok))
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+        self.total_calls += 1
+        if ok:
+            self.single.append(latency)
+            self.effective.append(latency if effective is None else effective)
+
+        if self.state == "half-open":
+            self.trial_running = False
+            if ok and latency <= slo:
+                # Recovered: forget the degraded history so it isn't tripped again at once
+                self.calls.clear()
+                self.calls.append((latency, ok))
+                self._set_state("closed", "recovered")
+            else:
+                self._trip(now, "trial call failed")
+            return
+
+        if self.state != "closed":
+            return
+        if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            self._trip(now, f"{self.consecutive_failures} failures in a row")
+        elif len(self.calls) >= MIN_CALLS and self.error_rate() >= MAX_ERROR_RATE:
+            self._trip(now, f"error rate {self.error_rate():.0%}")
+        elif len(self.latencies()) >= MIN_CALLS and self.median() > slo:
+            self._trip(now, f"median {self.median():.1f}s over the {slo}s SLO")
+
+    def _trip(self, now, reason):
+        self.opened_at = now
+        self._set_state("open", reason)
+
+    def _set_state(self, state, reason):
+        if state != self.state:
+            print(f"Model {self.model}: circuit {self.state} -> {state} ({reason})")
+        self.state = state
+
+    def describe(self):
+        def rounded(value):
+            return round(value, 2) if value is not None else None
+
+        return {
+            "state": self.state,
+            "calls": len(self.calls),
+            "p50": rounded(self.median()),
+            "p95": rounded(self.p95()),
+            "error_rate": round(self.error_rate(), 2),
+            # What callers actually waited, and single predictions without hedging's help
+            "p99": rounded(percentile(self.effective, 0.99)),
+            "single_p99": rounded(percentile(self.single, 0.99)),
+            "hedge_rate": round(self.hedges / self.total_calls, 3) if self.total_calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else None
+
+
+# --- Model Registry ---
+class ModelRegistry:
+    """Fallback chains, per-model health and per-stage SLOs, shared by every ModelClient."""
+
+    def __init__(self, chains=None, slo=None, open_seconds=OPEN_SECONDS,
+                 hedge_percentile=HEDGE_PERCENTILE, hedge_budget=HEDGE_BUDGET):
+        self.chains = dict(chains or MODEL_CHAINS)
+        self.slo = dict(slo or STAGE_SLO_SECONDS)
+        self.open_seconds = open_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.lock = threading.Lock()
+        self.health = {}
+
+    def _health(self, model):
+        if model not in self.health:
+            self.health[model] = ModelHealth(model, self.open_seconds)
+        return self.health[model]
+
+    def chain(self, stage, primary=None):
+        models = list(self.chains.get(stage, []))
+        if primary:
+            models = [primary] + [model for model in models if model != primary]
+        return models
+
+    def route(self, stage, primary=None):
+        """Models to try for a stage, in order, skipping those with an open circuit."""
+        models = self.chain(stage, primary)
+        now = time.monotonic()
+        with self.lock:
+            healthy = [model for model in models if self._health(model).allows(now)]
+        # If everything is tripped, trying the preferred model beats failing outright
+        return healthy or models[:1]
+
+    def begin(self, model):
+        """Claim a call on model; False if its circuit opened (or a trial started) meanwhile."""
+        with self.lock:
+            return self._health(model).begin(time.monotonic())
+
+    def release(self, model):
+        """Give back a call claimed by begin() that won't be recorded."""
+        with self.lock:
+            self._health(model).release()
+
+    def record(self, stage, model, latency, ok, effective=None):
+        with self.lock:
+            self._health(model).record(latency, ok, self.slo.get(stage, float("inf")), time.monotonic(), effective)
+
+    # --- Hedging ---
+    def hedge_delay(self, model):
+        """How long to wait before duplicating a call: the model's usual worst case so far."""
+        with self.lock:
+            health = self._health(model)
+            if len(health.single) < MIN_CALLS:
+                return None
+            return percentile(health.single, self.hedge_percentile)
+
+    def claim_hedge(self, model):
+        # Duplicates may add at most hedge_budget extra predictions per call made
+        with self.lock:
+            health = self._health(model)
+            if health.hedges + 1 > self.hedge_budget * max(health.total_calls, 1):
+                return False
+            health.hedges += 1
+            return True
+
+    def record_hedge_win(self, model, latency):
+        """The duplicate answered first, after latency; the primary is recorded by record()."""
+        with self.lock:
+            health = self._health(model)
+            health.hedge_wins += 1
+            health.single.append(latency)
+
+    def snapshot(self):
+        with self.lock:
+            return {model: health.describe() for model, health in self.health.items()}
+
+
+REGISTRY = ModelRegistry()
+
+
+def registry_metrics():
+    for model, health in REGISTRY.snapshot().items():
+        labels = {"model": model.split(":")[0]}
+        yield "history_model_circuit_open", "gauge", "1 while the model's circuit breaker is open", labels, int(
+            health["state"] == "open"
+        )
+        for key in ("p50", "p95", "p99", "single_p99"):
+            yield f"history_model_{key}_seconds", "gauge", f"{key} latency of recent calls", labels, health[key]
+        yield "history_model_error_rate", "gauge", "Share of recent calls that failed", labels, health["error_rate"]
+        yield "history_model_hedge_rate", "gauge", "Duplicate predictions per call", labels, health["hedge_rate"]
+
+
+METRICS.add_collector(registry_metrics)
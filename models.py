@@ -0,0 +1,381 @@
+import collections
+import queue
+import random
+import re
+import threading
+import time
+
+from config import BASE_WAIT, CASSETTE_MODE, HEDGE_STAGES, MODEL_MAX_CONCURRENT, MODEL_MAX_PER_MINUTE
+from keepwarm import WARMTH
+from metrics import METRICS, MODEL_ATTEMPTS, MODEL_SECONDS, RATE_LIMIT_PAUSES, RATE_LIMIT_WAIT, model_label
+from model_registry import REGISTRY
+from uploads import UPLOADS
+
+
+# --- Rate Governor ---
+class RateGovernor:
+    """
+    Process-wide limit on model calls, shared by every ModelClient.
+
+    At most max_concurrent predictions run at once and at most max_per_minute
+    start in any 60 second window. A rate-limit reply pauses every caller.
+    """
+
+    def __init__(self, max_concurrent=MODEL_MAX_CONCURRENT, max_per_minute=MODEL_MAX_PER_MINUTE, window=60):
+        self.max_concurrent = max_concurrent
+        self.max_per_minute = max_per_minute
+        # Length of the "minute" in seconds (shorter when a benchmark compresses time)
+        self.window = window
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.starts = collections.deque()
+        self.paused_until = 0.0
+
+    def _delay(self, now):
+        # Seconds until the per-minute window and any pause allow another start
+        while self.starts and now - self.starts[0] >= self.window:
+            self.starts.popleft()
+        delay = self.paused_until - now
+        if len(self.starts) >= self.max_per_minute:
+            delay = max(delay, self.window - (now - self.starts[0]))
+        return max(delay, 0.0)
+
+    def acquire(self):
+        """Block until a call may start; returns the seconds spent waiting."""
+        start = time.monotonic()
+        with self.condition:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._delay(now)
+                    if delay <= 0 and self.in_flight < self.max_concurrent:
+                        break
+                    self.condition.wait(delay or None)
+                self.in_flight += 1
+                self.starts.append(now)
+            finally:
+                self.waiting -= 1
+        return time.monotonic() - start
+
+    def try_acquire(self):
+        """Take a slot only if one is free right now (used for optional extra calls)."""
+        with self.condition:
+            now = time.monotonic()
+            if self._delay(now) > 0 or self.waiting or self.in_flight >= self.max_concurrent:
+                return False
+            self.in_flight += 1
+            self.starts.append(now)
+            return True
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def pause(self, seconds):
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def cooldown(self):
+        with self.condition:
+            return max(self.paused_until - time.monotonic(), 0.0)
+
+    def is_saturated(self):
+        with self.condition:
+            now = time.monotonic()
+            return self._delay(now) > 0 or self.in_flight + self.waiting >= self.max_concurrent
+
+    def load(self):
+        with self.condition:
+            now = time.monotonic()
+            self._delay(now)
+            return {
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "started_last_minute": len(self.starts),
+                "cooldown": round(max(self.paused_until - now, 0.0), 1),
+            }
+
+
+GOVERNOR = RateGovernor()
+
+
+def governor_metrics():
+    for key, value in GOVERNOR.load().items():
+        yield f"history_governor_{key}", "gauge", "Rate governor state (cooldown in seconds)", {}, value
+
+
+METRICS.add_collector(governor_metrics)
+
+
+# --- Backends ---
+class PredictionTimeout(Exception):
+    pass
+
+
+TERMINAL_STATES = ("succeeded", "failed", "canceled")
+
+
+class ReplicateCall:
+    """One prediction started through the predictions API, so it can be abandoned and cancelled."""
+
+    poll_interval = 0.5
+
+    def __init__(self, model, input_data):
+        # replicate pulls in httpx/pydantic, so keep it off the startup path
+        import replicate
+
+        # Files already uploaded (same bytes) are sent as their existing URL
+        input_data = UPLOADS.prepare(input_data)
+        owner_name, _, version = model.partition(":")
+        if version:
+            self.prediction = replicate.predictions.create(version=version, input=input_data)
+        else:
+            self.prediction = replicate.models.predictions.create(model=owner_name, input=input_data)
+
+    def result(self, timeout=None):
+        import replicate
+        from replicate.exceptions import ModelError
+        from replicate.helpers import transform_output
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.prediction.status not in TERMINAL_STATES:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise PredictionTimeout(f"no result after {timeout:.0f}s")
+            time.sleep(self.poll_interval)
+            self.prediction.reload()
+
+        if self.prediction.status != "succeeded":
+            raise ModelError(self.prediction)
+        return transform_output(self.prediction.output, replicate.default_client)
+
+    def cancel(self):
+        if self.prediction.status in TERMINAL_STATES:
+            return
+        try:
+            self.prediction.cancel()
+        except Exception as e:
+            print(f"Cancel failed: {e}")
+
+
+class ReplicateBackend:
+    def start(self, model, input_data):
+        return ReplicateCall(model, input_data)
+
+
+BACKEND = None
+_backend_lock = threading.Lock()
+
+
+def default_backend():
+    """Replicate, or a cassette recorder/player around it (HISTORY_CASSETTE_MODE), shared per process."""
+    global BACKEND
+    with _backend_lock:
+        if BACKEND is None:
+            BACKEND = ReplicateBackend()
+            if CASSETTE_MODE:
+                from cassettes import backend_from_config
+
+                BACKEND = backend_from_config(BACKEND)
+        return BACKEND
+
+
+def is_rate_limit(error):
+    message = str(error).lower()
+    return "throttled" in message or "rate limit" in message
+
+
+def first_result(calls, timeout=None):
+    """Wait on several calls at once; returns (output, call) of the first to succeed."""
+    outcomes = queue.Queue()
+
+    def wait(call):
+        try:
+            outcomes.put((call, call.result(timeout), None))
+        except Exception as e:
+            outcomes.put((call, None, e))
+
+    for call in calls:
+        threading.Thread(target=wait, args=(call,), daemon=True).start()
+    error = None
+    for _ in calls:
+        call, output, error = outcomes.get()
+        if error is None:
+            return output, call
+    # All failed (or timed out): report the last one to finish
+    raise error
+
+
+def rewind_inputs(input_data):
+    # File inputs are read on upload; a retry or fallback must send them from the start
+    for value in input_data.values():
+        if hasattr(value, "seek"):
+            value.seek(0)
+
+
+# --- Model Client ---
+class ModelClient:
+    """
+    Runs models with request pacing, retry on rate limit errors and, per stage,
+    fallback to the next model in the registry chain when one is slow or failing.
+    """
+
+    def __init__(self, on_status=None, base_wait=BASE_WAIT, governor=None, registry=None, backend=None, retry_wait=8,
+                 hedge_stages=HEDGE_STAGES, wait_scale=1.0, warmth=None):
+        self.on_status = on_status or print
+        self.governor = governor or GOVERNOR
+        self.registry = registry or REGISTRY
+        # Cold starts seen per model, for the keep-warm scheduler (keepwarm.py)
+        self.warmth = warmth or WARMTH
+        self.backend = backend or default_backend()
+        # Replayed calls never reach the account, so free-tier pacing would only distort timings
+        self.base_wait = 0 if getattr(self.backend, "offline", False) else base_wait
+        self.retry_wait = retry_wait
+        self.hedge_stages = hedge_stages
+        # Multiplies every wait this client chooses (pacing, retry, rate-limit pause);
+        # the stand-in benchmarks compress time with it
+        self.wait_scale = wait_scale
+
+    def run_stage(self, stage, input_data, primary=None, step_name="API call"):
+        """Run a pipeline stage on the first healthy model of its chain, falling back on failure."""
+        models = self.registry.route(stage, primary)
+        slo = self.registry.slo.get(stage)
+        last_error = None
+        for index, model in enumerate(models):
+            has_fallback = index < len(models) - 1
+            if not self.registry.begin(model) and has_fallback:
+                continue
+            try:
+                # Only give up on a slow model when there is another one to go to
+                return self.run_with_retry(
+                    model, input_data, step_name=step_name, stage=stage, timeout=slo if has_fallback else None
+                )
+            except PredictionTimeout:
+                last_error = PredictionTimeout(f"{step_name} exceeded its {slo}s SLO")
+                self.on_status(f"{step_name} is slow, switching to {models[index + 1].split(':')[0]}...")
+            except Exception as e:
+                last_error = e
+                if has_fallback:
+                    self.on_status(f"{step_name} failed, switching to {models[index + 1].split(':')[0]}...")
+        raise last_error
+
+    def run_with_retry(self, model, input_data, max_retries=3, step_name="API call", stage=None, timeout=None):
+        """
+        Run a model with automatic retry on rate limit errors.
+        A timeout abandons (and cancels) the prediction without retrying it.
+        """
+        attempts = MODEL_ATTEMPTS.labels
+        for attempt in range(max_retries):
+            try:
+                if self.base_wait:
+                    time.sleep((self.base_wait + random.uniform(0, 4)) * self.wait_scale)
+                rewind_inputs(input_data)
+                output = self._call(model, input_data, stage, timeout)
+                attempts(stage or "-", model_label(model), "ok").inc()
+                return output
+            except PredictionTimeout:
+                attempts(stage or "-", model_label(model), "timeout").inc()
+                raise
+            except Exception as e:
+                attempts(stage or "-", model_label(model), "rate_limited" if is_rate_limit(e) else "error").inc()
+                if is_rate_limit(e):
+                    wait_time = 20
+                    match = re.search(r"resets in ~?(\d+)s", str(e))
+                    if match:
+                        wait_time = int(match.group(1)) + 5
+                    if attempt < max_retries - 1:
+                        # Everybody sharing the governor backs off, not just this call
+                        self.on_status(f"Rate limited. Waiting {wait_time}s... ({step_name})")
+                        self.governor.pause(wait_time * self.wait_scale)
+                        RATE_LIMIT_PAUSES.inc()
+                        continue
+                    raise Exception(f"Rate limit exceeded after {max_retries} attempts ({step_name})")
+                if attempt < max_retries - 1:
+                    self.on_status(f"Error: {str(e)[:40]}. Retrying... ({step_name})")
+                    time.sleep(self.retry_wait * self.wait_scale)
+                    continue
+                raise
+
+    def _call(self, model, input_data, stage, timeout):
+        waited = self.governor.acquire()
+        if waited > 0.01:
+            RATE_LIMIT_WAIT.inc(waited)
+        start = time.monotonic()
+        latency = None
+        ok = False
+        self.warmth.started(model)
+        try:
+            call = self.backend.start(model, input_data)
+            output, latency = self._result(call, model, input_data, stage, timeout, start)
+            ok = True
+            return output
+        except Exception as e:
+            # Being throttled says nothing about the model's health, but a trial call
+            # claimed by registry.begin must still be given back
+            if is_rate_limit(e):
+                if stage:
+                    self.registry.release(model)
+                stage = None
+            raise
+        finally:
+            self.governor.release()
+            elapsed = time.monotonic() - start
+            self.warmth.observe(model, start, latency or elapsed, ok)
+            MODEL_SECONDS.labels(stage or "-", model_label(model)).observe(elapsed)
+            if stage:
+                self.registry.record(stage, model, latency or elapsed, ok, effective=elapsed)
+
+    def _result(self, call, model, input_data, stage, timeout, start):
+        """
+        Wait for a call; returns (output, latency of the prediction that answered).
+
+        On a hedged stage, a call still running past the model's usual latency gets
+        a duplicate. Whichever answers first wins and the other is cancelled.
+        """
+        delay = self.registry.hedge_delay(model) if stage in self.hedge_stages else None
+        if delay is None or (timeout is not None and delay >= timeout):
+            return self._finish(call, timeout), time.monotonic() - start
+
+        try:
+            return call.result(delay), time.monotonic() - start
+        except PredictionTimeout:
+            pass
+        remaining = None if timeout is None else timeout - (time.monotonic() - start)
+
+        # The duplicate is optional: skip it when over budget or the account is busy
+        if not self.registry.claim_hedge(model):
+            return self._finish(call, remaining), time.monotonic() - start
+        if not self.governor.try_acquire():
+            return self._finish(call, remaining), time.monotonic() - start
+        try:
+            rewind_inputs(input_data)
+            hedge_start = time.monotonic()
+            hedge = self.backend.start(model, input_data)
+        except Exception:
+            self.governor.release()
+            return self._finish(call, remaining), time.monotonic() - start
+
+        calls = [call, hedge]
+        winner = None
+        try:
+            output, winner = first_result(calls, remaining)
+        finally:
+            self.governor.release()
+            # The loser, or both on timeout; cancelling a finished prediction is a no-op
+            for other in calls:
+                if other is not winner:
+                    other.cancel()
+        if winner is hedge:
+            self.registry.record_hedge_win(model, time.monotonic() - hedge_start)
+        # After a hedge win this is how long the cancelled primary ran at least: recorded
+        # as its latency, so percentiles (and the next hedge delay) keep the slow tail
+        return output, time.monotonic() - start
+
+    def _finish(self, call, timeout):
+        try:
+            return call.result(timeout)
+        except PredictionTimeout:
+            call.cancel()
+            raise
@@ -0,0 +1,108 @@
+from config import MODEL_IMAGE, MODEL_IMAGE_FAST, MODEL_WHISPER
+
+
+# --- Presentation Modes ---
+class Mode:
+    """Which pipeline stages a mode runs and how it shows the answer."""
+
+    name = None
+    title = "Talk to History"
+    geometry = "800x900"
+    stages = ("transcribe", "think", "paint", "speak")
+
+    model_whisper = MODEL_WHISPER
+    model_image = MODEL_IMAGE
+    # Fast model for a draft portrait shown until model_image finishes (None = wait for it)
+    model_image_draft = None
+    monologue_style = "dramatic"
+    monologue_suffix = ""
+    image_prompt = (
+        "Generate a picture of {figure}, hyperrealistic, 8K, looking directly at the user face to face, "
+        "speaking, giving a monologue. Should have a microphone standing beside their head and have "
+        "intensity in the eyes like they are saying something very important."
+    )
+    needs_portrait_file = False
+    tts_speed = None
+    max_speech_duration = None
+
+    # Heavy modules this mode will need, imported in the background once the window is up
+    preload_modules = ("requests", "replicate", "PIL.Image", "PIL.ImageTk", "soundfile", "pygame")
+
+    def create_presenter(self, app):
+        raise NotImplementedError
+
+
+class PortraitMode(Mode):
+    name = "portrait"
+    monologue_suffix = " Thank you."
+    model_image_draft = MODEL_IMAGE_FAST
+
+    def create_presenter(self, app):
+        from presenters import PortraitPresenter
+
+        return PortraitPresenter(app)
+
+
+class WanMode(Mode):
+    name = "wan"
+    title = "Talk to History - Video Edition"
+    stages = ("transcribe", "think", "paint", "animate", "speak")
+    needs_portrait_file = True
+    preload_modules = Mode.preload_modules + ("cv2",)
+
+    def create_presenter(self, app):
+        from presenters import VideoPresenter
+
+        return VideoPresenter(app)
+
+
+class SadTalkerMode(Mode):
+    name = "sadtalker"
+    title = "Talk to History - Video Edition"
+    geometry = "800x950"
+    stages = ("transcribe", "think", "paint", "speak", "lipsync")
+
+    model_whisper = "openai/whisper:4d50797290df275329f202e48c76360b3f22b08d28c196cbc54600319435f8d2"
+    model_image = MODEL_IMAGE_FAST
+    monologue_style = "detailed and concise"
+    image_prompt = (
+        "A cinematic portrait of {figure}, hyperrealistic, 8K quality, "
+        "facing directly at camera, neutral expression, front-facing, "
+        "dramatic lighting, historical period-accurate clothing, "
+        "professional studio photograph, clean background"
+    )
+    needs_portrait_file = True
+    tts_speed = 1.2
+    max_speech_duration = 60.0
+    preload_modules = Mode.preload_modules + ("cv2",)
+
+    def create_presenter(self, app):
+        from presenters import VideoPresenter
+
+        return VideoPresenter(app)
+
+
+class TalkingMode(Mode):
+    name = "talking"
+    title = "Talk to History - Talking Portrait"
+    # The fast portrait model and no video stage: the portrait is animated locally from the speech
+    model_image = MODEL_IMAGE_FAST
+    image_prompt = SadTalkerMode.image_prompt
+    monologue_suffix = " Thank you."
+    # OpenCV only improves face placement; without it a centred face is assumed
+    preload_modules = Mode.preload_modules + ("numpy", "cv2")
+
+    def create_presenter(self, app):
+        from presenters import TalkingPresenter
+
+        return TalkingPresenter(app)
+
+
+MODES = {mode.name: mode for mode in (PortraitMode(), WanMode(), SadTalkerMode(), TalkingMode())}
+
+
+def get_mode(name):
+    try:
+        return MODES[name]
+    except KeyError:
+        raise ValueError(f"Unknown mode '{name}'. Choose one of: {', '.join(sorted(MODES))}")
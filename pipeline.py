@@ -0,0 +1,454 @@
+import copy
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_cache import default_cache
+from artifacts import default_store
+from budget import default_budget, trim_to_words, word_count
+from config import (
+    CANVAS_SIZE,
+    CHECKPOINT_PATH,
+    OUTPUT_AUDIO_PATH,
+    OUTPUT_VIDEO_PATH,
+    PORTRAIT_PATH,
+)
+from conversation import Conversation
+from figures import default_figures
+from media_pool import default_media_pool
+from metrics import DOWNLOAD_BYTES, QUESTIONS, STAGE_SECONDS
+from models import ModelClient
+from voices import default_voices
+
+# What each stage adds to a PipelineResult, kept in the run's checkpoint (files are in the run already)
+CHECKPOINT_FIELDS = {
+    "think": ("figure_id", "figure_name", "gender", "monologue", "is_follow_up"),
+    "speak": ("speech_seconds",),
+}
+
+# Status text for every stage, formatted with what is known about the answer so far
+STAGE_LABELS = {
+    "transcribe": "Transcribing",
+    "think": "Researching Figure",
+    "paint": "Painting {figure}",
+    "animate": "Animating {figure}",
+    "speak": "Synthesizing {gender} voice",
+    "lipsync": "Creating SadTalker talking video",
+}
+
+
+def fetch(output):
+    """Bytes of a model file output (a FileOutput-like object or a URL)."""
+    if hasattr(output, "read"):
+        data = output.read()
+    else:
+        import requests
+
+        data = requests.get(str(output)).content
+    DOWNLOAD_BYTES.labels("model_output").inc(len(data))
+    return data
+
+
+class PipelineResult:
+    """Everything one question produced, handed from the pipeline to playback."""
+
+    def __init__(self, audio_in=None, run=None):
+        self.audio_in = audio_in
+        # Artifact directory (artifacts.Run) holding every file of this answer
+        self.run = run
+        self.user_text = None
+        # Canonical figure (figures.py): the same for "Napoleon" and "Emperor Napoleon I"
+        self.figure_id = None
+        self.figure_name = None
+        self.gender = None
+        self.monologue = None
+        # budget.SpeechPlan the monologue was asked for, and how long it was spoken
+        self.plan = None
+        self.speech_seconds = None
+        self.images = []
+        # Progressive modes: Future of the high-quality images while a draft is shown
+        self.final_images = None
+        self.audio_path = None
+        self.video_path = None
+        self.is_follow_up = False
+        self.from_cache = False
+        # Set when the answer is replayed from a session bundle (bundles.py) instead of a run
+        self.bundle = None
+
+    def audio_source(self):
+        """What playback reads the speech from: the file, or a bundle's speech in memory."""
+        return self.bundle.audio() if self.bundle else self.audio_path
+
+
+# --- AI Pipeline ---
+class Pipeline:
+    """Runs the model stages of a presentation mode, independent of any UI."""
+
+    def __init__(self, mode, client=None, on_status=None, canvas_size=CANVAS_SIZE, conversation=None, on_stage=None,
+                 store=None, cache=None, figures=None, voices=None, budget=None, media=None):
+        self.mode = mode
+        self.media = media or default_media_pool()
+        self.budget = budget or default_budget()
+        self.store = store
+        self.figures = figures
+        self.voices = voices
+        self.cache = cache or default_cache()
+        self.on_status = on_status or print
+        self.on_stage = on_stage
+        self.client = client or ModelClient(on_status=self.on_status)
+        self.canvas_size = canvas_size
+        self.conversation = conversation or Conversation()
+        self.images_lock = threading.Lock()
+
+    def with_conversation(self, conversation):
+        """The same pipeline answering within another conversation (e.g. a snapshot)."""
+        pipeline = copy.copy(self)
+        pipeline.conversation = conversation
+        return pipeline
+
+    def run(self, audio_path, run=None, text=None, resume=False):
+        """
+        Answer one question; a typed question (text) skips transcription. Files are
+        written to run (a new artifact directory if not given). With resume, stages
+        the run's checkpoint records as done are restored instead of run again.
+        """
+        self.conversation.expire_if_idle()
+        # Answers within a conversation depend on what came before, so only these are cached
+        standalone = self.conversation.figure_name is None
+        if run is None:
+            run = (self.store or default_store()).new_run()
+        result = PipelineResult(audio_path, run)
+        result.user_text = text
+        done = self._restore(result) if resume else []
+        # A typed question (or one transcribed before a resume) has no transcription to run
+        stages = [stage for stage in self.mode.stages if not (result.user_text and stage == "transcribe")]
+        total = len(stages)
+        result.plan = self.budget.plan(self.mode, typed=bool(result.user_text))
+        timings = {}
+        try:
+            for index, stage in enumerate(stages, 1):
+                if stage in done:
+                    continue
+                if stage == "think" and standalone and self._answer_from_cache(result):
+                    break
+                label = STAGE_LABELS[stage].format(figure=result.figure_name, gender=result.gender)
+                self.on_status(f"Processing... ({index}/{total} {label})")
+                if self.on_stage:
+                    self.on_stage(stage, index, total)
+                started = time.monotonic()
+                with STAGE_SECONDS.labels(self.mode.name, stage).time():
+                    getattr(self, stage)(result)
+                timings[stage] = time.monotonic() - started
+                done.append(stage)
+                self._checkpoint(result, done)
+        except Exception as e:
+            QUESTIONS.labels(self.mode.name, "error").inc()
+            self._checkpoint(result, done, failed={"stage": stage, "error": str(e)})
+            raise
+        QUESTIONS.labels(self.mode.name, "cached" if result.from_cache else "answered").inc()
+        self.conversation.record(result)
+        if not result.from_cache:
+            # Follow-ups reuse the portrait and video, so only their speech length is learned from
+            self.budget.observe(self.mode, {} if result.is_follow_up else timings, word_count(result.monologue),
+                                result.speech_seconds)
+        if standalone and not result.from_cache:
+            self.cache.add(result, self.mode.name)
+        return result
+
+    # --- Stages ---
+    def transcribe(self, result):
+        with open(result.audio_in, "rb") as file:
+            output = self.client.run_stage(
+                "transcribe", {"audio": file}, primary=self.mode.model_whisper, step_name="Transcription"
+            )
+
+        if isinstance(output, dict):
+            result.user_text = output.get("transcription") or output.get("text") or str(output)
+        else:
+            result.user_text = str(output)
+        print(f"User said: {result.user_text}")
+
+    def think(self, result):
+        from brain import BRAIN_STATS, BrainParseError, parse_brain_response
+
+        prompt = self.conversation.build_prompt(result.user_text)
+        plan = result.plan or self.budget.plan(self.mode)
+        if plan.limit != "default":
+            print(f"Speech budget: {plan}")
+        full_response = self._ask_brain(prompt, plan)
+        print("Brain Response:", full_response)
+
+        try:
+            response, outcome = parse_brain_response(full_response, self.conversation.figure_name)
+        except BrainParseError as e:
+            # Last resort: one targeted re-ask instead of losing the whole question
+            print(f"{e}. Asking again for JSON only.")
+            self.on_status("Processing... (answer unreadable, asking again)")
+            full_response = self._ask_brain(
+                "Your previous reply could not be read. Answer the visitor again and reply "
+                "with ONLY the JSON object, nothing before or after it, keeping the monologue "
+                f"under {plan.words} words.\n\n{prompt}",
+                plan,
+            )
+            try:
+                response, _ = parse_brain_response(full_response, self.conversation.figure_name)
+            except BrainParseError:
+                BRAIN_STATS.record("failed")
+                raise
+            outcome = "reasked"
+        BRAIN_STATS.record(outcome)
+        print(f"Brain output {outcome} ({BRAIN_STATS.summary()})")
+
+        figure = (self.figures or default_figures()).resolve(response.character_name, response.gender)
+        result.figure_id = figure.id
+        result.figure_name = figure.name
+        result.gender = figure.gender or response.gender
+        # A brain that overshoots its budget a little is let off; beyond that the speech would run long
+        monologue = trim_to_words(response.monologue, int(plan.words * 1.1))
+        if monologue != response.monologue:
+            print(f"Monologue trimmed from {word_count(response.monologue)} to {word_count(monologue)} words")
+        result.monologue = monologue + self.mode.monologue_suffix
+
+        # A follow-up keeps the same voice and portrait as the rest of the conversation
+        if self.conversation.is_same_figure(result.figure_id):
+            result.is_follow_up = True
+            result.figure_name = self.conversation.figure_name
+            result.gender = self.conversation.gender
+        print(f"Figure: {result.figure_name} ({result.figure_id}) | Gender: {result.gender}")
+
+    def paint(self, result):
+        if result.is_follow_up and self.conversation.images:
+            result.images = self.conversation.images
+            if self.mode.needs_portrait_file:
+                result.run.write_image(PORTRAIT_PATH, result.images[0])
+            return
+
+        image_prompt = self.mode.image_prompt.format(figure=result.figure_name)
+        if self.mode.model_image_draft:
+            self._paint_progressive(result, image_prompt)
+        else:
+            result.images = self._generate_images(image_prompt, self.mode.model_image, "Image Generation")
+
+        if self.mode.needs_portrait_file and result.images:
+            result.run.write_image(PORTRAIT_PATH, result.images[0])
+
+    def animate(self, result):
+        # Wan image-to-video from the portrait; the clip is looped under the speech
+        if result.is_follow_up and self.conversation.video_path and os.path.exists(self.conversation.video_path):
+            # Linked into this run, so the clip outlives the run it was made for
+            result.video_path = result.run.link(OUTPUT_VIDEO_PATH, self.conversation.video_path)
+            return
+        if not result.images:
+            return
+        with open(result.run.path(PORTRAIT_PATH), "rb") as img_file:
+            video_output = self.client.run_stage(
+                "video",
+                {
+                    "image": img_file,
+                    "prompt": f"A cinematic video of {result.figure_name} speaking, talking directly to camera, realistic movement",
+                    "aspect_ratio": "1:1",
+                },
+                step_name="Video Generation",
+            )
+        result.video_path = self._download_video(video_output, result.run)
+
+    def speak(self, result):
+        figure = (self.figures or default_figures()).get(result.figure_id)
+        speaker = (self.voices or default_voices()).speaker(result.figure_id, result.gender, figure and figure.age)
+        tts_input = {
+            "text": result.monologue,
+            "language": "en",
+            "speaker": speaker,
+            "cleanup_voice": True,
+        }
+        if self.mode.tts_speed:
+            tts_input["speed"] = self.mode.tts_speed
+
+        tts_output = self.client.run_stage("tts", tts_input, step_name="Voice Synthesis")
+        audio_bytes = fetch(tts_output)
+
+        import soundfile as sf
+
+        result.speech_seconds = sf.info(io.BytesIO(audio_bytes)).duration
+        max_speech = self.budget.max_speech(self.mode)
+        if max_speech and result.speech_seconds > max_speech:
+            # Only when the voice ran slower than planned; the monologue was sized to fit
+            audio_bytes = self.media.clip_audio(audio_bytes, max_speech).result()
+            print(f"Audio clipped from {result.speech_seconds:.2f}s to {max_speech}s")
+
+        result.audio_path = result.run.write(OUTPUT_AUDIO_PATH, audio_bytes)
+
+    def lipsync(self, result):
+        # SadTalker drives the portrait with the synthesized speech
+        with open(result.run.path(PORTRAIT_PATH), "rb") as img_file, open(result.audio_path, "rb") as aud_file:
+            video_output = self.client.run_stage(
+                "lipsync",
+                {"driven_audio": aud_file, "source_image": img_file},
+                step_name="Image-to-Video Generation",
+            )
+        result.video_path = self._download_video(video_output, result.run)
+
+    # --- Checkpoints ---
+    def _checkpoint(self, result, done, failed=None):
+        state = {"mode": self.mode.name, "done": done, "failed": failed, "user_text": result.user_text}
+        for stage in done:
+            for field in CHECKPOINT_FIELDS.get(stage, ()):
+                state[field] = getattr(result, field)
+        try:
+            if "paint" in done and result.images and not result.run.has(PORTRAIT_PATH):
+                self._keep_portrait(result)
+            result.run.write(CHECKPOINT_PATH, json.dumps(state, indent=2).encode("utf-8"))
+        except OSError as e:
+            print(f"Checkpoint not saved: {e}")
+
+    def _keep_portrait(self, result):
+        """Save the portrait for a resume; a draft is replaced once the final portrait is painted."""
+        with self.images_lock:
+            img = result.images[0]
+        result.run.write_image(PORTRAIT_PATH, img)
+        if result.final_images:
+            def save_final(future):
+                if not future.exception() and future.result():
+                    result.run.write_image(PORTRAIT_PATH, future.result()[0])
+
+            result.final_images.add_done_callback(save_final)
+
+    def _restore(self, result):
+        """Fill in result from the run's checkpoint; returns the stages already done."""
+        run = result.run
+        if not run.has(CHECKPOINT_PATH):
+            return []
+        with open(run.path(CHECKPOINT_PATH), encoding="utf-8") as file:
+            state = json.load(file)
+        done = [stage for stage in state["done"] if stage in self.mode.stages]
+        result.user_text = result.user_text or state.get("user_text")
+        for stage in done:
+            for field in CHECKPOINT_FIELDS.get(stage, ()):
+                setattr(result, field, state.get(field))
+        if "paint" in done and run.has(PORTRAIT_PATH):
+            with open(run.path(PORTRAIT_PATH), "rb") as file:
+                result.images = [self.media.decode_image(file.read(), self.canvas_size).result()]
+        if "speak" in done:
+            result.audio_path = run.path(OUTPUT_AUDIO_PATH)
+        if "animate" in done or "lipsync" in done:
+            result.video_path = run.path(OUTPUT_VIDEO_PATH)
+        failed = state.get("failed") or {}
+        print(f"Resuming {run.id} after {', '.join(done) or 'no stages'}"
+              + (f" ({failed['stage']} failed: {failed['error']})" if failed else ""))
+        return done
+
+    # --- Helpers ---
+    def _answer_from_cache(self, result):
+        """Fill in the answer to a near-identical earlier question; False if there is none."""
+        match = self.cache.lookup(result.user_text, self.mode.name, self.figures)
+        if not match:
+            return False
+        similarity, answer, cached_dir = match
+        try:
+            result.audio_path = result.run.link(OUTPUT_AUDIO_PATH, os.path.join(cached_dir, OUTPUT_AUDIO_PATH))
+            if os.path.exists(os.path.join(cached_dir, OUTPUT_VIDEO_PATH)):
+                result.video_path = result.run.link(OUTPUT_VIDEO_PATH, os.path.join(cached_dir, OUTPUT_VIDEO_PATH))
+            portrait_path = os.path.join(cached_dir, PORTRAIT_PATH)
+            if os.path.exists(portrait_path):
+                with open(portrait_path, "rb") as file:
+                    result.images = [self.media.decode_image(file.read(), self.canvas_size).result()]
+                if self.mode.needs_portrait_file:
+                    result.run.link(PORTRAIT_PATH, portrait_path)
+        except OSError as e:
+            # Collected from the cache meanwhile: answer it from scratch
+            print(f"Cached answer unusable: {e}")
+            result.audio_path = result.video_path = None
+            result.images = []
+            return False
+        figure_id = answer.get("figure_id")
+        if figure_id is None:
+            # Cached before figures had ids
+            figure_id = (self.figures or default_figures()).resolve(answer["figure_name"], answer["gender"]).id
+        result.figure_id = figure_id
+        result.figure_name = answer["figure_name"]
+        result.gender = answer["gender"]
+        result.monologue = answer["monologue"]
+        result.from_cache = True
+        self.on_status(f"Processing... (answered before, {similarity:.0%} match)")
+        print(f"Reusing the answer to a {similarity:.0%} similar question ({result.figure_name})")
+        return True
+
+    def _generate_images(self, image_prompt, model, step_name):
+        # JPEG output can be decoded at reduced scale (see media_pool.decode_image)
+        image_input = {"prompt": image_prompt, "aspect_ratio": "1:1", "output_format": "jpg"}
+        if self.canvas_size <= 512:
+            # flux-schnell renders 512x512 at 0.25 MP instead of 1 MP; models without the input ignore it
+            image_input["megapixels"] = "0.25"
+        img_output = self.client.run_stage("image", image_input, primary=model, step_name=step_name)
+
+        urls = img_output if isinstance(img_output, (list, tuple)) else [img_output]
+        # Each image decodes in the media pool while the next one downloads
+        decoded = [self.media.decode_image(fetch(url), self.canvas_size) for url in urls]
+        return [future.result() for future in decoded]
+
+    def _paint_progressive(self, result, image_prompt):
+        """
+        Paint a fast draft and the high-quality portrait at the same time. The stage
+        returns with the draft; the presenter cross-fades once final_images is done.
+        """
+        # result.images is filled in place, so the conversation's reference to it
+        # (kept for follow-ups) ends up with the final portrait too
+        result.images = []
+        has_final = []
+
+        def paint_final():
+            images = self._generate_images(image_prompt, self.mode.model_image, "Image Generation")
+            with self.images_lock:
+                result.images[:] = images
+                has_final.append(True)
+            return images
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        result.final_images = executor.submit(paint_final)
+        executor.shutdown(wait=False)
+
+        try:
+            draft = self._generate_images(image_prompt, self.mode.model_image_draft, "Draft Image")
+        except Exception as e:
+            print(f"Draft image failed ({e}), waiting for the final portrait")
+            result.final_images.result()
+            result.final_images = None
+            return
+        with self.images_lock:
+            if not has_final:
+                result.images[:] = draft
+
+    def _ask_brain(self, prompt, plan):
+        system_prompt = (
+            "You are an AI acting as a historical figure. "
+            "1. Identify the historical character from the user's input. "
+            "2. Determine their gender ('male' or 'female'). "
+            f"3. Write a {self.mode.monologue_style}, first-person monologue answering the user, "
+            f"at most {plan.words} words long. "
+            "If the conversation so far is included, stay in character as that figure "
+            "unless the user clearly asks for someone else. "
+            "Output strictly valid JSON: "
+            '{"character_name": "Name", "gender": "male/female", "monologue": "Text"} '
+            "Do not include markdown or code blocks."
+        )
+
+        brain_output = self.client.run_stage(
+            "brain",
+            {
+                "prompt": prompt,
+                "system_prompt": system_prompt,
+                "max_tokens": plan.max_tokens,
+                "max_new_tokens": plan.max_tokens,
+            },
+            step_name="Brain Processing",
+        )
+        return brain_output if isinstance(brain_output, str) else "".join(brain_output)
+
+    def _download_video(self, video_output, run):
+        # video_output might be a list or single item depending on model schema
+        if isinstance(video_output, (list, tuple)):
+            video_output = video_output[0]
+        return run.write(OUTPUT_VIDEO_PATH, fetch(video_output))
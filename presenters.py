@@ -0,0 +1,253 @@
+import threading
+import time
+
+from metrics import FRAMES, FRAMES_DROPPED
+
+# Fade timing: 40 steps * 50ms = 2 seconds
+FADE_STEPS = 40
+FADE_INTERVAL_MS = 50
+FADE_OUT_SECONDS = FADE_STEPS * FADE_INTERVAL_MS / 1000.0
+
+
+# --- Portrait: cross-fading still image ---
+class PortraitPresenter:
+    """Fades the portrait in from black and back out just before the speech ends."""
+
+    def __init__(self, app):
+        self.app = app
+        self.image = None
+        self.black_img = None
+        self.fade_job = None
+        self.is_fading_out = False
+        self.final_images = None
+        self.fade_frames = None  # Future of the current fade's frames, blended in the media pool
+
+    def start(self, result):
+        from PIL import Image
+
+        size = self.app.canvas_size
+        self.image = result.images[0] if result.images else None
+        self.black_img = Image.new("RGB", (size, size), "black")
+        self.is_fading_out = False
+        # A draft portrait is swapped for the final one when it arrives
+        self.final_images = result.final_images
+        self.swap_in_final()
+
+        # Start with black and fade in
+        if self.image:
+            self.fade_step(self.black_img, self.image, 0)
+
+    def update(self, position, duration):
+        if not self.is_fading_out and (duration - position <= FADE_OUT_SECONDS):
+            self.is_fading_out = True
+            self.final_images = None  # Too late to swap
+            if self.image:
+                self.fade_step(self.image, self.black_img, 0)
+        elif self.fade_job is None and duration - position > 2 * FADE_OUT_SECONDS:
+            # Not during another fade, and with time left to finish this one
+            image = self.image
+            if self.swap_in_final() and image:
+                self.fade_step(image, self.image, 0)
+
+    def swap_in_final(self):
+        """Take the final portrait if it is ready; True if self.image changed."""
+        if self.final_images is None or not self.final_images.done():
+            return False
+        final_images, self.final_images = self.final_images, None
+        try:
+            images = final_images.result()
+        except Exception as e:
+            print(f"Final portrait failed, keeping the draft: {e}")
+            return False
+        if not images:
+            return False
+        self.image = images[0]
+        return True
+
+    def stop(self):
+        if self.fade_job:
+            self.app.root.after_cancel(self.fade_job)
+            self.fade_job = None
+        if self.fade_frames:
+            from media_pool import release
+
+            release(self.fade_frames)
+            self.fade_frames = None
+
+    def fade_step(self, img1, img2, step, total_steps=FADE_STEPS):
+        from PIL import Image
+
+        # Cancel previous if this is step 0
+        if step == 0:
+            self.stop()
+            from media_pool import default_media_pool
+
+            self.fade_frames = default_media_pool().fade_frames(img1, img2, total_steps)
+
+        # Blend images: alpha 0.0 is img1, 1.0 is img2
+        if step > total_steps:
+            self.fade_job = None
+            self.stop()
+            return
+
+        frames = self.fade_frames
+        if frames.done() and frames.exception() is None:
+            self.app.display_image(frames.result().image(step))
+        else:
+            # The pool has not caught up (or failed): blend this one step here
+            self.app.display_image(Image.blend(img1, img2, step / float(total_steps)))
+
+        # Schedule next frame of fade
+        self.fade_job = self.app.root.after(
+            FADE_INTERVAL_MS, lambda: self.fade_step(img1, img2, step + 1, total_steps)
+        )
+
+
+# --- Talking portrait: animated locally ---
+class TalkingPresenter:
+    """Moves the portrait's mouth and eyes with the speech (talking.py), fading in and out."""
+
+    def __init__(self, app):
+        self.app = app
+        self.image = None
+        self.black_img = None
+        self.talking = None
+        self.frame_job = None
+        self.generation = 0
+        self.last_index = None
+
+    def start(self, result):
+        from PIL import Image
+
+        self.stop()
+        self.image = result.images[0] if result.images else None
+        self.talking = None
+        self.last_index = None
+        if not self.image:
+            return
+        self.black_img = Image.new("RGB", self.image.size, "black")
+        # Reading the speech and finding the face stays off the UI thread; the still portrait shows meanwhile
+        threading.Thread(
+            target=self.prepare, args=(self.image, result.audio_source(), self.generation), daemon=True
+        ).start()
+        self.next_frame()
+
+    def prepare(self, image, audio_path, generation):
+        from talking import TalkingPortrait
+
+        try:
+            talking = TalkingPortrait.from_audio(image, audio_path)
+        except Exception as e:
+            print(f"Talking portrait unavailable, showing the still: {e}")
+            return
+        if generation == self.generation:
+            self.talking = talking
+
+    def next_frame(self):
+        from PIL import Image
+
+        from talking import FPS
+
+        if not self.app.is_paused:
+            position = self.app.playback_position()
+            time_left = self.app.audio_duration - position
+            brightness = max(min(position / FADE_OUT_SECONDS, time_left / FADE_OUT_SECONDS, 1.0), 0.0)
+            if self.talking is not None:
+                self.app.display_image(self.talking.frame(position, brightness))
+            else:
+                self.app.display_image(Image.blend(self.black_img, self.image, brightness))
+            FRAMES.labels("talking").inc()
+            # Frames whose time passed while the UI was busy
+            index = int(position * FPS)
+            if self.last_index is not None and index > self.last_index + 1:
+                FRAMES_DROPPED.labels("talking").inc(index - self.last_index - 1)
+            self.last_index = index
+        self.frame_job = self.app.root.after(int(1000 / FPS), self.next_frame)
+
+    def update(self, position, duration):
+        pass  # Frames are driven by next_frame
+
+    def stop(self):
+        self.generation += 1
+        if self.frame_job:
+            self.app.root.after_cancel(self.frame_job)
+            self.frame_job = None
+
+
+# --- Video: Wan / SadTalker clip ---
+class VideoPresenter:
+    """Plays the downloaded clip on a worker thread, looping it under the speech."""
+
+    def __init__(self, app):
+        self.app = app
+        self.image = None
+        self.stop_event = threading.Event()
+        self.video_thread = None
+
+    def start(self, result):
+        self.image = result.images[0] if result.images else None
+        if not result.video_path and not (result.bundle and result.bundle.has("video.rgb")):
+            if self.image:
+                self.app.display_image(self.image)
+            return
+
+        self.stop_event = threading.Event()
+        self.video_thread = threading.Thread(
+            target=self.play_video, args=(result, self.stop_event), daemon=True
+        )
+        self.video_thread.start()
+
+    def update(self, position, duration):
+        pass  # Frames and fade-out are driven by the video thread
+
+    def stop(self):
+        self.stop_event.set()
+
+    def play_video(self, result, stop_event):
+        """Play video frames synchronized with audio; they are decoded a chunk ahead in the media pool."""
+        import numpy as np
+        from PIL import Image
+
+        from media_pool import VideoFrames, default_media_pool
+
+        root = self.app.root
+        if result.bundle:
+            # Decoded when the bundle was made
+            frames = result.bundle.video_frames()
+        else:
+            frames = VideoFrames(default_media_pool(), result.video_path, self.app.canvas_size)
+        try:
+            frame_delay = 1.0 / frames.fps
+            next_time = time.monotonic()
+
+            while not stop_event.is_set():
+                if not self.app.is_paused:
+                    frame = frames.next()
+
+                    # Fade to black over the last seconds of speech
+                    time_left = self.app.audio_duration - self.app.playback_position()
+                    if time_left <= FADE_OUT_SECONDS:
+                        frame = (frame * (max(time_left, 0) / FADE_OUT_SECONDS)).astype(np.uint8)
+
+                    img = Image.fromarray(frame)
+                    root.after(0, self.app.display_image, img)
+                    FRAMES.labels("video").inc()
+
+                    # Behind by whole frames: skip them rather than drift away from the speech
+                    next_time += frame_delay
+                    behind = int((time.monotonic() - next_time) / frame_delay)
+                    if behind > 0:
+                        frames.skip(behind)
+                        FRAMES_DROPPED.labels("video").inc(behind)
+                        next_time += behind * frame_delay
+                    time.sleep(max(next_time - time.monotonic(), 0))
+                else:
+                    time.sleep(frame_delay)
+                    next_time = time.monotonic()
+
+        except Exception as e:
+            print(f"Video playback error: {e}")
+            if self.image:
+                root.after(0, self.app.display_image, self.image)
+        finally:
+            frames.close()
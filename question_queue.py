@@ -0,0 +1,116 @@
+import collections
+import threading
+
+from artifacts import default_store
+from config import INPUT_AUDIO_PATH, QUEUE_DEPTH
+
+
+class QueueFull(Exception):
+    pass
+
+
+class QuestionJob:
+    def __init__(self, run, text=None):
+        self.run = run
+        self.input_path = run.path(INPUT_AUDIO_PATH)
+        # A typed question goes straight to the brain
+        self.text = text
+        self.result = None
+        self.error = None
+        # Set for a retry: the run's checkpoint says which stages are already done
+        self.resume = False
+        # Copy of the conversation the answer was built on; recorded into the real one when shown
+        self.conversation = None
+
+
+# --- Question Queue ---
+class QuestionQueue:
+    """
+    FIFO of recorded questions with look-ahead processing.
+
+    One worker thread runs the pipeline for the oldest waiting question while the
+    current answer plays, so the next answer is usually ready the moment the
+    current one finishes. max_depth counts every question not yet played
+    (waiting, processing and ready). A local pipeline answers on a snapshot of
+    its conversation, so the history only changes when the answer is shown.
+
+    Every job gets its own pinned artifact run; whoever plays (or drops) the
+    answer releases it.
+    """
+
+    def __init__(self, pipeline, on_ready=None, on_error=None, max_depth=QUEUE_DEPTH, store=None):
+        self.pipeline = pipeline
+        self.on_ready = on_ready or (lambda job: None)
+        self.on_error = on_error or (lambda job: None)
+        self.max_depth = max(1, max_depth)
+        self.store = store
+
+        self.pending = collections.deque()
+        self.ready = collections.deque()
+        self.processing = None
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.pending) + len(self.ready) + (1 if self.processing else 0)
+
+    def is_full(self):
+        return len(self) >= self.max_depth
+
+    def is_busy(self):
+        with self.condition:
+            return bool(self.pending or self.processing)
+
+    def new_job(self, text=None):
+        return QuestionJob((self.store or default_store()).new_run(), text)
+
+    def submit(self, job):
+        """Queue a recorded question; returns its 1-based position in line."""
+        with self.condition:
+            if len(self.pending) + len(self.ready) + (1 if self.processing else 0) >= self.max_depth:
+                raise QueueFull(f"{self.max_depth} questions already waiting")
+            self.pending.append(job)
+            self.condition.notify()
+            return len(self.ready) + (1 if self.processing else 0) + len(self.pending)
+
+    def retry(self, job):
+        """Queue a failed question again, resuming from the stage that failed."""
+        job.error = None
+        job.resume = True
+        return self.submit(job)
+
+    def pop_ready(self):
+        with self.condition:
+            return self.ready.popleft() if self.ready else None
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                job = self.processing = self.pending.popleft()
+
+            pipeline = self.pipeline
+            if hasattr(pipeline, "with_conversation"):
+                # The conversation as of the answers shown so far, not the one the app is using
+                job.conversation = pipeline.conversation.snapshot()
+                pipeline = pipeline.with_conversation(job.conversation)
+            try:
+                job.result = pipeline.run(job.input_path, run=job.run, text=job.text, resume=job.resume)
+            except Exception as e:
+                print(f"Error: {e}")
+                import traceback
+                traceback.print_exc()
+                job.error = e
+
+            with self.condition:
+                self.processing = None
+                if job.error is None:
+                    self.ready.append(job)
+
+            if job.error is None:
+                self.on_ready(job)
+            else:
+                self.on_error(job)
@@ -0,0 +1,37 @@
+from config import INPUT_AUDIO_PATH
+
+
+# --- Audio Recorder Class ---
+class AudioRecorder:
+    def __init__(self):
+        self.recording = False
+        self.audio_data = []
+        self.fs = 44100  # Sample rate
+        self.stream = None
+
+    def start(self):
+        # sounddevice is only needed once somebody actually records
+        import sounddevice as sd
+
+        self.recording = True
+        self.audio_data = []
+        self.stream = sd.InputStream(callback=self.callback, channels=1, samplerate=self.fs)
+        self.stream.start()
+
+    def stop(self, filename=INPUT_AUDIO_PATH):
+        import numpy as np
+        import soundfile as sf
+
+        self.recording = False
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+        if self.audio_data:
+            myrecording = np.concatenate(self.audio_data, axis=0)
+            sf.write(filename, myrecording, self.fs)
+            return filename
+        return None
+
+    def callback(self, indata, frames, time_info, status):
+        if self.recording:
+            self.audio_data.append(indata.copy())
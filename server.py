@@ -0,0 +1,413 @@
+"""
+Pipeline server: one host runs the model pipeline for many thin display clients.
+
+    python server.py --port 8765 --workers 4 --max-queue 8
+    python main.py --server http://pipeline-host:8765
+
+POST /questions?session=<id>&mode=<mode>   audio/wav body, or JSON {"text": "..."}
+POST /jobs/<id>/retry                      resume a failed job from the stage that failed, as a new job
+GET  /jobs/<id>                            job state as JSON
+GET  /jobs/<id>/events                     WebSocket: stage progress, then "done" or "error"
+GET  /jobs/<id>/audio|video|portrait       artifacts of a finished job
+GET  /health                               worker load, model quota and per-model latency stats
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from answer_cache import AnswerCache
+from artifacts import ArtifactStore
+from config import DEFAULT_MODE, INPUT_AUDIO_PATH, PORTRAIT_PATH, SESSION_IDLE_SECONDS
+from conversation import Conversation
+from keepwarm import start_keep_warm
+from metrics import METRICS, start_exporters
+from model_registry import REGISTRY
+from models import GOVERNOR, ModelClient
+from modes import MODES, get_mode
+from pipeline import Pipeline
+from uploads import UPLOADS
+from voices import default_voices
+from ws import WebSocketClosed, server_handshake
+
+# Finished jobs (and their files) are kept this long for clients to fetch and replay
+JOB_TTL_SECONDS = 15 * 60
+
+SERVER_ARTIFACT_DIR = "server_runs"
+SERVER_CACHE_DIR = "server_answer_cache"
+
+ARTIFACT_TYPES = {"audio": "audio/wav", "video": "video/mp4", "portrait": "image/jpeg"}
+
+
+class Job:
+    def __init__(self, job_id, session_id, mode, run, text=None):
+        self.id = job_id
+        self.session_id = session_id
+        self.mode = mode
+        self.run = run
+        self.text = text
+        self.input_path = None if text else run.path(INPUT_AUDIO_PATH)
+        self.resume = False
+        self.state = "queued"
+        self.position = 0
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.artifacts = {}
+        self.events = []
+        self.finished_at = None
+        self.condition = threading.Condition()
+
+    def emit(self, event):
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def finish(self, state, event):
+        # All at once: a streamer that sees finished_at must also see the final event
+        with self.condition:
+            self.events.append(event)
+            self.state = state
+            self.finished_at = time.time()
+            self.condition.notify_all()
+
+    def events_since(self, index, timeout=15):
+        """Events after index, waiting for new ones; empty once the job is over."""
+        with self.condition:
+            if len(self.events) <= index and not self.finished_at:
+                self.condition.wait(timeout)
+            return self.events[index:]
+
+    def describe(self):
+        return {"id": self.id, "state": self.state, "position": self.position, "events": len(self.events)}
+
+
+class Session:
+    """Conversation of one display client; its questions run one at a time."""
+
+    def __init__(self):
+        self.conversation = Conversation()
+        self.lock = threading.Lock()
+        self.last_seen = time.time()
+
+
+# --- Pipeline Server ---
+class PipelineServer:
+    def __init__(self, workers=4, max_queue=8, max_wait=60, store=None, cache=None, governor=None, client_factory=None,
+                 voices=None, budget=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        # Separate from the kiosk app's store, so neither collects the other's runs
+        self.store = store or ArtifactStore(SERVER_ARTIFACT_DIR)
+        self.cache = cache or AnswerCache(SERVER_CACHE_DIR)
+        self.governor = governor or GOVERNOR
+        # Pacing comes from the shared governor, not a fixed sleep per call
+        self.client_factory = client_factory or (lambda on_status: ModelClient(on_status=on_status, base_wait=0))
+        self.voices = voices
+        self.budget = budget
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.sessions = {}
+        self.active = 0
+        self.ids = itertools.count(1)
+        self.keep_warm = None
+
+    def admit(self):
+        """None if a new question can be taken, else seconds the client should wait."""
+        cooldown = self.governor.cooldown()
+        if cooldown > self.max_wait:
+            # Model quota exhausted for longer than a visitor should wait in line
+            return int(cooldown) + 1
+        if self.active >= self.workers + self.max_queue:
+            return 30
+        if self.active >= self.workers and self.governor.is_saturated():
+            # Every worker is busy and the models can't take more: only queue what fits
+            if self.active - self.workers >= self.max_queue // 2:
+                return 15
+        return None
+
+    def submit(self, session_id, mode_name, text=None, audio=None):
+        with self.lock:
+            retry_after = self.admit()
+            if retry_after is not None:
+                return None, retry_after
+            job_id = f"j{next(self.ids)}"
+            job = Job(job_id, session_id, mode_name, self.store.new_run(label=job_id), text)
+            self._enqueue(job)
+            if audio is not None:
+                job.run.write(INPUT_AUDIO_PATH, audio)
+        self.executor.submit(self.run_job, job)
+        return job, None
+
+    def retry(self, failed):
+        """Resume a failed job in a new job on the same run; (job, None) or (None, retry_after)."""
+        with self.lock:
+            retry_after = self.admit()
+            if retry_after is not None:
+                return None, retry_after
+            # The new job takes the run over, so expiring the failed one must not remove it
+            self.jobs.pop(failed.id, None)
+            job = Job(f"j{next(self.ids)}", failed.session_id, failed.mode, failed.run, failed.text)
+            job.resume = True
+            self._enqueue(job)
+        self.executor.submit(self.run_job, job)
+        return job, None
+
+    def _enqueue(self, job):
+        self.jobs[job.id] = job
+        self.active += 1
+        job.position = self.active
+
+    def session(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = Session()
+            session.last_seen = time.time()
+            return session
+
+    def run_job(self, job):
+        job.state = "running"
+        job.started_at = time.monotonic()
+        session = self.session(job.session_id)
+
+        def on_status(text):
+            job.emit({"type": "status", "text": text})
+
+        def on_stage(stage, index, total):
+            job.emit({"type": "stage", "stage": stage, "index": index, "total": total})
+
+        try:
+            with session.lock:
+                pipeline = Pipeline(
+                    get_mode(job.mode),
+                    client=self.client_factory(on_status),
+                    on_status=on_status,
+                    on_stage=on_stage,
+                    conversation=session.conversation,
+                    store=self.store,
+                    cache=self.cache,
+                    voices=self.voices,
+                    budget=self.budget,
+                )
+                result = pipeline.run(job.input_path, run=job.run, text=job.text, resume=job.resume)
+
+            job.artifacts["audio"] = result.audio_path
+            if result.video_path:
+                job.artifacts["video"] = result.video_path
+            if result.final_images:
+                # Clients download the portrait once, so send the finished one
+                try:
+                    result.final_images.result()
+                except Exception as e:
+                    print(f"Final portrait for {job.id} failed, sending the draft: {e}")
+            if result.images:
+                if not job.run.has(PORTRAIT_PATH):
+                    job.run.write_image(PORTRAIT_PATH, result.images[0])
+                job.artifacts["portrait"] = job.run.path(PORTRAIT_PATH)
+
+            job.finish("done", {
+                "type": "done",
+                "user_text": result.user_text,
+                "figure_id": result.figure_id,
+                "figure_name": result.figure_name,
+                "gender": result.gender,
+                "monologue": result.monologue,
+                "is_follow_up": result.is_follow_up,
+                "artifacts": {name: f"/jobs/{job.id}/{name}" for name in job.artifacts},
+            })
+        except Exception as e:
+            print(f"Error in {job.id}: {e}")
+            job.finish("error", {"type": "error", "message": str(e)})
+        finally:
+            with self.lock:
+                self.active -= 1
+            self.expire()
+
+    def expire(self):
+        now = time.time()
+        with self.lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.finished_at and now - job.finished_at > JOB_TTL_SECONDS:
+                    del self.jobs[job_id]
+                    # Follow-ups link what they reuse into their own run, so this is safe
+                    job.run.discard()
+            for session_id, session in list(self.sessions.items()):
+                if now - session.last_seen > 2 * SESSION_IDLE_SECONDS:
+                    del self.sessions[session_id]
+
+    def metrics(self):
+        yield "history_server_active_jobs", "gauge", "Questions being processed", {}, self.active
+        yield "history_server_sessions", "gauge", "Sessions seen recently", {}, len(self.sessions)
+        for key, value in self.store.usage().items():
+            yield f"history_artifact_{key}", "gauge", "Artifact store usage (runs, pinned runs, bytes)", {}, value
+
+    def health(self):
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "max_queue": self.max_queue,
+            "sessions": len(self.sessions),
+            "models": self.governor.load(),
+            "registry": REGISTRY.snapshot(),
+            "uploads": UPLOADS.stats(),
+            "artifacts": self.store.usage(),
+            "answer_cache": self.cache.stats(),
+            "voices": default_voices().stats(),
+            "keep_warm": self.keep_warm.report() if self.keep_warm else None,
+        }
+
+
+# --- HTTP / WebSocket ---
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def app(self):
+        return self.server.pipeline_server
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "retry":
+            return self.retry_job(parts[1])
+        if url.path != "/questions":
+            return self.send_json(404, {"error": "not found"})
+        query = parse_qs(url.query)
+        session_id = query.get("session", ["default"])[0]
+        mode_name = query.get("mode", [self.server.default_mode])[0]
+        if mode_name not in MODES:
+            return self.send_json(400, {"error": f"unknown mode {mode_name}"})
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        text = audio = None
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            text = (json.loads(body or b"{}").get("text") or "").strip()
+            if not text:
+                return self.send_json(400, {"error": "empty question"})
+        elif body:
+            audio = body
+        else:
+            return self.send_json(400, {"error": "send audio/wav or JSON {\"text\": ...}"})
+
+        job, retry_after = self.app.submit(session_id, mode_name, text=text, audio=audio)
+        if job is None:
+            return self.send_json(
+                503, {"error": "busy", "retry_after": retry_after}, {"Retry-After": str(retry_after)}
+            )
+        self.send_json(202, {"job_id": job.id, "position": job.position, "events": f"/jobs/{job.id}/events"})
+
+    def retry_job(self, job_id):
+        failed = self.app.jobs.get(job_id)
+        if failed is None:
+            return self.send_json(404, {"error": "not found"})
+        if failed.state != "error":
+            return self.send_json(409, {"error": "only a failed job can be retried"})
+        job, retry_after = self.app.retry(failed)
+        if job is None:
+            return self.send_json(
+                503, {"error": "busy", "retry_after": retry_after}, {"Retry-After": str(retry_after)}
+            )
+        self.send_json(202, {"job_id": job.id, "position": job.position, "events": f"/jobs/{job.id}/events"})
+
+    def do_GET(self):
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if parts == ["health"]:
+            return self.send_json(200, self.app.health())
+        if parts == ["metrics"]:
+            body = METRICS.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if len(parts) < 2 or parts[0] != "jobs" or parts[1] not in self.app.jobs:
+            return self.send_json(404, {"error": "not found"})
+
+        job = self.app.jobs[parts[1]]
+        if len(parts) == 2:
+            return self.send_json(200, job.describe())
+        if parts[2] == "events":
+            return self.stream_events(job)
+        if parts[2] in job.artifacts:
+            return self.send_file(job.artifacts[parts[2]], ARTIFACT_TYPES[parts[2]])
+        self.send_json(404, {"error": "not found"})
+
+    def send_file(self, path, content_type):
+        with open(path, "rb") as file:
+            data = file.read()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stream_events(self, job):
+        ws = server_handshake(self)
+        if ws is None:
+            return self.send_json(400, {"error": "expected a WebSocket upgrade"})
+        self.close_connection = True
+        index = 0
+        try:
+            while True:
+                events = job.events_since(index)
+                for event in events:
+                    ws.send_json(event)
+                index += len(events)
+                if job.finished_at and index >= len(job.events):
+                    break
+        except (WebSocketClosed, OSError):
+            pass
+        finally:
+            ws.close()
+
+    def log_message(self, format, *args):
+        pass  # One line per request would drown the pipeline output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Talk to History pipeline server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mode", choices=sorted(MODES), default=DEFAULT_MODE, help="Mode for clients that don't send one")
+    parser.add_argument("--workers", type=int, default=4, help="Questions processed at the same time")
+    parser.add_argument("--max-queue", type=int, default=8, help="Questions waiting for a worker before new ones are refused")
+    parser.add_argument("--max-wait", type=int, default=60, help="Refuse new questions when model quotas are paused longer than this (s)")
+    parser.add_argument("--artifact-dir", default=SERVER_ARTIFACT_DIR, help="Where each job's files are kept")
+    args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+    httpd.daemon_threads = True
+    httpd.default_mode = args.mode
+    httpd.pipeline_server = PipelineServer(args.workers, args.max_queue, args.max_wait, ArtifactStore(args.artifact_dir))
+    METRICS.add_collector(httpd.pipeline_server.metrics)
+    threading.Thread(target=default_voices().preload, daemon=True).start()
+    httpd.pipeline_server.keep_warm = start_keep_warm(get_mode(args.mode))
+    httpd.pipeline_server.cache.start_autosave()
+    # /metrics is served on this port; only the JSON snapshot needs its own thread
+    start_exporters(port=0)
+    print(f"Pipeline server on http://{args.host}:{args.port} ({args.workers} workers, mode {args.mode})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Near-duplicate matching of short texts (visitor questions) with MinHash + LSH.
+
+Texts are compared as sets of character 3-grams (Jaccard similarity), so word
+order and small wording changes cost little. Lookups go through LSH bands kept
+as sorted NumPy arrays (binary search, no Python dict per entry), so a snapshot
+loads with np.load and a lookup stays in the low milliseconds at 100k entries.
+"""
+import json
+import os
+import re
+import threading
+import zlib
+
+NGRAM = 3
+NUM_PERM = 64
+BANDS = 16  # 16 bands of 4 rows: likely candidate from ~0.6 similarity up
+ROWS = NUM_PERM // BANDS
+# New entries are scanned directly until there are this many, then folded into the snapshot
+TAIL_LIMIT = 2000
+# Per-lookup work is capped so p99 stays under 5 ms at 100k entries (benchmarks/question_index.py)
+BUCKET_LIMIT = 16  # entries taken from one LSH bucket
+VERIFY_LIMIT = 5  # candidates checked exactly (each is read back from the journal)
+
+SNAPSHOT_NAME = "index.npz"
+JOURNAL_NAME = "entries.jsonl"
+
+
+def normalize(text):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def shingles(text):
+    padded = f" {normalize(text)} "
+    return {padded[i:i + NGRAM] for i in range(max(len(padded) - NGRAM + 1, 1))}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class MinHasher:
+    """Fixed-seed multiply-shift hash family, so signatures stay valid across restarts."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self.band_mix = rng.integers(1, 2 ** 63, size=ROWS, dtype=np.uint64) | np.uint64(1)
+
+    def signature(self, grams):
+        import numpy as np
+
+        values = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+        # (grams x perms), wrapping uint64 arithmetic; the top 32 bits are the hash
+        hashed = (values[:, None] * self.a + self.b) >> np.uint64(32)
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signatures):
+        """One uint64 key per band for each signature row: shape (n, BANDS)."""
+        import numpy as np
+
+        bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+        return (bands * self.band_mix).sum(axis=2)
+
+
+# --- Similarity Index ---
+class SimilarityIndex:
+    """
+    Texts with a JSON payload each, searchable by similarity, kept in directory.
+
+    On disk: an append-only journal of every entry (one JSON line each) and a
+    NumPy snapshot with the signatures, per-band sorted keys and journal offsets
+    of the entries it covers. Loading reads only the snapshot and the journal
+    after it; older entries are read from the journal when they match.
+    """
+
+    def __init__(self, directory):
+        import numpy as np
+
+        self.directory = directory
+        self.hasher = MinHasher()
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # one snapshot write at a time (periodic save vs. a full tail)
+
+        # Snapshot: entries [0, snapshot_size)
+        self.signatures = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self.sorted_keys = np.zeros((BANDS, 0), dtype=np.uint64)
+        self.sorted_ids = np.zeros((BANDS, 0), dtype=np.int64)
+        self.offsets = np.zeros(0, dtype=np.int64)
+        # Tail: entries added since, kept in memory and scanned directly
+        self.tail = []  # (offset, text, payload, signature)
+
+        os.makedirs(directory, exist_ok=True)
+        self.journal_path = os.path.join(directory, JOURNAL_NAME)
+        self.load()
+        self.journal = open(self.journal_path, "ab")
+        self.reader = open(self.journal_path, "rb")
+
+    def __len__(self):
+        return self.snapshot_size + len(self.tail)
+
+    @property
+    def snapshot_size(self):
+        return len(self.signatures)
+
+    # --- Persistence ---
+    def load(self):
+        import numpy as np
+
+        journal_size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+        tail_start = 0
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(snapshot_path):
+            with np.load(snapshot_path) as snapshot:
+                # A snapshot ahead of its journal (journal lost or replaced) is useless
+                if int(snapshot["journal_end"]) <= journal_size:
+                    self.signatures = snapshot["signatures"]
+                    self.sorted_keys = snapshot["sorted_keys"]
+                    self.sorted_ids = snapshot["sorted_ids"]
+                    self.offsets = snapshot["offsets"]
+                    tail_start = int(snapshot["journal_end"])
+
+        if journal_size > tail_start:
+            with open(self.journal_path, "r+b") as file:
+                file.seek(tail_start)
+                while True:
+                    offset = file.tell()
+                    line = file.readline()
+                    if not line:
+                        break
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line after a crash: drop it so appends start clean
+                        file.truncate(offset)
+                        break
+                    signature = self.hasher.signature(shingles(entry["text"]))
+                    self.tail.append((offset, entry["text"], entry.get("payload"), signature))
+
+    def save(self):
+        """Fold the tail into the snapshot and write it (the journal is always current)."""
+        import numpy as np
+
+        with self.save_lock:
+            with self.lock:
+                if self.tail:
+                    self.signatures = np.vstack([self.signatures] + [entry[3] for entry in self.tail])
+                    self.offsets = np.concatenate([self.offsets, [entry[0] for entry in self.tail]]).astype(np.int64)
+                    self.tail = []
+                    keys = self.hasher.band_keys(self.signatures).T  # (BANDS, n)
+                    self.sorted_ids = np.argsort(keys, axis=1, kind="stable")
+                    self.sorted_keys = np.take_along_axis(keys, self.sorted_ids, axis=1)
+                arrays = {
+                    "signatures": self.signatures,
+                    "sorted_keys": self.sorted_keys,
+                    "sorted_ids": self.sorted_ids,
+                    "offsets": self.offsets,
+                    "journal_end": np.int64(self.journal.tell()),
+                }
+            tmp_path = os.path.join(self.directory, SNAPSHOT_NAME + ".tmp.npz")
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, os.path.join(self.directory, SNAPSHOT_NAME))
+
+    def close(self):
+        self.journal.close()
+        self.reader.close()
+
+    # --- Entries ---
+    def add(self, text, payload=None):
+        signature = self.hasher.signature(shingles(text))
+        line = (json.dumps({"text": text, "payload": payload}) + "\n").encode("utf-8")
+        with self.lock:
+            offset = self.journal.tell()
+            self.journal.write(line)
+            self.journal.flush()
+            self.tail.append((offset, text, payload, signature))
+            entry_id = len(self) - 1
+            fold = len(self.tail) >= TAIL_LIMIT
+        if fold:
+            self.save()
+        return entry_id
+
+    def _entry(self, entry_id):
+        # (text, payload); callers hold the lock
+        if entry_id >= self.snapshot_size:
+            _, text, payload, _ = self.tail[entry_id - self.snapshot_size]
+            return text, payload
+        self.reader.seek(int(self.offsets[entry_id]))
+        entry = json.loads(self.reader.readline())
+        return entry["text"], entry.get("payload")
+
+    def search(self, text, threshold, limit=5):
+        """(similarity, entry id, payload) of the closest entries at or above threshold, best first."""
+        import numpy as np
+
+        grams = shingles(text)
+        signature = self.hasher.signature(grams)
+        with self.lock:
+            candidates = self._snapshot_candidates(signature).tolist()
+            if self.tail:
+                tail = np.vstack([entry[3] for entry in self.tail])
+                # Generous pre-filter on the estimate; the exact check below decides
+                estimate = (tail == signature).mean(axis=1)
+                close = np.nonzero(estimate >= threshold - 0.2)[0]
+                close = close[np.argsort(-estimate[close])[:VERIFY_LIMIT]]
+                candidates += (close + self.snapshot_size).tolist()
+            matches = []
+            for entry_id in candidates:
+                entry_text, payload = self._entry(entry_id)
+                similarity = jaccard(grams, shingles(entry_text))
+                if similarity >= threshold:
+                    matches.append((similarity, entry_id, payload))
+        # Most similar first; the newest of equally similar entries
+        matches.sort(key=lambda match: (-match[0], -match[1]))
+        return matches[:limit]
+
+    def _snapshot_candidates(self, signature):
+        import numpy as np
+
+        if not self.snapshot_size:
+            return np.zeros(0, dtype=np.int64)
+        keys = self.hasher.band_keys(signature[None, :])[0]
+        found = []
+        for band in range(BANDS):
+            row = self.sorted_keys[band]
+            start = np.searchsorted(row, keys[band], side="left")
+            end = np.searchsorted(row, keys[band], side="right")
+            # A crowded bucket is mostly repeats of one question: its newest entries will do
+            if end > start:
+                found.append(self.sorted_ids[band, max(start, end - BUCKET_LIMIT):end])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.unique(np.concatenate(found))
+        # Rank by estimated similarity so only the best few get an exact check
+        estimate = (self.signatures[candidates] == signature).mean(axis=1)
+        return candidates[np.argsort(-estimate)[:VERIFY_LIMIT]]
@@ -0,0 +1,188 @@
+"""
+Local stand-in for the Replicate backend: canned outputs with simulated latency,
+long tails, errors and throttling. Used by the benchmarks to exercise routing,
+retry and rate limiting without network access or spend.
+
+    client = ModelClient(backend=StandInBackend(time_scale=0.01), base_wait=0, retry_wait=0)
+"""
+import io
+import json
+import random
+import struct
+import threading
+import time
+import wave
+
+from models import PredictionTimeout
+
+
+class ModelProfile:
+    """
+    Latency distribution of one model: log-normal around median, with occasional slow tails.
+    With cold_after, a call after that many idle seconds also waits cold_start seconds for a boot.
+    """
+
+    def __init__(self, median, spread=0.3, tail_rate=0.0, tail_factor=5.0, error_rate=0.0, cold_after=None,
+                 cold_start=0.0):
+        self.median = median
+        self.spread = spread
+        self.tail_rate = tail_rate
+        self.tail_factor = tail_factor
+        self.error_rate = error_rate
+        self.cold_after = cold_after
+        self.cold_start = cold_start
+
+    def sample(self, rng):
+        latency = self.median * rng.lognormvariate(0, self.spread)
+        if rng.random() < self.tail_rate:
+            latency *= self.tail_factor
+        return latency
+
+
+# Matched by substring of the model name; seconds at time_scale=1
+DEFAULT_PROFILES = {
+    "whisper": ModelProfile(3, tail_rate=0.02, tail_factor=10),
+    "gpt": ModelProfile(6, tail_rate=0.02, tail_factor=5),
+    "qwen": ModelProfile(25),
+    "flux": ModelProfile(3),
+    "xtts": ModelProfile(12),
+    "wan": ModelProfile(60),
+    "sadtalker": ModelProfile(90),
+}
+
+FIGURES = [
+    ("Napoleon Bonaparte", "male"),
+    ("Cleopatra", "female"),
+    ("Julius Caesar", "male"),
+    ("Joan of Arc", "female"),
+    ("Abraham Lincoln", "male"),
+]
+
+
+class StandInFile:
+    """Mimics replicate's FileOutput: readable bytes with a URL-ish str()."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def __str__(self):
+        return f"standin://{self.name}"
+
+
+def silent_wav(seconds, rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(struct.pack("<h", 0) * int(seconds * rate))
+    return buffer.getvalue()
+
+
+_portrait_jpeg = None
+
+
+def portrait_jpeg():
+    global _portrait_jpeg
+    if _portrait_jpeg is None:
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (1024, 1024), (120, 90, 60)).save(buffer, "JPEG")
+        _portrait_jpeg = buffer.getvalue()
+    return _portrait_jpeg
+
+
+# --- Stand-in Backend ---
+class StandInBackend:
+    """
+    Drop-in for ReplicateBackend. Latencies are multiplied by time_scale so runs can
+    be compressed; per_minute throttles prediction starts like an account quota.
+    """
+
+    def __init__(self, profiles=None, time_scale=1.0, per_minute=None, seed=None):
+        self.profiles = dict(DEFAULT_PROFILES)
+        self.profiles.update(profiles or {})
+        self.time_scale = time_scale
+        self.per_minute = per_minute
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.starts = []
+        self.calls = {}
+        self.cancelled = 0
+        self.throttled = 0
+        self.cold_starts = {}
+        self.busy_until = {}  # model -> when its last call finishes
+
+    def profile(self, model):
+        for key, profile in self.profiles.items():
+            if key in model:
+                return profile
+        return ModelProfile(5)
+
+    def start(self, model, input_data):
+        profile = self.profile(model)
+        with self.lock:
+            now = time.monotonic()
+            if self.per_minute:
+                window = 60 * self.time_scale
+                self.starts = [t for t in self.starts if now - t < window]
+                if len(self.starts) >= self.per_minute:
+                    self.throttled += 1
+                    resets = max(1, int((window - (now - self.starts[0])) / self.time_scale))
+                    raise Exception(f"Request was throttled. Your rate limit resets in ~{resets}s.")
+                self.starts.append(now)
+            self.calls[model] = self.calls.get(model, 0) + 1
+            latency = profile.sample(self.rng) * self.time_scale
+            idle_since = self.busy_until.get(model)
+            if profile.cold_after and (idle_since is None or now - idle_since > profile.cold_after * self.time_scale):
+                self.cold_starts[model] = self.cold_starts.get(model, 0) + 1
+                latency += profile.cold_start * self.time_scale
+            self.busy_until[model] = max(self.busy_until.get(model, 0.0), now + latency)
+            failed = self.rng.random() < profile.error_rate
+        return StandInCall(self, model, input_data, latency, failed)
+
+    def output(self, model, input_data):
+        if "whisper" in model:
+            return {"transcription": "I want to ask Napoleon why he invaded Russia."}
+        if "gpt" in model:
+            name, gender = FIGURES[self.rng.randrange(len(FIGURES))]
+            monologue = "I did what history demanded of me. " * 8
+            return [json.dumps({"character_name": name, "gender": gender, "monologue": monologue.strip()})]
+        if "qwen" in model or "flux" in model:
+            return [StandInFile("portrait.jpg", portrait_jpeg())]
+        if "xtts" in model:
+            words = len(str(input_data.get("text", "")).split())
+            return StandInFile("speech.wav", silent_wav(max(1.0, words / 2.5)))
+        return StandInFile("video.mp4", b"")
+
+
+class StandInCall:
+    def __init__(self, backend, model, input_data, latency, failed):
+        self.backend = backend
+        self.model = model
+        self.input_data = input_data
+        self.latency = latency
+        self.failed = failed
+        self.started = time.monotonic()
+        self.cancel_event = threading.Event()
+
+    def result(self, timeout=None):
+        remaining = self.latency - (time.monotonic() - self.started)
+        if timeout is not None and remaining > timeout:
+            self.cancel_event.wait(timeout)
+            raise PredictionTimeout(f"no result after {timeout:.1f}s")
+        if remaining > 0 and self.cancel_event.wait(remaining):
+            raise Exception("Prediction was canceled")
+        if self.failed:
+            raise Exception(f"Prediction failed: simulated error in {self.model}")
+        return self.backend.output(self.model, self.input_data)
+
+    def cancel(self):
+        with self.backend.lock:
+            self.backend.cancelled += 1
+        self.cancel_event.set()
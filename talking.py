@@ -0,0 +1,165 @@
+"""
+Local talking-portrait animation: the portrait's jaw and eyelids are moved in
+time with the synthesized speech, so no remote video stage is needed.
+
+The speech is reduced once to one mouth-opening value per video frame (energy
+in the speech band of each frame, all frames in one NumPy FFT). Each frame then
+only remaps the small mouth and eye boxes of a copy of the portrait.
+"""
+import numpy as np
+
+FPS = 25
+# Speech band carrying most vowel/consonant energy; hum and hiss outside it don't move the mouth
+SPEECH_BAND = (300.0, 3400.0)
+NOISE_GATE = 0.12  # mouth stays shut below this fraction of loud speech
+MAX_JAW_DROP = 0.07  # of face height, at full opening
+BLINK_SECONDS = 0.18
+BLINK_GAP = (2.5, 5.5)  # seconds between blinks
+
+
+# --- Speech Envelope ---
+def speech_envelope(audio, sample_rate, fps=FPS):
+    """Mouth opening in [0, 1] for every video frame of the audio."""
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    hop = max(int(round(sample_rate / fps)), 1)
+    count = max(-(-len(audio) // hop), 1)
+    frames = np.zeros(count * hop, dtype=np.float32)
+    frames[:len(audio)] = audio
+    frames = frames.reshape(count, hop) * np.hanning(hop).astype(np.float32)
+
+    spectrum = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+    freqs = np.fft.rfftfreq(hop, 1.0 / sample_rate)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    energy = np.sqrt(spectrum[:, band].sum(axis=1))
+
+    # Relative to loud speech in this clip, so quiet and loud voices both articulate
+    loud = np.percentile(energy, 95) if energy.any() else 0.0
+    if loud <= 0:
+        return np.zeros(count, dtype=np.float32)
+    level = np.clip(energy / loud, 0.0, 1.0)
+    level = np.clip((level - NOISE_GATE) / (1.0 - NOISE_GATE), 0.0, 1.0)
+    # A short smoothing window keeps the jaw from jittering between frames
+    level = np.convolve(level, [0.25, 0.5, 0.25], mode="same")
+    return level.astype(np.float32)
+
+
+def blink_track(count, fps=FPS, seed=0):
+    """Eyelid closure in [0, 1] per frame: a quick close-and-open every few seconds."""
+    rng = np.random.default_rng(seed)
+    duration = count / fps
+    gaps = rng.uniform(*BLINK_GAP, size=int(duration / BLINK_GAP[0]) + 2)
+    centers = np.cumsum(gaps) - gaps[0] / 2
+    times = np.arange(count) / fps
+    nearest = np.abs(times[:, None] - centers[None, :]).min(axis=1) if len(centers) else np.full(count, np.inf)
+    return np.clip(1.0 - nearest / (BLINK_SECONDS / 2), 0.0, 1.0).astype(np.float32)
+
+
+def load_envelope(audio_path, fps=FPS):
+    import soundfile as sf
+
+    audio, sample_rate = sf.read(audio_path, dtype="float32")
+    return speech_envelope(audio, sample_rate, fps)
+
+
+# --- Face Layout ---
+def find_face(img):
+    """(x, y, w, h) of the largest frontal face, or a centred guess for a front-facing portrait."""
+    size_x, size_y = img.size
+    guess = (int(size_x * 0.3), int(size_y * 0.2), int(size_x * 0.4), int(size_y * 0.45))
+    try:
+        import cv2
+    except ImportError:
+        return guess
+    gray = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2GRAY)
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(size_x // 8, size_y // 8))
+    if len(faces) == 0:
+        return guess
+    x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+    return int(x), int(y), int(w), int(h)
+
+
+def box(x, y, w, h, limit_x, limit_y):
+    x0, y0 = max(int(x), 0), max(int(y), 0)
+    return x0, y0, min(int(x + w), limit_x), min(int(y + h), limit_y)
+
+
+# --- Talking Portrait ---
+class TalkingPortrait:
+    """
+    Frames of one portrait speaking one audio track. Everything that doesn't
+    depend on the frame (boxes, falloff weights, index grids) is built here.
+    """
+
+    def __init__(self, img, envelope, fps=FPS, face=None):
+        self.base = np.ascontiguousarray(np.asarray(img.convert("RGB")))
+        self.envelope = envelope
+        self.fps = fps
+        self.blinks = blink_track(len(envelope), fps, seed=len(envelope))
+        height, width = self.base.shape[:2]
+        fx, fy, fw, fh = face or find_face(img)
+
+        # Mouth: lower face from the lip line down to the chin
+        self.mouth = box(fx + 0.25 * fw, fy + 0.68 * fh, 0.5 * fw, 0.3 * fh, width, height)
+        x0, y0, x1, y1 = self.mouth
+        lip = max((y1 - y0) // 3, 1)  # lip line a third of the way down the box
+        rows = np.arange(y1 - y0, dtype=np.float32)[:, None]
+        across = np.linspace(0.0, 1.0, x1 - x0, dtype=np.float32)[None, :]
+        # Full drop mid-mouth, none at the corners; full at the lip line, none at the chin
+        below = np.clip((rows - lip) / max(y1 - y0 - lip, 1), 0.0, 1.0)
+        self.jaw_weight = (0.5 - 0.5 * np.cos(2 * np.pi * across)) * np.where(rows >= lip, 1.0 - below, 0.0)
+        self.mouth_rows = rows
+        self.mouth_cols = np.arange(x1 - x0)[None, :]
+        self.lip = lip
+        self.max_drop = MAX_JAW_DROP * fh
+
+        # Eyes: one box per eye, covered from the top by the skin just above it
+        self.eyes = []
+        for center in (0.3, 0.7):
+            ex0, ey0, ex1, ey1 = box(fx + (center - 0.12) * fw, fy + 0.36 * fh, 0.24 * fw, 0.12 * fh, width, height)
+            if ex1 <= ex0 or ey1 <= ey0 or ey0 < 3:
+                continue
+            ys = np.linspace(-1.0, 1.0, ey1 - ey0, dtype=np.float32)[:, None]
+            xs = np.linspace(-1.0, 1.0, ex1 - ex0, dtype=np.float32)[None, :]
+            shape = np.clip(1.0 - (xs ** 2 + ys ** 2), 0.0, 1.0) ** 0.5  # soft ellipse
+            rows = np.arange(ey1 - ey0, dtype=np.float32)[:, None] / (ey1 - ey0)
+            self.eyes.append(((ex0, ey0, ex1, ey1), shape[..., None], rows))
+
+    @classmethod
+    def from_audio(cls, img, audio_path, fps=FPS):
+        return cls(img, load_envelope(audio_path, fps), fps)
+
+    def frame_array(self, position, brightness=1.0):
+        """RGB array of the frame at a playback position (seconds)."""
+        index = min(max(int(position * self.fps), 0), len(self.envelope) - 1)
+        frame = self.base.copy()
+
+        opening = float(self.envelope[index])
+        if opening > 0.01:
+            x0, y0, x1, y1 = self.mouth
+            region = self.base[y0:y1, x0:x1]
+            drop = opening * self.max_drop * self.jaw_weight
+            source = self.mouth_rows - drop
+            # Rows uncovered by the dropping jaw show the inside of the mouth
+            gap = (source < self.lip) & (self.mouth_rows >= self.lip)
+            moved = region[np.clip(source, 0, None).astype(np.intp), self.mouth_cols]
+            moved[gap] = (moved[gap] * 0.25).astype(np.uint8)
+            frame[y0:y1, x0:x1] = moved
+
+        closure = float(self.blinks[index])
+        if closure > 0.01:
+            for (ex0, ey0, ex1, ey1), shape, rows in self.eyes:
+                lid = self.base[ey0 - 3, ex0:ex1][None, :, :].astype(np.float32)
+                eye = frame[ey0:ey1, ex0:ex1].astype(np.float32)
+                cover = shape * (rows < closure)[..., None]
+                frame[ey0:ey1, ex0:ex1] = (eye + (lid - eye) * cover).astype(np.uint8)
+
+        if brightness < 1.0:
+            frame = (frame * max(brightness, 0.0)).astype(np.uint8)
+        return frame
+
+    def frame(self, position, brightness=1.0):
+        from PIL import Image
+
+        return Image.fromarray(self.frame_array(position, brightness))
@@ -0,0 +1,137 @@
+"""Fallback routing and circuit breaking against the stand-in backend (time compressed by SCALE)."""
+import time
+
+import pytest
+
+from config import MODEL_IMAGE, MODEL_IMAGE_FAST, MODEL_WHISPER
+from model_registry import STAGE_SLO_SECONDS, ModelRegistry
+from models import ModelClient, RateGovernor
+from standin import ModelProfile, StandInBackend
+
+SCALE = 0.001
+OPEN_SECONDS = 60 * SCALE
+IMAGE_INPUT = {"prompt": "portrait", "aspect_ratio": "1:1"}
+
+
+def make_client(backend, chains):
+    registry = ModelRegistry(
+        chains=chains,
+        slo={stage: seconds * SCALE for stage, seconds in STAGE_SLO_SECONDS.items()},
+        open_seconds=OPEN_SECONDS,
+    )
+    client = ModelClient(
+        on_status=lambda text: None,
+        base_wait=0,
+        retry_wait=0,
+        governor=RateGovernor(max_concurrent=4, max_per_minute=10 ** 6),
+        registry=registry,
+        backend=backend,
+        wait_scale=SCALE,
+    )
+    return client, registry
+
+
+def test_slow_primary_is_cancelled_for_the_fallback():
+    backend = StandInBackend(
+        profiles={"qwen": ModelProfile(120, spread=0), "flux": ModelProfile(5, spread=0)}, time_scale=SCALE, seed=1
+    )
+    client, registry = make_client(backend, {"image": [MODEL_IMAGE, MODEL_IMAGE_FAST]})
+
+    output = client.run_stage("image", IMAGE_INPUT, step_name="Image Generation")
+
+    assert output
+    assert backend.cancelled > 0
+    assert backend.calls == {MODEL_IMAGE: 1, MODEL_IMAGE_FAST: 1}
+    assert registry.snapshot()[MODEL_IMAGE_FAST]["calls"] == 1
+
+
+def test_breaker_opens_on_failures_and_closes_after_cool_down():
+    backend = StandInBackend(
+        profiles={"qwen": ModelProfile(5, spread=0, error_rate=1.0), "flux": ModelProfile(5, spread=0)},
+        time_scale=SCALE,
+        seed=1,
+    )
+    client, registry = make_client(backend, {"image": [MODEL_IMAGE, MODEL_IMAGE_FAST]})
+
+    # Every retry on the primary fails, so the fallback answers
+    assert client.run_stage("image", IMAGE_INPUT, step_name="Image Generation")
+    assert registry.snapshot()[MODEL_IMAGE]["state"] == "open"
+    assert registry.route("image") == [MODEL_IMAGE_FAST]
+
+    # While open, the primary is not called at all
+    calls = backend.calls[MODEL_IMAGE]
+    client.run_stage("image", IMAGE_INPUT, step_name="Image Generation")
+    assert backend.calls[MODEL_IMAGE] == calls
+
+    # After the cool-down one trial call goes through, and its success closes the circuit
+    backend.profiles["qwen"] = ModelProfile(5, spread=0)
+    time.sleep(OPEN_SECONDS * 1.5)
+    assert registry.route("image")[0] == MODEL_IMAGE
+    client.run_stage("image", IMAGE_INPUT, step_name="Image Generation")
+    assert backend.calls[MODEL_IMAGE] == calls + 1
+    assert registry.snapshot()[MODEL_IMAGE]["state"] == "closed"
+
+
+def test_throttling_does_not_count_against_model_health():
+    # One prediction start per (compressed) minute: back-to-back calls get throttled
+    backend = StandInBackend(
+        profiles={"whisper": ModelProfile(1, spread=0)}, time_scale=SCALE, per_minute=1, seed=1
+    )
+    client, registry = make_client(backend, {"transcribe": [MODEL_WHISPER]})
+
+    for _ in range(4):
+        client.run_stage("transcribe", {"audio": "question.wav"}, step_name="Transcription")
+
+    assert backend.throttled > 0
+    health = registry.snapshot()[MODEL_WHISPER]
+    assert health["state"] == "closed"
+    assert health["error_rate"] == 0
+    assert health["calls"] == 4
+
+
+def test_failing_only_model_is_still_tried():
+    backend = StandInBackend(profiles={"qwen": ModelProfile(5, spread=0, error_rate=1.0)}, time_scale=SCALE, seed=1)
+    client, registry = make_client(backend, {"image": [MODEL_IMAGE]})
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="simulated error"):
+            client.run_stage("image", IMAGE_INPUT, step_name="Image Generation")
+    assert registry.snapshot()[MODEL_IMAGE]["state"] == "open"
+    # With nothing to fall back to, the open model is called rather than failing outright
+    assert registry.route("image") == [MODEL_IMAGE]
+
+
+def test_throttled_trial_call_frees_the_half_open_slot():
+    backend = StandInBackend(
+        profiles={"qwen": ModelProfile(5, spread=0, error_rate=1.0), "flux": ModelProfile(5, spread=0)},
+        time_scale=SCALE,
+        seed=1,
+    )
+    client, registry = make_client(backend, {"image": [MODEL_IMAGE, MODEL_IMAGE_FAST]})
+    client.run_stage("image", IMAGE_INPUT, step_name="Image Generation")
+    assert registry.snapshot()[MODEL_IMAGE]["state"] == "open"
+
+    # The trial call after the cool-down is throttled on every attempt
+    backend.profiles["qwen"] = ModelProfile(5, spread=0)
+    start = backend.start
+    throttled = []
+
+    def throttle(model, input_data):
+        if model == MODEL_IMAGE:
+            throttled.append(model)
+            raise Exception("Request was throttled. Your rate limit resets in ~1s.")
+        return start(model, input_data)
+
+    backend.start = throttle
+    time.sleep(OPEN_SECONDS * 1.5)
+    client.run_stage("image", IMAGE_INPUT, step_name="Image Generation")
+    assert throttled
+    assert registry.snapshot()[MODEL_IMAGE]["state"] == "half-open"
+
+    # The slot is free again, so the next trial reaches the model and closes the circuit
+    backend.start = start
+    assert registry.route("image")[0] == MODEL_IMAGE
+    calls = backend.calls[MODEL_IMAGE]
+    client.run_stage("image", IMAGE_INPUT, step_name="Image Generation")
+    assert backend.calls[MODEL_IMAGE] == calls + 1
+    assert registry.snapshot()[MODEL_IMAGE]["state"] == "closed"
@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from metrics import CACHE_LOOKUPS, DOWNLOAD_BYTES
+
+# Used when the files API doesn't say when an upload expires
+DEFAULT_TTL_SECONDS = 60 * 60
+# Stop handing out a URL this long before it expires, so a queued prediction can still read it
+EXPIRY_MARGIN_SECONDS = 10 * 60
+# Hosts whose URLs the models already read from Replicate's own storage
+REPLICATE_HOSTS = ("replicate.delivery", "api.replicate.com")
+# URL inputs worth mirroring to Replicate: the same voice reference is sent with every XTTS call
+MIRROR_INPUTS = ("speaker",)
+
+
+def parse_expiry(expires_at):
+    """Epoch seconds of an ISO 8601 expires_at, or None."""
+    if not expires_at:
+        return None
+    try:
+        return datetime.fromisoformat(expires_at.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def replicate_upload(data, name):
+    """Upload bytes through Replicate's files API; returns (url, expiry epoch or None)."""
+    import io
+
+    import replicate
+
+    file = io.BytesIO(data)
+    file.name = name
+    uploaded = replicate.files.create(file, filename=name)
+    return uploaded.urls["get"], parse_expiry(uploaded.expires_at)
+
+
+# --- Upload Manager ---
+class UploadManager:
+    """
+    Uploads each distinct file input once and reuses its URL until it expires.
+
+    Files are keyed by a hash of their bytes, so the same portrait or speech sent
+    to a retry, hedge, follow-up or replay is never uploaded twice.
+    """
+
+    def __init__(self, upload=None, default_ttl=DEFAULT_TTL_SECONDS, margin=EXPIRY_MARGIN_SECONDS,
+                 mirror_inputs=MIRROR_INPUTS):
+        self.upload = upload or replicate_upload
+        self.mirror_inputs = mirror_inputs
+        self.default_ttl = default_ttl
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.urls = {}  # digest -> (url, usable until)
+        self.digest_locks = {}
+        self.mirrored = {}  # remote URL -> digest of its bytes
+        self.uploads = 0
+        self.reused = 0
+        self.bytes_saved = 0
+
+    def prepare(self, input_data):
+        """Copy of a model input with every open file replaced by an uploaded URL."""
+        prepared = {}
+        for key, value in input_data.items():
+            if hasattr(value, "read"):
+                if hasattr(value, "seek"):
+                    value.seek(0)
+                data = value.read()
+                name = getattr(value, "name", key)
+                value = self.url_for(data, name if isinstance(name, str) else key)
+            elif key in self.mirror_inputs and isinstance(value, str) and value.startswith("http"):
+                value = self.mirror(value)
+            prepared[key] = value
+        return prepared
+
+    def url_for(self, data, name="file"):
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            # One upload per digest even when two calls race for it (e.g. a hedge)
+            digest_lock = self.digest_locks.setdefault(digest, threading.Lock())
+        with digest_lock:
+            cached = self._cached(digest)
+            if cached:
+                with self.lock:
+                    self.reused += 1
+                    self.bytes_saved += len(data)
+                CACHE_LOOKUPS.labels("upload", "hit").inc()
+                return cached
+            CACHE_LOOKUPS.labels("upload", "miss").inc()
+            url, expires = self.upload(data, name.replace("\\", "/").split("/")[-1])
+            if expires is None:
+                expires = time.time() + self.default_ttl
+            with self.lock:
+                self.urls[digest] = (url, expires - self.margin)
+                self.uploads += 1
+            return url
+
+    def mirror(self, url):
+        """
+        Replicate-hosted copy of a remote file (e.g. a voice reference), downloaded
+        once per process, so predictions don't fetch it from a third-party host.
+        """
+        if urlsplit(url).hostname in REPLICATE_HOSTS:
+            return url
+        with self.lock:
+            digest = self.mirrored.get(url)
+            cached = self._cached(digest) if digest else None
+        if cached:
+            with self.lock:
+                self.reused += 1
+            return cached
+        try:
+            import requests
+
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
+            DOWNLOAD_BYTES.labels("mirror").inc(len(response.content))
+            mirrored = self.url_for(response.content, urlsplit(url).path)
+        except Exception as e:
+            # The model can still fetch the original
+            print(f"Could not mirror {url}: {e}")
+            return url
+        with self.lock:
+            self.mirrored[url] = hashlib.sha256(response.content).hexdigest()
+        return mirrored
+
+    def _cached(self, digest):
+        entry = self.urls.get(digest)
+        if entry and time.time() < entry[1]:
+            return entry[0]
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "uploads": self.uploads,
+                "reused": self.reused,
+                "bytes_saved": self.bytes_saved,
+                "cached": len(self.urls),
+            }
+
+
+UPLOADS = UploadManager()
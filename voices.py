@@ -0,0 +1,187 @@
+"""
+Voice reference clips for XTTS, kept on disk and in memory.
+
+A figure's voice is the first clip found of:
+    voices/figures/<figure id>.wav   (e.g. voices/figures/napoleon_bonaparte.wav)
+    voices/<gender>_<age>.wav        (age from figures.json: "young" or "elder")
+    voices/<gender>.wav
+The two shipped references (VOICE_MAP) are downloaded into voices/ the first
+time they are needed, so synthesis never waits on a third-party host.
+
+    python voices.py add napoleon_bonaparte recording.flac
+    python voices.py add female_elder recording.wav
+"""
+import io
+import os
+import threading
+
+from config import DEFAULT_VOICE, VOICE_MAP, VOICES_DIR
+from metrics import CACHE_LOOKUPS, DOWNLOAD_BYTES
+
+# XTTS clones from 6-12 s of clean speech; longer clips only slow every upload
+CLIP_SECONDS = 12
+SILENCE_RATIO = 0.02  # of the peak, trimmed from both ends
+PEAK_LEVEL = 0.9
+
+
+def preprocess_clip(audio_bytes):
+    """A mono 16-bit WAV of the speech in a clip: silence trimmed, capped, peak-normalised."""
+    import numpy as np
+    import soundfile as sf
+
+    audio, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    peak = float(np.abs(audio).max()) if len(audio) else 0.0
+    if peak > 0:
+        loud = np.nonzero(np.abs(audio) > peak * SILENCE_RATIO)[0]
+        audio = audio[loud[0]:loud[-1] + 1][: CLIP_SECONDS * sample_rate]
+        audio = audio * (PEAK_LEVEL / peak)
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sample_rate, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+# --- Voice Profiles ---
+class VoiceProfiles:
+    """Reference clips by name ("napoleon_bonaparte", "female_elder", "male"), read once."""
+
+    def __init__(self, directory=VOICES_DIR, remote=VOICE_MAP):
+        self.directory = directory
+        self.remote = remote
+        self.lock = threading.Lock()
+        self.clips = None  # name -> WAV bytes
+        self.fetches = 0
+        self.unreachable = set()  # defaults that failed to download; not retried per question
+        self.served = {}  # clip name -> times used
+
+    def _load(self):
+        # Callers hold the lock
+        if self.clips is not None:
+            return
+        self.clips = {}
+        for folder in (self.directory, os.path.join(self.directory, "figures")):
+            if not os.path.isdir(folder):
+                continue
+            for file_name in os.listdir(folder):
+                name, ext = os.path.splitext(file_name)
+                if ext.lower() == ".wav":
+                    with open(os.path.join(folder, file_name), "rb") as file:
+                        self.clips[name] = file.read()
+        print(f"Voice profiles: {len(self.clips)} clips from {self.directory}/")
+
+    def _fetch(self, gender):
+        # One download per machine: the processed clip is kept as voices/<gender>.wav
+        import requests
+
+        response = requests.get(self.remote[gender], timeout=30)
+        response.raise_for_status()
+        DOWNLOAD_BYTES.labels("voice").inc(len(response.content))
+        clip = preprocess_clip(response.content)
+        self.fetches += 1
+        try:
+            from artifacts import write_atomic
+
+            os.makedirs(self.directory, exist_ok=True)
+            write_atomic(os.path.join(self.directory, f"{gender}.wav"), clip)
+        except OSError as e:
+            print(f"Voice {gender} kept in memory only: {e}")
+        return clip
+
+    def lookup(self, figure_id=None, gender=None, age=None):
+        """(clip name, WAV bytes) of the best clip, or (name, None) if only the remote URL is left."""
+        gender = gender if gender in self.remote else "male"
+        names = [figure_id, f"{gender}_{age}" if age else None, gender]
+        with self.lock:
+            self._load()
+            for name in names:
+                if name and name in self.clips:
+                    CACHE_LOOKUPS.labels("voice", "figure" if name == figure_id else "bucket").inc()
+                    return name, self.clips[name]
+            CACHE_LOOKUPS.labels("voice", "miss").inc()
+            if gender in self.unreachable:
+                return gender, None
+            try:
+                self.clips[gender] = self._fetch(gender)
+                return gender, self.clips[gender]
+            except Exception as e:
+                print(f"Could not fetch the {gender} voice, the model will: {e}")
+                self.unreachable.add(gender)
+                return gender, None
+
+    def speaker(self, figure_id=None, gender=None, age=None):
+        """The XTTS speaker input: an in-memory WAV file (uploaded once, see uploads.py) or a URL."""
+        name, clip = self.lookup(figure_id, gender, age)
+        with self.lock:
+            self.served[name] = self.served.get(name, 0) + 1
+        if clip is None:
+            return self.remote.get(name, DEFAULT_VOICE)
+        file = io.BytesIO(clip)
+        file.name = f"{name}.wav"
+        return file
+
+    def preload(self):
+        """Read every clip and download missing defaults, e.g. at startup off the UI thread."""
+        for gender in self.remote:
+            self.lookup(gender=gender)
+
+    def add(self, name, source_path):
+        """Preprocess a recording into the clip for a figure id or a voice bucket."""
+        with open(source_path, "rb") as file:
+            clip = preprocess_clip(file.read())
+        is_bucket = name.split("_")[0] in self.remote
+        folder = self.directory if is_bucket else os.path.join(self.directory, "figures")
+        os.makedirs(folder, exist_ok=True)
+        from artifacts import write_atomic
+
+        path = os.path.join(folder, f"{name}.wav")
+        write_atomic(path, clip)
+        with self.lock:
+            if self.clips is not None:
+                self.clips[name] = clip
+        return path
+
+    def stats(self):
+        with self.lock:
+            return {
+                "clips": len(self.clips) if self.clips is not None else None,
+                "bytes": sum(len(clip) for clip in self.clips.values()) if self.clips else 0,
+                "fetches": self.fetches,
+                "served": dict(self.served),
+            }
+
+
+VOICES = None
+_voices_lock = threading.Lock()
+
+
+def default_voices():
+    global VOICES
+    with _voices_lock:
+        if VOICES is None:
+            VOICES = VoiceProfiles()
+        return VOICES
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage local voice reference clips")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Preprocess a recording into a voice clip")
+    add.add_argument("name", help="Figure id from figures.json, or a bucket such as male, female_elder")
+    add.add_argument("source", help="Audio file (wav, flac, ogg, mp3)")
+    commands.add_parser("list", help="Show the clips on disk")
+    args = parser.parse_args()
+
+    voices = VoiceProfiles()
+    if args.command == "add":
+        print(f"Saved {voices.add(args.name, args.source)}")
+    else:
+        with voices.lock:
+            voices._load()
+            for name, clip in sorted(voices.clips.items()):
+                print(f"{name:<32} {len(clip) / 1024:7.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
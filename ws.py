@@ -0,0 +1,159 @@
+"""
+Just enough RFC 6455 for the pipeline server: text frames in both directions,
+ping/close handling, no extensions or fragmentation on send.
+"""
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+from urllib.parse import urlsplit
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketClosed(Exception):
+    pass
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+
+
+def _read_exact(stream, size):
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise WebSocketClosed("connection closed")
+        data += chunk
+    return data
+
+
+class WebSocket:
+    """A connected WebSocket over a file-like reader and a raw writer."""
+
+    def __init__(self, reader, writer, mask):
+        self.reader = reader
+        self.writer = writer
+        self.mask = mask  # clients must mask their frames, servers must not
+        self.closed = False
+
+    def send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        mask_bit = 0x80 if self.mask else 0
+        length = len(payload)
+        if length < 126:
+            header += bytes([mask_bit | length])
+        elif length < 1 << 16:
+            header += bytes([mask_bit | 126]) + struct.pack("!H", length)
+        else:
+            header += bytes([mask_bit | 127]) + struct.pack("!Q", length)
+        if self.mask:
+            key = os.urandom(4)
+            payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+            header += key
+        self.writer(header + payload)
+
+    def send_json(self, data):
+        self.send_frame(OP_TEXT, json.dumps(data).encode())
+
+    def recv_json(self):
+        """Next text message as JSON; raises WebSocketClosed when the peer closes."""
+        message = b""
+        while True:
+            first, second = _read_exact(self.reader, 2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", _read_exact(self.reader, 2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", _read_exact(self.reader, 8))[0]
+            key = _read_exact(self.reader, 4) if second & 0x80 else None
+            payload = _read_exact(self.reader, length)
+            if key:
+                payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+
+            if opcode == OP_CLOSE:
+                self.close()
+                raise WebSocketClosed("closed by peer")
+            if opcode == OP_PING:
+                self.send_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            message += payload
+            if first & 0x80:
+                return json.loads(message.decode())
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.send_frame(OP_CLOSE, b"")
+            except OSError:
+                pass
+
+
+def server_handshake(handler):
+    """Upgrade a BaseHTTPRequestHandler request; returns a WebSocket or None."""
+    key = handler.headers.get("Sec-WebSocket-Key")
+    if handler.headers.get("Upgrade", "").lower() != "websocket" or not key:
+        return None
+    handler.send_response(101, "Switching Protocols")
+    handler.send_header("Upgrade", "websocket")
+    handler.send_header("Connection", "Upgrade")
+    handler.send_header("Sec-WebSocket-Accept", accept_key(key))
+    handler.end_headers()
+    handler.wfile.flush()
+
+    def write(data):
+        handler.wfile.write(data)
+        handler.wfile.flush()
+
+    return WebSocket(handler.rfile, write, mask=False)
+
+
+def connect(url, timeout=30):
+    """Open a client WebSocket to a ws:// URL."""
+    parts = urlsplit(url)
+    port = parts.port or 80
+    sock = socket.create_connection((parts.hostname, port), timeout=timeout)
+    key = base64.b64encode(os.urandom(16)).decode()
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    sock.sendall(
+        (
+            f"GET {path or '/'} HTTP/1.1\r\n"
+            f"Host: {parts.hostname}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode()
+    )
+    reader = sock.makefile("rb")
+    status = reader.readline().decode()
+    if " 101 " not in status:
+        sock.close()
+        raise WebSocketClosed(f"handshake failed: {status.strip()}")
+    headers = {}
+    while True:
+        line = reader.readline().decode().strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("sec-websocket-accept") != accept_key(key):
+        sock.close()
+        raise WebSocketClosed("handshake failed: bad accept key")
+    # Answers take minutes; the server closes the socket when the job is over
+    sock.settimeout(None)
+    ws = WebSocket(reader, sock.sendall, mask=True)
+    ws.socket = sock
+    return ws